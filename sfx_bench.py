@@ -0,0 +1,374 @@
+"""自解压EXE打包工具的性能基准: 生成合成数据集，无界面地运行打包、构建和解压各阶段
+
+记录每个阶段的耗时、CPU时间、峰值内存、读写字节数和压缩率，保存为JSON，
+并可与之前保存的基准结果对比，发现性能退化:
+    python sfx_bench.py -o 本次结果.json
+    python sfx_bench.py --scale 0.1 -c tiny,dupes -p pack,extract
+    python sfx_bench.py -o 本次结果.json --baseline 基准结果.json --threshold 0.1
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+
+import sfx_core
+
+ZIP_NAME = "packed_files"
+PHASES = ("pack", "build", "extract")
+# 与基准对比的指标（数值越大越差）-> 判定为退化的最小绝对变化，低于该值的差异视为测量噪声
+COMPARED_METRICS = {
+    "wall_time": 0.05,  # 秒
+    "cpu_time": 0.05,  # 秒
+    "peak_rss": 4 * 1024 * 1024,  # 字节
+}
+
+# 合成数据集: 名称 -> 说明，大小按 --scale 缩放
+CORPORA = {
+    "tiny": "大量小文件（0-4KB文本）",
+    "huge": "少量大文件（可压缩）",
+    "media": "不可压缩的媒体文件",
+    "deep": "很深的目录树",
+    "dupes": "大量重复文件",
+}
+
+WORDS = ("data", "file", "value", "index", "update", "config", "version", "status", "result", "error",
+         "用户", "文件", "数据", "配置", "版本", "状态", "结果", "错误", "0", "1", "2", "3", "\n")
+
+
+def random_text(rng, size):
+    """生成可压缩的伪文本"""
+    parts = []
+    total = 0
+    while total < size:
+        word = rng.choice(WORDS).encode('utf-8') + b" "
+        parts.append(word)
+        total += len(word)
+    return b"".join(parts)[:size]
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def generate_corpus(name, path, scale):
+    """在path下生成数据集，内容由名称决定，多次生成的结果相同"""
+    rng = random.Random(zlib.crc32(name.encode('utf-8')))
+    if name == "tiny":
+        for i in range(max(1, int(20000 * scale))):
+            write_file(os.path.join(path, f"dir{i % 100:03d}", f"file{i:06d}.txt"),
+                       random_text(rng, rng.randint(0, 4096)))
+    elif name == "huge":
+        # 大文件由同一块文本加少量随机修改组成，生成快且压缩率接近真实数据
+        block = bytearray(random_text(rng, 1024 * 1024))
+        for i in range(3):
+            with open(os.path.join(path, f"huge{i}.dat"), 'wb') as f:
+                for _ in range(max(1, int(256 * scale))):
+                    for _ in range(16):
+                        offset = rng.randrange(len(block) - 64)
+                        block[offset:offset + 64] = rng.randbytes(64)
+                    f.write(block)
+    elif name == "media":
+        # 一半使用已压缩格式的扩展名，一半需要抽样检测可压缩性
+        for i in range(8):
+            extension = ".mp4" if i % 2 else ".dat"
+            write_file(os.path.join(path, f"media{i}{extension}"), rng.randbytes(max(1, int(32 * scale)) << 20))
+    elif name == "deep":
+        for i in range(max(1, int(2000 * scale))):
+            depth = rng.randint(1, 48)
+            parts = [f"branch{i % 8}"] + [f"level{level:02d}" for level in range(depth)]
+            write_file(os.path.join(path, *parts, f"file{i:05d}.txt"), random_text(rng, rng.randint(0, 16384)))
+    elif name == "dupes":
+        contents = [random_text(rng, 64 * 1024) for _ in range(max(1, int(200 * scale)))]
+        for i in range(len(contents) * 10):
+            write_file(os.path.join(path, f"copy{i % 10}", f"file{i:05d}.txt"), contents[i % len(contents)])
+    else:
+        raise Exception(f"未知的数据集: {name}")
+
+
+def ensure_corpus(name, work_dir, scale):
+    """返回数据集目录，不存在时生成；生成完成后写入标记文件，中断的生成会重新开始"""
+    path = os.path.join(work_dir, "corpora", f"{name}-{scale:g}", name)
+    marker = os.path.join(os.path.dirname(path), ".complete")
+    if not os.path.exists(marker):
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        os.makedirs(path)
+        generate_corpus(name, path, scale)
+        open(marker, 'w').close()
+    return path
+
+
+def _windows_peak_rss():
+    """Windows上通过GetProcessMemoryInfo读取本进程的峰值工作集"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    psapi = ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def _linux_peak_rss():
+    """Linux上读取/proc/self/status中的VmHWM；ru_maxrss会带上fork时父进程的内存，不够准确"""
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def peak_rss():
+    """返回(本进程, 已结束的子进程中最大)的峰值内存（字节），无法获取时为None"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss(), None
+    unit = 1 if sys.platform == 'darwin' else 1024  # Linux上ru_maxrss的单位是KB
+    return (_linux_peak_rss() or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit)
+
+
+def run_pack(corpus_path, work_dir, workers, method, level):
+    """打包阶段: 扫描后用sfx_core.write_packed_zip去重、并行压缩和写入压缩包信息（与pack_archive相同，不含PyInstaller）"""
+    zip_path = os.path.join(work_dir, f"{ZIP_NAME}.zip")
+    entries = sfx_core.scan_manifest([corpus_path], ZIP_NAME)
+    raw_bytes = sum(entry[2] for entry in entries)
+    _, saved_bytes = sfx_core.write_packed_zip(zip_path, entries, ZIP_NAME, workers, method, level)
+    packed_bytes = os.path.getsize(zip_path)
+    return {"files": len(entries), "bytes_read": raw_bytes - saved_bytes, "bytes_written": packed_bytes,
+            "raw_bytes": raw_bytes, "packed_bytes": packed_bytes, "ratio": packed_bytes / max(raw_bytes, 1)}
+
+
+def run_build(work_dir, method):
+    """构建阶段: 不使用缓存，用PyInstaller完整构建一次预编译解压程序"""
+    import importlib.util
+    if importlib.util.find_spec("PyInstaller") is None:
+        raise Exception("未安装PyInstaller，无法测试构建阶段")
+    stub_dir = os.path.join(work_dir, "stub")
+    extractor_script = sfx_core.create_extractor_script(work_dir, ZIP_NAME, stub_mode=True, method=method)
+    dist_dir = os.path.join(stub_dir, "dist")
+    cmd = [
+        sys.executable,
+        "-m", "PyInstaller",
+        "--onefile",
+        "--noconfirm",
+        f"--distpath={dist_dir}",
+        f"--workpath={os.path.join(stub_dir, 'build')}",
+        f"--specpath={stub_dir}",
+        "--name=extractor_stub",
+        "--noconsole",
+        *[f"--exclude-module={module}" for module in sfx_core.get_excluded_modules(method)],
+        extractor_script
+    ]
+    # 使用单独的耗时记录，不影响正常构建的进度估算
+    sfx_core.run_pyinstaller(cmd, work_dir, timing_key="bench")
+    return {"bytes_read": os.path.getsize(extractor_script), "bytes_written": sfx_core.get_dir_size(dist_dir)}
+
+
+def run_extract(work_dir, workers):
+    """解压阶段: 把打包阶段生成的压缩包解压到空目录"""
+    zip_path = os.path.join(work_dir, f"{ZIP_NAME}.zip")
+    if not os.path.exists(zip_path):
+        raise Exception("没有可解压的压缩包，请同时运行打包阶段")
+    extract_path = os.path.join(work_dir, "extracted")
+    shutil.rmtree(extract_path, ignore_errors=True)
+    sfx_core.extract_archive(zip_path, extract_path, workers)
+    return {"bytes_read": os.path.getsize(zip_path), "bytes_written": sfx_core.get_dir_size(extract_path)}
+
+
+def measure_phase(phase, corpus_path, work_dir, workers, codec):
+    """子进程入口：执行一个阶段并返回指标，每个阶段单独一个进程，峰值内存互不影响"""
+    method, level, _, _ = sfx_core.COMPRESSION_CODECS[codec]
+    start_times = os.times()
+    start = time.perf_counter()
+    if phase == "pack":
+        result = run_pack(corpus_path, work_dir, workers, method, level)
+    elif phase == "build":
+        result = run_build(work_dir, method)
+    else:
+        result = run_extract(work_dir, workers)
+    result["wall_time"] = time.perf_counter() - start
+    end_times = os.times()
+    # 压缩进程池的CPU时间计入children_*（仅限Unix，Windows上只有本进程）
+    result["cpu_time"] = sum(end_times[:4]) - sum(start_times[:4])
+    result["peak_rss"], result["peak_rss_children"] = peak_rss()
+    return result
+
+
+def run_in_subprocess(phase, corpus_path, work_dir, workers, codec):
+    """在新的Python进程中执行一个阶段，失败时抛出异常"""
+    cmd = [sys.executable, os.path.abspath(__file__), "_phase", phase, corpus_path, work_dir, str(workers), codec]
+    completed = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8")
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        raise Exception(lines[-1] if lines else f"返回代码: {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(corpora, phases, work_dir, scale=1.0, workers=None, repeat=1, codec="Deflate", log=print):
+    """运行基准测试，返回结果字典；每项取多次运行中耗时居中的一次"""
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    runs = []
+    if "build" in phases:
+        # 构建阶段与数据集无关，只运行一次
+        runs.append(("extractor", None, ["build"]))
+    for name in corpora:
+        log(f"准备数据集 {name}: {CORPORA[name]}")
+        runs.append((name, ensure_corpus(name, work_dir, scale), [phase for phase in phases if phase != "build"]))
+
+    for name, corpus_path, corpus_phases in runs:
+        phase_dir = tempfile.mkdtemp(prefix=f"sfx_bench_{name}_", dir=work_dir)
+        try:
+            for phase in corpus_phases:
+                key = f"{name}/{phase}"
+                samples = []
+                try:
+                    for _ in range(repeat):
+                        samples.append(run_in_subprocess(phase, corpus_path or "", phase_dir, workers, codec))
+                except Exception as e:
+                    log(f"{key}: 失败 - {str(e)}")
+                    results[key] = {"error": str(e)}
+                    continue
+                samples.sort(key=lambda sample: sample["wall_time"])
+                result = dict(samples[len(samples) // 2])
+                result["wall_times"] = [sample["wall_time"] for sample in samples]
+                results[key] = result
+                log(f"{key}: {format_result(result)}")
+        finally:
+            shutil.rmtree(phase_dir, ignore_errors=True)
+
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "scale": scale,
+        "codec": codec,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def format_result(result):
+    """把一项结果格式化为一行说明"""
+    parts = [f"耗时 {result['wall_time']:.2f}s", f"CPU {result['cpu_time']:.2f}s"]
+    if result.get("peak_rss"):
+        parts.append(f"峰值内存 {sfx_core.format_size(result['peak_rss'])}")
+    if result.get("peak_rss_children"):
+        parts.append(f"子进程峰值内存 {sfx_core.format_size(result['peak_rss_children'])}")
+    parts.append(f"读 {sfx_core.format_size(result['bytes_read'])}")
+    parts.append(f"写 {sfx_core.format_size(result['bytes_written'])}")
+    if "ratio" in result:
+        parts.append(f"压缩率 {result['ratio']:.1%}")
+    if len(result.get("wall_times", ())) > 1:
+        parts.append(f"耗时波动 {statistics.pstdev(result['wall_times']):.2f}s")
+    return ", ".join(parts)
+
+
+def compare_results(current, baseline, threshold=0.1):
+    """与基准结果对比，返回[(项目, 指标, 基准值, 当前值, 变化比例)]，只包含超过阈值的退化
+
+    变化比例超过threshold且绝对变化超过COMPARED_METRICS中的下限才算退化，避免极短的阶段因噪声误报。
+    运行参数（规模、压缩方式、线程数）不同的结果没有可比性，直接抛出异常。
+    """
+    for key in ("scale", "codec", "workers"):
+        if current.get(key) != baseline.get(key):
+            raise Exception(f"运行参数 {key} 与基准不同（{baseline.get(key)} -> {current.get(key)}），无法对比")
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or "error" in base or "error" in result:
+            continue
+        for metric, min_delta in COMPARED_METRICS.items():
+            if not base.get(metric) or result.get(metric) is None:
+                continue
+            change = result[metric] / base[metric] - 1
+            if change > threshold and result[metric] - base[metric] > min_delta:
+                regressions.append((name, metric, base[metric], result[metric], change))
+    return regressions
+
+
+def main(argv=None):
+    """命令行入口"""
+    import argparse
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "_phase":
+        # 子进程: _phase 阶段 数据集目录 工作目录 线程数 压缩方式
+        phase, corpus_path, work_dir, workers, codec = argv[1:6]
+        print(json.dumps(measure_phase(phase, corpus_path, work_dir, int(workers), codec)))
+        return 0
+
+    parser = argparse.ArgumentParser(description="自解压EXE打包工具性能基准")
+    parser.add_argument("-c", "--corpora", default=",".join(CORPORA),
+                        help=f"要测试的数据集，逗号分隔，可选: {', '.join(CORPORA)}")
+    parser.add_argument("-p", "--phases", default=",".join(PHASES),
+                        help=f"要测试的阶段，逗号分隔，可选: {', '.join(PHASES)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="数据集规模系数，默认1（约1.2GB）")
+    parser.add_argument("--workers", type=int, help="并行压缩/解压数，默认为CPU核心数")
+    parser.add_argument("--codec", choices=list(sfx_core.COMPRESSION_CODECS), default="Deflate", help="压缩方式")
+    parser.add_argument("--repeat", type=int, default=1, help="每项重复运行次数，取耗时居中的一次")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "sfx_bench"),
+                        help="数据集和临时文件目录，数据集生成后会保留以便复用")
+    parser.add_argument("-o", "--output", help="结果保存路径（JSON），可作为以后运行的基准")
+    parser.add_argument("--baseline", help="基准结果（JSON），有退化时返回代码为1")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定为退化的变化比例，默认0.1（10%%）")
+    args = parser.parse_args(argv)
+
+    corpora = [name for name in args.corpora.split(",") if name]
+    phases = [phase for phase in args.phases.split(",") if phase]
+    unknown = [name for name in corpora if name not in CORPORA] + [phase for phase in phases if phase not in PHASES]
+    if unknown:
+        print(f"错误: 未知的数据集或阶段: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    try:
+        os.makedirs(args.work_dir, exist_ok=True)
+        report = run_benchmarks(corpora, phases, args.work_dir, args.scale, args.workers, max(1, args.repeat),
+                                args.codec)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存: {args.output}")
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_results(report, baseline, args.threshold)
+            for name, metric, base_value, value, change in regressions:
+                print(f"性能退化 {name} {metric}: {base_value:.3f} -> {value:.3f} (+{change:.1%})")
+            print(f"与基准对比: 发现 {len(regressions)} 项退化" if regressions else "与基准对比: 没有退化")
+            return 1 if regressions else 0
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
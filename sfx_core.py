@@ -0,0 +1,3528 @@
+"""自解压EXE打包核心: 扫描、压缩、生成EXE和解压，不依赖图形界面
+
+可以在其他脚本中导入使用，也可以直接在命令行运行:
+    python sfx_core.py pack -o 输出.exe -i 图片.png 文件或文件夹...
+    python sfx_core.py batch 任务文件.json -j 4
+    python sfx_core.py extract 自解压.exe -d 解压目录 [--sync]
+    python sfx_core.py pack -o 输出.exe -i 图片.png --volume-size 4G 大数据集/
+    python sfx_core.py check-volumes 输出.sha256
+    python sfx_core.py verify 自解压.exe [-d 解压目录]
+"""
+import os
+import sys
+import zipfile
+import shutil
+import tempfile
+import subprocess
+import time
+import threading
+import zlib
+import bz2
+import lzma
+import struct
+import hashlib
+import heapq
+import contextlib
+import json
+import bisect
+import inspect
+import mmap
+import multiprocessing
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 可选的压缩方式: 名称 -> (ZIP压缩方式编号, 默认级别, 最低级别, 最高级别)
+ZIP_ZSTANDARD = 93
+COMPRESSION_CODECS = {
+    "Deflate": (zipfile.ZIP_DEFLATED, 6, 1, 9),
+    "LZMA": (zipfile.ZIP_LZMA, 6, 0, 9),
+    "BZIP2": (zipfile.ZIP_BZIP2, 9, 1, 9),
+    "Zstandard": (ZIP_ZSTANDARD, 3, 1, 22),
+}
+COMPRESSION_NAMES = {method: name for name, (method, _, _, _) in COMPRESSION_CODECS.items()}
+COMPRESSION_NAMES[zipfile.ZIP_STORED] = "存储"
+
+# 并行压缩相关参数
+PACK_CHUNK_SIZE = 8 * 1024 * 1024  # 大文件按块并行压缩，每块8MB
+HASH_CHUNK_SIZE = PACK_CHUNK_SIZE  # 文件摘要按同样的块计算，压缩和校验时各块都可以并行
+PACK_BATCH_SIZE = 4 * 1024 * 1024  # 小文件合并成批次提交，减少进程间通信次数
+PACK_BATCH_FILES = 256
+DEFLATE_WINDOW = 32 * 1024  # deflate窗口大小，用于块间预置字典
+
+# 压缩方式选择: 已压缩格式直接存储，其余文件抽样检测可压缩性
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v',
+    '.mp3', '.aac', '.m4a', '.ogg', '.opus', '.flac', '.wma',
+    '.zip', '.7z', '.rar', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.lz4', '.cab',
+    '.jar', '.apk', '.msi', '.msu', '.nupkg', '.whl',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+}
+PROBE_SAMPLE_SIZE = 64 * 1024  # 每个采样块大小
+PROBE_SAMPLES = 3  # 在文件开头、中间、结尾各取一块
+PROBE_MIN_RATIO = 0.97  # 采样压缩后仍大于该比例则视为不可压缩
+
+# 解压程序界面上的图片在打包时预先缩放并转为PNG，解压程序用Tk直接显示，不再依赖PIL
+SPLASH_SIZE = (560, 300)
+SPLASH_FORMATS = ('.png', '.gif')  # Tk无需PIL即可显示的格式
+SPLASH_NAME = "splash_image"  # 转换后图片的固定文件名，Tk按内容识别格式；文件名不进入解压程序源码，不影响构建缓存
+STARTUP_BUDGET = 0.5  # 解压程序从启动到显示第一帧的目标耗时（秒）
+
+
+def _gf2_matrix_times(mat, vec):
+    total = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            total ^= mat[i]
+        vec >>= 1
+        i += 1
+    return total
+
+
+def _gf2_matrix_square(mat):
+    return [_gf2_matrix_times(mat, mat[n]) for n in range(32)]
+
+
+def crc32_combine(crc1, crc2, len2):
+    """合并两段数据的CRC32（移植自zlib的crc32_combine）"""
+    if len2 <= 0:
+        return crc1
+
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_matrix_square(odd)
+    odd = _gf2_matrix_square(even)
+
+    while True:
+        even = _gf2_matrix_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_matrix_square(even)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+
+    return crc1 ^ crc2
+
+
+def format_size(size):
+    """把字节数格式化为便于阅读的字符串"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def parse_size(text):
+    """把 "4G"、"700M"、"1048576" 之类的大小解析为字节数"""
+    value = str(text).strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(value)
+    except ValueError:
+        raise Exception(f"无效的大小: {text}")
+
+
+# 速度统计相关参数
+RATE_SAMPLE_INTERVAL = 0.5  # 速度采样间隔（秒）
+RATE_SMOOTHING = 0.3  # 速度的指数平滑系数，越大越接近瞬时速度
+RATE_LOG_INTERVAL = 10  # 速度写入日志的间隔（秒）
+TRACE_OUTLIERS = 20  # 跟踪文件中每个阶段保留的最慢文件数
+
+
+class RateEstimator:
+    """统计处理速度、压缩率并估算剩余时间
+
+    压缩时读取原始数据、写出压缩数据，unpacking为True（解压）时相反。
+    total_bytes为原始数据总量，进度和剩余时间都按原始数据计算。
+    """
+
+    def __init__(self, total_bytes, unpacking=False):
+        self.total_bytes = total_bytes
+        self.unpacking = unpacking
+        self.totals = [0, 0, 0]  # 原始字节数, 压缩字节数, 文件数
+        self.speeds = None  # 平滑后的每秒速度，与totals对应
+        self.sample_totals = [0, 0, 0]
+        self.sample_time = self.log_time = time.perf_counter()
+
+    def update(self, raw_bytes, packed_bytes, files=0):
+        """记录新处理的数据，到达采样间隔时更新平滑速度并返回True"""
+        self.totals[0] += raw_bytes
+        self.totals[1] += packed_bytes
+        self.totals[2] += files
+        now = time.perf_counter()
+        elapsed = now - self.sample_time
+        if elapsed < RATE_SAMPLE_INTERVAL:
+            return False
+        speeds = [(total - sample) / elapsed for total, sample in zip(self.totals, self.sample_totals)]
+        if self.speeds is not None:
+            speeds = [RATE_SMOOTHING * speed + (1 - RATE_SMOOTHING) * old for speed, old in zip(speeds, self.speeds)]
+        self.speeds = speeds
+        self.sample_totals = list(self.totals)
+        self.sample_time = now
+        return True
+
+    def log_due(self):
+        """距离上次写日志超过RATE_LOG_INTERVAL时返回True"""
+        now = time.perf_counter()
+        if now - self.log_time < RATE_LOG_INTERVAL:
+            return False
+        self.log_time = now
+        return True
+
+    def progress(self):
+        """按原始数据计算的完成比例(0-1)"""
+        return min(1.0, self.totals[0] / self.total_bytes) if self.total_bytes else 1.0
+
+    def eta(self):
+        """剩余秒数，还没有速度样本时返回None"""
+        if not self.speeds or self.speeds[0] <= 0:
+            return None
+        return max(0.0, (self.total_bytes - self.totals[0]) / self.speeds[0])
+
+    def summary(self):
+        """生成速度、压缩率和剩余时间的说明文字"""
+        raw_speed, packed_speed, file_speed = self.speeds or (0, 0, 0)
+        in_speed, out_speed = (packed_speed, raw_speed) if self.unpacking else (raw_speed, packed_speed)
+        ratio = self.totals[1] / self.totals[0] if self.totals[0] else 0
+        eta = self.eta()
+        if eta is None:
+            eta_text = "--:--:--"
+        else:
+            eta = int(eta)
+            eta_text = f"{eta // 3600:02d}:{eta // 60 % 60:02d}:{eta % 60:02d}"
+        return (f"读取 {in_speed / 1048576:.1f} MB/s, 写入 {out_speed / 1048576:.1f} MB/s, "
+                f"{file_speed:.0f} 文件/s, 压缩率 {ratio:.1%}, 剩余 {eta_text}")
+
+
+class Tracer:
+    """按阶段记录耗时、字节数和最慢的文件，保存为JSON格式的跟踪文件
+
+    with tracer.span(阶段名) as span: 记录一个阶段，span是字典，可以补充字节数等信息；
+    profile中列出的阶段（"all"表示全部）同时用cProfile采集，保存为跟踪文件旁边的.prof文件。
+    cProfile只能看到当前线程，多进程压缩时采集到的是负责写入的主线程。
+    同一时间只能有一个cProfile在运行，阶段嵌套时只采集最外层，内层阶段的记录中注明所属的采集。
+    """
+
+    def __init__(self, profile=()):
+        self.start = time.perf_counter()
+        self.created = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.spans = []
+        self.counters = {}
+        self.outliers = {}  # 阶段 -> 最慢的文件的小顶堆[(秒数, 路径, 字节数)]
+        self.profile = set(profile)
+        self.profilers = {}
+        self.profiling = None  # 正在采集的阶段名
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        profiler = None
+        if name in self.profile or "all" in self.profile:
+            with self.lock:
+                if self.profiling is None:
+                    self.profiling = name
+                    import cProfile
+                    profiler = cProfile.Profile()
+                else:
+                    attrs["profiled_in"] = self.profiling
+            if profiler:
+                profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+            with self.lock:
+                if profiler:
+                    self.profiling = None
+                self.spans.append({"name": name, "start": round(start - self.start, 6),
+                                   "seconds": round(seconds, 6), **attrs})
+                if profiler:
+                    self.profilers.setdefault(name, []).append(profiler)
+
+    def count(self, name, value=1):
+        """累加计数器，如读写的字节数"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_file(self, phase, path, seconds, size):
+        """记录单个文件的耗时，每个阶段只保留最慢的TRACE_OUTLIERS个"""
+        item = (seconds, path, size)
+        with self.lock:
+            heap = self.outliers.setdefault(phase, [])
+            if len(heap) < TRACE_OUTLIERS:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def save(self, path):
+        """写入跟踪文件，采集了cProfile的阶段另存为 跟踪文件名.阶段.prof"""
+        import pstats
+        base = os.path.splitext(path)[0]
+        profiles = {}
+        for name, profilers in self.profilers.items():
+            profiles[name] = f"{base}.{name}.prof"
+            pstats.Stats(*profilers).dump_stats(profiles[name])
+        trace = {
+            "created": self.created,
+            "seconds": round(time.perf_counter() - self.start, 6),
+            "spans": self.spans,
+            "counters": self.counters,
+            "outliers": {
+                phase: [{"path": path, "seconds": round(seconds, 6), "bytes": size}
+                        for seconds, path, size in sorted(heap, reverse=True)]
+                for phase, heap in self.outliers.items()
+            },
+            "profiles": profiles,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False, indent=2)
+
+
+def is_compressible(path, size):
+    """在文件开头、中间、结尾抽样，用最快的deflate级别检测可压缩性"""
+    if size <= PROBE_SAMPLE_SIZE * PROBE_SAMPLES:
+        offsets = [0]
+    else:
+        step = (size - PROBE_SAMPLE_SIZE) // (PROBE_SAMPLES - 1)
+        offsets = [i * step for i in range(PROBE_SAMPLES)]
+
+    raw_len = 0
+    packed_len = 0
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            sample = f.read(PROBE_SAMPLE_SIZE)
+            raw_len += len(sample)
+            packed_len += len(zlib.compress(sample, 1))
+    return raw_len == 0 or packed_len < raw_len * PROBE_MIN_RATIO
+
+
+def choose_compress_method(path, size, method):
+    """为单个文件选择存储或使用指定的压缩方式
+
+    已知的压缩格式直接存储；需要分块的大文件先抽样检测；
+    小文件一律先压缩，压缩后没有变小时由工作进程改为存储。
+    """
+    if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    if size > PACK_CHUNK_SIZE and not is_compressible(path, size):
+        return zipfile.ZIP_STORED
+    return method
+
+
+def _new_compressor(method, level, zdict=None):
+    """创建指定压缩方式的压缩器，返回(需要写在数据前的头部, 压缩器)"""
+    if method == zipfile.ZIP_DEFLATED:
+        if zdict:
+            return b"", zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+        return b"", zlib.compressobj(level, zlib.DEFLATED, -15)
+    if method == zipfile.ZIP_BZIP2:
+        return b"", bz2.BZ2Compressor(level)
+    if method == zipfile.ZIP_LZMA:
+        # ZIP中的LZMA数据前有版本号和属性头，格式与zipfile.LZMACompressor一致
+        props = lzma._encode_filter_properties({'id': lzma.FILTER_LZMA1, 'preset': level})
+        compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[
+            lzma._decode_filter_properties(lzma.FILTER_LZMA1, props)
+        ])
+        return struct.pack('<BBH', 9, 4, len(props)) + props, compressor
+    if method == ZIP_ZSTANDARD:
+        if zstandard is None:
+            raise Exception("使用Zstandard压缩需要先安装zstandard库: pip install zstandard")
+        return b"", zstandard.ZstdCompressor(level=level).compressobj()
+    raise Exception(f"不支持的压缩方式: {method}")
+
+
+def _compress_piece(path, offset, length, is_last, method, level, spool_dir):
+    """压缩文件中的一段数据，返回(压缩方式, crc, 原始长度, 压缩数据, 耗时, 各块SHA-256, 实际读取字节数)
+
+    Deflate的非最后一块以Z_FULL_FLUSH结尾，各块的输出直接拼接即为合法的deflate流；
+    块之间用前一块末尾32KB作为预置字典，压缩率与串行压缩基本一致。
+    其他压缩方式不分块，大文件流式压缩到spool_dir中的临时文件，压缩数据返回该文件路径。
+    同时按HASH_CHUNK_SIZE计算每块的SHA-256，用于生成文件摘要清单。
+    原始长度是清单中的长度；文件在扫描后被修改时实际读取字节数与之不同（文件变长时最后一块多计1字节），
+    由写入者检查。
+    """
+    start_time = time.perf_counter()
+
+    if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) and length > PACK_CHUNK_SIZE:
+        crc = 0
+        read_len = 0
+        digests = []
+        header, compressor = _new_compressor(method, level)
+        fd, spool_path = tempfile.mkstemp(dir=spool_dir)
+        with open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            dst.write(header)
+            while True:
+                block = src.read(HASH_CHUNK_SIZE)
+                if not block:
+                    break
+                read_len += len(block)
+                crc = zlib.crc32(block, crc)
+                digests.append(hashlib.sha256(block).digest())
+                dst.write(compressor.compress(block))
+            dst.write(compressor.flush())
+        return method, crc, length, spool_path, time.perf_counter() - start_time, digests, read_len
+
+    with open(path, 'rb') as f:
+        zdict = b""
+        if offset > 0 and method == zipfile.ZIP_DEFLATED:
+            dict_start = max(0, offset - DEFLATE_WINDOW)
+            f.seek(dict_start)
+            zdict = f.read(offset - dict_start)
+        else:
+            f.seek(offset)
+        data = f.read(length)
+        read_len = len(data)
+        if is_last and f.read(1):
+            read_len += 1  # 文件比扫描时变长了
+
+    crc = zlib.crc32(data)
+    digests = [hashlib.sha256(data).digest()]
+    if method == zipfile.ZIP_STORED:
+        return method, crc, length, data, time.perf_counter() - start_time, digests, read_len
+
+    header, compressor = _new_compressor(method, level, zdict)
+    out = header + compressor.compress(data)
+    if method == zipfile.ZIP_DEFLATED:
+        out += compressor.flush(zlib.Z_FINISH if is_last else zlib.Z_FULL_FLUSH)
+    else:
+        out += compressor.flush()
+
+    # 整个文件只有一块且压缩后没有变小，改为直接存储
+    if offset == 0 and is_last and len(out) >= len(data):
+        return zipfile.ZIP_STORED, crc, length, data, time.perf_counter() - start_time, digests, read_len
+    return method, crc, length, out, time.perf_counter() - start_time, digests, read_len
+
+
+def _compress_task(pieces):
+    """工作进程入口：压缩一批数据块"""
+    return [_compress_piece(*piece) for piece in pieces]
+
+
+def _iter_pack_tasks(entries, level, spool_dir):
+    """把(源文件, 压缩包内路径, 大小, 修改时间, 权限位, 压缩方式)列表切分成压缩任务
+
+    每个任务是若干(path, offset, length, is_last, method, level, spool_dir)数据块，
+    小文件合并成批次，大文件单独提交，其中存储和Deflate的大文件再切成多个块。
+    """
+    batch = []
+    batch_bytes = 0
+    for path, arcname, size, mtime, mode, method in entries:
+        if size > PACK_CHUNK_SIZE:
+            if batch:
+                yield batch
+                batch, batch_bytes = [], 0
+            if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                yield [(path, 0, size, True, method, level, spool_dir)]
+                continue
+            offset = 0
+            while offset < size:
+                length = min(PACK_CHUNK_SIZE, size - offset)
+                yield [(path, offset, length, offset + length >= size, method, level, spool_dir)]
+                offset += length
+        else:
+            batch.append((path, 0, size, True, method, level, spool_dir))
+            batch_bytes += size
+            if batch_bytes >= PACK_BATCH_SIZE or len(batch) >= PACK_BATCH_FILES:
+                yield batch
+                batch, batch_bytes = [], 0
+    if batch:
+        yield batch
+
+
+def parallel_write_zip(zip_path, entries, workers, on_write=None,
+                       method=zipfile.ZIP_DEFLATED, level=6, force_zip64=False, hashes=None, timings=None):
+    """多进程压缩，由单一写入者把预压缩数据组装成标准ZIP文件
+
+    entries为scan_manifest生成的文件清单，workers为压缩进程数，method/level为压缩方式和级别；
+    zip_path也可以是VolumeWriter等文件对象，force_zip64为True时所有文件头都带ZIP64扩展字段；
+    hashes为字典时写入每个文件的摘要: {压缩包内路径: file_digest格式的SHA-256}；
+    timings为字典时写入每个文件在工作进程中的压缩耗时: {压缩包内路径: 秒数}；
+    每写入一块数据调用on_write(源文件, 压缩包内路径, 本块原始字节数, 本块压缩后字节数, 文件是否已写完)。
+    返回按压缩方式汇总的统计: {压缩方式: {'files', 'raw', 'packed', 'seconds', 'skipped'}}，
+    skipped是按扩展名或抽样检测直接存储、没有经过压缩的原始字节数。
+    """
+    entries = [entry + (choose_compress_method(entry[0], entry[2], method),) for entry in entries]
+    spool_dir = tempfile.mkdtemp(prefix="sfx_spool_",
+                                 dir=os.path.dirname(os.path.abspath(getattr(zip_path, 'name', zip_path))))
+    pending_files = deque(entries)
+    stats = {}
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = None
+
+    try:
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            # 当前正在写入的文件: [zinfo, 剩余字节, crc, 源文件, 是否ZIP64, 各块SHA-256, 压缩耗时, 实际读取字节数,
+            #                      预定的压缩方式]
+            current = None
+
+            def write_piece(method, crc, raw_len, data, seconds, digests, read_len):
+                nonlocal current
+                if current is None:
+                    path, arcname, size, mtime, mode, planned = pending_files.popleft()
+                    # 直接使用清单中的文件信息，不再逐个读取文件属性
+                    zinfo = zipfile.ZipInfo(arcname, time.localtime(mtime)[:6])
+                    zinfo.external_attr = (mode & 0xFFFF) << 16
+                    zinfo.compress_type = method
+                    if method == zipfile.ZIP_LZMA:
+                        zinfo.flag_bits |= 0x02  # LZMA数据带结束标记
+                    zinfo.file_size = size
+                    zinfo.compress_size = 0
+                    zinfo.CRC = 0
+                    zinfo.header_offset = zipf.fp.tell()
+                    # 与zipfile一致：可能超过4GB的文件预留ZIP64扩展字段
+                    zip64 = force_zip64 or size * 1.05 > zipfile.ZIP64_LIMIT
+                    zipf.fp.write(zinfo.FileHeader(zip64))
+                    current = [zinfo, size, None, path, zip64, [], 0.0, 0, planned]
+
+                zinfo = current[0]
+                if isinstance(data, str):
+                    # 大文件的压缩结果在临时文件中，复制后删除
+                    with open(data, 'rb') as spool:
+                        shutil.copyfileobj(spool, zipf.fp, 1024 * 1024)
+                    packed_len = os.path.getsize(data)
+                    os.remove(data)
+                else:
+                    zipf.fp.write(data)
+                    packed_len = len(data)
+                zinfo.compress_size += packed_len
+                current[1] -= raw_len
+                current[5].extend(digests)
+                current[6] += seconds
+                current[7] += read_len
+                if current[2] is None:
+                    current[2] = crc
+                else:
+                    current[2] = crc32_combine(current[2], crc, raw_len)
+
+                method_stats = stats.setdefault(zinfo.compress_type,
+                                                {'files': 0, 'raw': 0, 'packed': 0, 'seconds': 0.0, 'skipped': 0})
+                method_stats['raw'] += raw_len
+                if current[8] == zipfile.ZIP_STORED:
+                    method_stats['skipped'] += raw_len
+                method_stats['packed'] += packed_len
+                method_stats['seconds'] += seconds
+
+                path = current[3]
+                file_done = current[1] <= 0
+                if file_done:
+                    # 文件在扫描后被截断或追加时，读到的数据与清单中的大小不符，压缩包会损坏
+                    if current[7] != zinfo.file_size:
+                        raise Exception(f"文件在打包过程中被修改（扫描时 {zinfo.file_size} 字节，读取时大小不同），"
+                                        f"请重新打包: {path}")
+                    method_stats['files'] += 1
+                    # 文件写完，回填本地文件头中的CRC和大小
+                    zinfo.CRC = current[2] if current[2] is not None else 0
+                    end = zipf.fp.tell()
+                    zipf.fp.seek(zinfo.header_offset)
+                    zipf.fp.write(zinfo.FileHeader(current[4]))
+                    zipf.fp.seek(end)
+                    zipf.filelist.append(zinfo)
+                    zipf.NameToInfo[zinfo.filename] = zinfo
+                    if hashes is not None:
+                        hashes[zinfo.filename] = combine_chunk_digests(current[5])
+                    if timings is not None:
+                        timings[zinfo.filename] = current[6]
+                    zipf.start_dir = end
+                    zipf._didModify = True
+                    current = None
+                if on_write:
+                    on_write(path, zinfo.filename, raw_len, packed_len, file_done)
+
+            def write_result(results):
+                for result in results:
+                    write_piece(*result)
+
+            if executor is None:
+                for task in _iter_pack_tasks(entries, level, spool_dir):
+                    write_result(_compress_task(task))
+            else:
+                # 限制在途任务数量，保证内存占用有上限，同时按提交顺序写入
+                in_flight = deque()
+                for task in _iter_pack_tasks(entries, level, spool_dir):
+                    in_flight.append(executor.submit(_compress_task, task))
+                    if len(in_flight) >= workers * 4:
+                        write_result(in_flight.popleft().result())
+                while in_flight:
+                    write_result(in_flight.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return stats
+
+
+def format_method_stats(stats):
+    """把parallel_write_zip返回的统计整理成日志行"""
+    lines = []
+    compressed = [item for method, item in stats.items() if method != zipfile.ZIP_STORED]
+    for method, item in sorted(stats.items()):
+        line = (f"{COMPRESSION_NAMES.get(method, method)}: {item['files']} 个文件, "
+                f"{format_size(item['raw'])} -> {format_size(item['packed'])}")
+        if method == zipfile.ZIP_STORED:
+            # 按本次压缩的实际速度估算跳过压缩节省的时间；压缩后没有变小才改为存储的文件已经压缩过，不计入
+            raw = sum(c['raw'] for c in compressed)
+            seconds = sum(c['seconds'] for c in compressed)
+            if seconds > 0 and raw and item['skipped']:
+                saved = item['skipped'] / (raw / seconds)
+                line += f", 跳过压缩约节省 {saved:.1f} 秒CPU时间"
+        else:
+            line += f", 节省 {format_size(item['raw'] - item['packed'])}, 耗时 {item['seconds']:.1f} 秒CPU时间"
+        lines.append(line)
+    return lines
+
+
+def get_excluded_modules(method):
+    """解压程序只打包所需的解压库，返回需要排除的模块"""
+    decoders = {
+        zipfile.ZIP_BZIP2: ["bz2", "_bz2"],
+        zipfile.ZIP_LZMA: ["lzma", "_lzma"],
+        ZIP_ZSTANDARD: ["zstandard"],
+    }
+    excluded = [module for codec, modules in decoders.items() if codec != method for module in modules]
+    # 图片已在打包时转换好，解压程序不需要PIL
+    return excluded + ["PIL"]
+
+
+def render_splash(image_path, output_dir):
+    """把图片缩放到解压界面的显示尺寸并保存为PNG，返回生成的图片路径（output_dir/SPLASH_NAME）
+
+    未安装Pillow时只能直接使用PNG/GIF图片。
+    """
+    splash_path = os.path.join(output_dir, SPLASH_NAME)
+    try:
+        from PIL import Image
+    except ImportError:
+        if not image_path.lower().endswith(SPLASH_FORMATS):
+            raise Exception("转换图片需要安装Pillow库，或者直接选择PNG/GIF图片")
+        shutil.copy2(image_path, splash_path)
+        return splash_path
+
+    with Image.open(image_path) as image:
+        image.draft("RGB", SPLASH_SIZE)  # JPEG解码时直接按缩小后的尺寸解码
+        image.thumbnail(SPLASH_SIZE)
+        if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(splash_path, "PNG", optimize=True)
+    return splash_path
+
+
+class ZstdZipDecompressor:
+    """让zipfile能够读取Zstandard压缩（方式93）的成员"""
+
+    def __init__(self):
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self.eof = False
+
+    def decompress(self, data):
+        if self.eof or not data:
+            return b""
+        out = self._decompressor.decompress(data)
+        self.eof = getattr(self._decompressor, 'eof', False)
+        return out
+
+
+def enable_zipfile_zstd():
+    """为不支持Zstandard的zipfile（Python 3.14以前）注册解压器"""
+    if hasattr(zipfile, "ZIP_ZSTANDARD") or zstandard is None:
+        return
+    get_decompressor = zipfile._get_decompressor
+
+    def _get_decompressor(compress_type):
+        if compress_type == ZIP_ZSTANDARD:
+            return ZstdZipDecompressor()
+        return get_decompressor(compress_type)
+
+    zipfile._get_decompressor = _get_decompressor
+
+
+enable_zipfile_zstd()
+
+
+def compare_codecs(paths, sample_limit=16 * 1024 * 1024):
+    """用待压缩文件的样本对比各压缩方式，返回[(名称, 级别, 压缩率, 压缩MB/s, 解压MB/s)]"""
+    sample = bytearray()
+    for path in paths:
+        if len(sample) >= sample_limit:
+            break
+        with open(path, 'rb') as f:
+            sample += f.read(sample_limit - len(sample))
+    sample = bytes(sample)
+    if not sample:
+        return []
+
+    results = []
+    for name, (method, level, _, _) in COMPRESSION_CODECS.items():
+        if method == ZIP_ZSTANDARD and zstandard is None:
+            continue
+        start_time = time.perf_counter()
+        header, compressor = _new_compressor(method, level)
+        packed = header + compressor.compress(sample) + compressor.flush()
+        compress_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        zipfile._get_decompressor(method).decompress(packed)
+        decompress_seconds = time.perf_counter() - start_time
+
+        mb = len(sample) / (1024 * 1024)
+        results.append((name, level, len(packed) / len(sample),
+                        mb / max(compress_seconds, 1e-9), mb / max(decompress_seconds, 1e-9)))
+    return results
+
+
+# stub模式: 预编译解压程序 + 图片 + ZIP数据 + 图片名 + 固定长度的尾部索引
+# 解压程序末尾是PyInstaller归档（CArchive）时，数据插在归档之前，归档的cookie仍在文件末尾
+STUB_MAGIC = b"SFXSTUB1"
+STUB_TRAILER = struct.Struct("<8sQQQQH")  # 标记, 图片偏移, 图片大小, ZIP偏移, ZIP大小, 图片名长度
+PYINSTALLER_MAGIC = b"MEI\x0c\x0b\x0a\x0b\x0e"  # PyInstaller归档的cookie标记
+PYINSTALLER_COOKIE = struct.Struct("!8sIIii64s")  # 标记, 归档长度, 目录偏移, 目录长度, Python版本, Python库名
+
+
+def get_cache_dir(*parts):
+    """返回本工具的用户级缓存目录（不存在时自动创建）"""
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, "SelfExtractor", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_contains(path, pattern, block_size=1024 * 1024):
+    """分块查找文件中是否包含指定字节串"""
+    overlap = len(pattern) - 1
+    tail = b""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return False
+            if pattern in tail + block:
+                return True
+            tail = block[-overlap:]
+
+
+def find_package_start(f, file_size):
+    """文件末尾正好是PyInstaller归档的cookie时返回归档的起始偏移，否则返回None"""
+    if file_size < PYINSTALLER_COOKIE.size:
+        return None
+    f.seek(file_size - PYINSTALLER_COOKIE.size)
+    magic, package_len, _, _, _, _ = PYINSTALLER_COOKIE.unpack(f.read(PYINSTALLER_COOKIE.size))
+    if magic != PYINSTALLER_MAGIC or package_len > file_size:
+        return None
+    return file_size - package_len
+
+
+def append_stub_payload(stub_path, image_path, zip_path, output_path):
+    """把图片和ZIP数据加入预编译解压程序，生成自解压EXE
+
+    PyInstaller启动器从文件末尾向前查找归档的cookie，数据追加在末尾时启动耗时随数据大小增长，
+    所以解压程序以归档结尾时数据插在归档之前；否则（例如Linux下归档在ELF节中）追加在文件末尾。
+    zip_path为None时只加入图片，ZIP大小记为0，表示数据在EXE旁边的分卷文件中。
+    """
+    with open(stub_path, 'rb') as stub, open(output_path, 'wb') as out:
+        stub.seek(0, os.SEEK_END)
+        stub_size = stub.tell()
+        package_start = find_package_start(stub, stub_size)
+        split = stub_size if package_start is None else package_start
+        stub.seek(0)
+        remaining = split
+        while remaining > 0:
+            block = stub.read(min(remaining, 1024 * 1024))
+            out.write(block)
+            remaining -= len(block)
+
+        image_offset = out.tell()
+        with open(image_path, 'rb') as f:
+            shutil.copyfileobj(f, out, 1024 * 1024)
+        image_size = out.tell() - image_offset
+
+        zip_offset = out.tell()
+        if zip_path is not None:
+            with open(zip_path, 'rb') as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+        zip_size = out.tell() - zip_offset
+
+        image_name = os.path.basename(image_path).encode('utf-8')
+        out.write(image_name)
+        out.write(STUB_TRAILER.pack(STUB_MAGIC, image_offset, image_size, zip_offset, zip_size, len(image_name)))
+
+        # 归档内的偏移都相对于归档起始位置，整体后移不影响启动器读取
+        shutil.copyfileobj(stub, out, 1024 * 1024)
+
+    # 保留可执行权限
+    shutil.copymode(stub_path, output_path)
+
+
+def read_stub_trailer(path):
+    """读取stub模式EXE的索引，返回(图片偏移, 图片大小, ZIP偏移, ZIP大小, 图片名)，不是则返回None
+
+    索引在文件末尾，数据插在PyInstaller归档之前时索引紧挨在归档之前。
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        package_start = find_package_start(f, end)
+        if package_start is not None:
+            end = package_start
+        if end < STUB_TRAILER.size:
+            return None
+        f.seek(end - STUB_TRAILER.size)
+        magic, image_offset, image_size, zip_offset, zip_size, name_len = STUB_TRAILER.unpack(
+            f.read(STUB_TRAILER.size))
+        if magic != STUB_MAGIC:
+            return None
+        f.seek(end - STUB_TRAILER.size - name_len)
+        image_name = f.read(name_len).decode('utf-8')
+    return image_offset, image_size, zip_offset, zip_size, image_name
+
+
+class PayloadSlice:
+    """只读文件对象，表示EXE中的一段数据
+
+    整个EXE以只读方式映射到内存，读取时直接从映射中切片，不需要先把数据释放到临时目录；
+    无法映射时（例如32位系统上的超大文件）改用普通文件读取。
+    """
+
+    def __init__(self, path, offset, size):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, OverflowError):
+            self.map = None
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(0, min(pos, self.size))
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, n=-1):
+        if n is None or n < 0 or n > self.size - self.pos:
+            n = self.size - self.pos
+        start = self.offset + self.pos
+        if self.map is not None:
+            data = self.map[start:start + n]
+        else:
+            self.file.seek(start)
+            data = self.file.read(n)
+        self.pos += len(data)
+        return data
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# 分卷模式: ZIP数据按固定大小拆分成EXE旁边的 名称.001、名称.002 ...，不再追加到EXE中
+VOLUME_MIN_SIZE = 1024 * 1024
+VOLUME_OPEN_FILES = 8  # 同时保持打开的分卷数量
+
+
+def find_volumes(path):
+    """返回与path同名的分卷文件列表（名称.001起连续编号），没有分卷时返回空列表"""
+    base = os.path.splitext(path)[0]
+    volumes = []
+    while os.path.isfile(f"{base}.{len(volumes) + 1:03d}"):
+        volumes.append(f"{base}.{len(volumes) + 1:03d}")
+    return volumes
+
+
+class VolumeReader:
+    """只读文件对象，把多个分卷当作一个连续文件读取
+
+    按需打开分卷，最多同时保持VOLUME_OPEN_FILES个文件句柄，内存占用与数据大小无关。
+    """
+
+    def __init__(self, paths, mode='rb'):
+        self.paths = list(paths)
+        self.mode = mode
+        self.sizes = [os.path.getsize(path) for path in self.paths]
+        self.starts = []
+        start = 0
+        for size in self.sizes:
+            self.starts.append(start)
+            start += size
+        self.size = start
+        self.pos = 0
+        self.files = {}
+
+    def _file(self, index):
+        f = self.files.pop(index, None)
+        if f is None:
+            if len(self.files) >= VOLUME_OPEN_FILES:
+                self.files.pop(next(iter(self.files))).close()
+            f = open(self.paths[index], self.mode)
+        self.files[index] = f  # 重新插入，字典顺序即最近使用顺序
+        return f
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(0, pos)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, n=-1):
+        end = self.size if n is None or n < 0 else min(self.size, self.pos + n)
+        chunks = []
+        while self.pos < end:
+            index = bisect.bisect_right(self.starts, self.pos) - 1
+            f = self._file(index)
+            f.seek(self.pos - self.starts[index])
+            data = f.read(min(end, self.starts[index] + self.sizes[index]) - self.pos)
+            if not data:
+                break
+            chunks.append(data)
+            self.pos += len(data)
+        return b"".join(chunks)
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_volumes(path):
+    """打开path旁边的全部分卷"""
+    volumes = find_volumes(path)
+    if not volumes:
+        raise Exception(f"未找到分卷文件: {os.path.splitext(path)[0]}.001")
+    return VolumeReader(volumes)
+
+
+class VolumeWriter(VolumeReader):
+    """可读写的文件对象，写入的数据按volume_size依次拆分到 base_path.001、base_path.002 ...
+
+    zipfile可以直接在上面写入和回填文件头，每个分卷都是普通文件，可以单独校验。
+    """
+
+    def __init__(self, base_path, volume_size):
+        # 删除上次生成的分卷；base_path已去掉扩展名，不能再用find_volumes（会再去掉一次"扩展名"）
+        number = 1
+        while os.path.isfile(f"{base_path}.{number:03d}"):
+            os.remove(f"{base_path}.{number:03d}")
+            number += 1
+        super().__init__([], 'r+b')
+        self.name = base_path
+        self.volume_size = volume_size
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        written = len(view)
+        while view:
+            index, offset = divmod(self.pos, self.volume_size)
+            while index >= len(self.paths):
+                path = f"{self.name}.{len(self.paths) + 1:03d}"
+                open(path, 'wb').close()
+                self.paths.append(path)
+                self.starts.append(len(self.sizes) * self.volume_size)
+                self.sizes.append(0)
+            n = min(len(view), self.volume_size - offset)
+            f = self._file(index)
+            f.seek(offset)
+            f.write(view[:n])
+            self.sizes[index] = max(self.sizes[index], offset + n)
+            self.pos += n
+            view = view[n:]
+        self.size = max(self.size, self.pos)
+        return written
+
+    def truncate(self, size=None):
+        size = self.pos if size is None else size
+        keep = max(1, -(-size // self.volume_size))  # 至少保留第一个分卷
+        for index in range(len(self.paths) - 1, keep - 1, -1):
+            f = self.files.pop(index, None)
+            if f is not None:
+                f.close()
+            os.remove(self.paths.pop())
+            self.starts.pop()
+            self.sizes.pop()
+        if self.paths:
+            last = len(self.paths) - 1
+            self.sizes[last] = size - self.starts[last]
+            self._file(last).truncate(self.sizes[last])
+        self.size = size
+        return size
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+
+def _hash_volume(path):
+    """计算分卷的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def write_volume_checksums(volumes, checksum_path, workers):
+    """多线程计算每个分卷的SHA-256，按sha256sum格式写入checksum_path，可用 sha256sum -c 单独校验任意分卷"""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        digests = list(executor.map(_hash_volume, volumes))
+    with open(checksum_path, 'w', encoding='utf-8') as f:
+        for path, digest in zip(volumes, digests):
+            f.write(f"{digest} *{os.path.basename(path)}\n")
+
+
+def verify_volumes(checksum_path, workers=None):
+    """按校验文件并行检查各分卷，返回[(分卷名, 结果)]，结果为"正常"、"损坏"或"缺失"
+
+    每个分卷单独校验，缺少其他分卷时也能检查已有的分卷。
+    """
+    folder = os.path.dirname(os.path.abspath(checksum_path))
+    expected = []
+    with open(checksum_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                digest, name = line.rstrip("\n").split(" ", 1)
+                expected.append((name.lstrip("*"), digest))
+
+    def check(item):
+        name, digest = item
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            return name, "缺失"
+        return name, "正常" if _hash_volume(path) == digest else "损坏"
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        return list(executor.map(check, expected))
+
+
+# PyInstaller onefile归档（CArchive）的目录结构，用于在完整构建的EXE中定位打包进归档的数据
+PYINSTALLER_TOC_ENTRY = struct.Struct("!IIIIBc")  # 条目长度, 数据偏移, 数据长度, 原始长度, 是否压缩, 类型
+PAYLOAD_SEARCH_SIZE = 64 * 1024  # 从文件末尾向前查找归档标记的范围
+PAYLOAD_NAME = "packed_files.zip"  # 完整构建时打包进PyInstaller归档的ZIP文件名
+
+
+def locate_payload(path):
+    """在自解压EXE中定位打包的ZIP数据，返回(偏移, 大小, 是否压缩存放)，找不到返回None
+
+    依次检查本工具追加数据的尾部索引、PyInstaller归档目录中的packed_files.zip、文件末尾的ZIP目录，
+    只从文件末尾读取少量数据，不解压任何内容。
+    """
+    trailer = read_stub_trailer(path)
+    if trailer is not None:
+        return trailer[2], trailer[3], False
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        tail_size = min(file_size, PAYLOAD_SEARCH_SIZE)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+
+        pos = tail.rfind(PYINSTALLER_MAGIC)
+        if pos >= 0 and len(tail) - pos >= PYINSTALLER_COOKIE.size:
+            _, package_len, toc_offset, toc_len, _, _ = PYINSTALLER_COOKIE.unpack_from(tail, pos)
+            package_start = file_size - tail_size + pos + PYINSTALLER_COOKIE.size - package_len
+            f.seek(package_start + toc_offset)
+            toc = f.read(toc_len)
+            offset = 0
+            while offset + PYINSTALLER_TOC_ENTRY.size <= len(toc):
+                entry_len, data_offset, data_len, _, compressed, _ = PYINSTALLER_TOC_ENTRY.unpack_from(toc, offset)
+                if entry_len <= PYINSTALLER_TOC_ENTRY.size:
+                    break
+                name = toc[offset + PYINSTALLER_TOC_ENTRY.size:offset + entry_len].rstrip(b"\0")
+                if name.decode('utf-8', errors='replace') == PAYLOAD_NAME:
+                    return package_start + data_offset, data_len, bool(compressed)
+                offset += entry_len
+            return None
+
+        if find_central_directory(f, file_size) is not None:
+            return 0, file_size, False
+    return None
+
+
+def open_payload(path):
+    """返回自解压EXE中打包的ZIP数据（文件对象），本身就是ZIP文件时返回路径
+
+    数据在EXE中原样存放时直接映射读取；压缩存放在PyInstaller归档中时解压到临时文件。
+    """
+    location = locate_payload(path)
+    if location is None:
+        raise Exception("所选文件不是有效的自解压文件，未找到压缩数据")
+    offset, size, compressed = location
+    if size == 0:
+        # 分卷模式，ZIP数据在EXE旁边的分卷文件中
+        return open_volumes(path)
+    if not compressed:
+        if offset == 0 and size == os.path.getsize(path):
+            return path
+        return PayloadSlice(path, offset, size)
+
+    spool = tempfile.TemporaryFile()
+    decompressor = zlib.decompressobj()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            remaining -= len(block)
+            spool.write(decompressor.decompress(block))
+    spool.write(decompressor.flush())
+    spool.seek(0)
+    return spool
+
+
+def open_archive(path):
+    """打开自解压EXE或ZIP文件中的压缩包，关闭返回的ZipFile时一并关闭数据"""
+    source = open_payload(path)
+    zip_ref = zipfile.ZipFile(source, 'r')
+    if source is not path:
+        zip_ref._filePassed = 0  # 由ZipFile负责关闭数据文件
+    return zip_ref
+
+
+# PyInstaller构建缓存: 每个缓存项保存一份工作目录（分析结果、PYZ等中间产物）
+BUILD_CACHE_LIMIT = 2 * 1024 * 1024 * 1024  # 缓存总大小上限，超出后按最近使用时间淘汰
+BUILD_CACHE_LOCK = ".lock"
+BUILD_CACHE_STALE_LOCK = 6 * 3600  # 超过该时间的锁视为异常退出遗留
+EXTRACTOR_BUILD_NAME = "extractor"  # 完整构建时PyInstaller使用的固定名称，生成后再移动到输出路径
+
+
+def get_dir_size(path):
+    """计算目录总大小"""
+    total = 0
+    for root_dir, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root_dir, file))
+            except OSError:
+                pass
+    return total
+
+
+def acquire_build_cache(key):
+    """锁定指定键的构建缓存目录并返回其路径，被占用时返回None"""
+    entry = get_cache_dir("builds", key)
+    lock_path = os.path.join(entry, BUILD_CACHE_LOCK)
+    try:
+        if time.time() - os.path.getmtime(lock_path) > BUILD_CACHE_STALE_LOCK:
+            os.remove(lock_path)
+    except OSError:
+        pass
+
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    os.close(fd)
+    return entry
+
+
+def release_build_cache(entry):
+    """释放构建缓存目录的锁，并更新其最近使用时间"""
+    try:
+        os.remove(os.path.join(entry, BUILD_CACHE_LOCK))
+    except OSError:
+        pass
+    os.utime(entry)
+
+
+def evict_build_cache(limit):
+    """按最近使用时间淘汰构建缓存，直到总大小不超过limit，返回被删除的目录"""
+    cache_root = get_cache_dir("builds")
+    entries = []
+    for name in os.listdir(cache_root):
+        entry = os.path.join(cache_root, name)
+        if os.path.isdir(entry):
+            entries.append((os.path.getmtime(entry), entry, get_dir_size(entry)))
+
+    total = sum(size for _, _, size in entries)
+    removed = []
+    for _, entry, size in sorted(entries):
+        if total <= limit:
+            break
+        # 正在使用的缓存不能删除
+        if os.path.exists(os.path.join(entry, BUILD_CACHE_LOCK)):
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed.append(entry)
+    return removed
+
+
+# 压缩包预览: 直接解析中央目录生成紧凑索引，不创建ZipInfo对象
+ZIP_EOCD_SEARCH = 65536 + zipfile.sizeEndCentDir  # 中央目录结束记录可能位于文件末尾的范围（含注释）
+# 中央目录项中预览用到的字段: 标记, 标志位, 压缩后大小, 大小, 文件名长度, 扩展字段长度, 注释长度
+ZIP_CENTRAL_ENTRY = struct.Struct("<4s4xH10xLL3H12x")
+
+
+class ArchiveIndex:
+    """压缩包中央目录的紧凑索引，用于预览大量文件
+
+    所有文件名依次存放在一个bytes缓冲区中，名称结束位置、大小、压缩后大小存放在array中；
+    目录以压缩包内路径（bytes）为键，记录子目录、直接包含的文件序号以及包含子目录在内的汇总。
+    """
+
+    def __init__(self):
+        self.names = bytearray()
+        self.name_ends = array('Q')
+        self.utf8 = array('B')  # 文件名是否为UTF-8编码
+        self.sizes = array('Q')
+        self.packed_sizes = array('Q')
+        # 目录 -> [子目录名集合, 文件序号array, 文件总数, 总大小, 压缩后总大小]
+        self.dirs = {b"": [set(), array('L'), 0, 0, 0]}
+        self.dir_utf8 = {}  # 目录 -> 目录名是否为UTF-8编码（与首次出现该目录的文件名一致）
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _get_dir(self, path, utf8=True):
+        node = self.dirs.get(path)
+        if node is None:
+            node = self.dirs[path] = [set(), array('L'), 0, 0, 0]
+            self.dir_utf8[path] = bool(utf8)
+            parent, _, name = path.rpartition(b"/")
+            self._get_dir(parent, utf8)[0].add(name)
+        return node
+
+    def add(self, raw_name, utf8, size, packed_size):
+        """登记一个文件（压缩包内路径为bytes）"""
+        node = self._get_dir(raw_name[:raw_name.rfind(b"/") + 1][:-1], utf8)
+        node[1].append(len(self.sizes))
+        node[2] += 1
+        node[3] += size
+        node[4] += packed_size
+        self.names += raw_name
+        self.name_ends.append(len(self.names))
+        self.utf8.append(1 if utf8 else 0)
+        self.sizes.append(size)
+        self.packed_sizes.append(packed_size)
+
+    def finish(self):
+        """把每个目录的汇总累加到上级目录"""
+        for path in sorted(self.dirs, key=lambda p: p.count(b"/"), reverse=True):
+            if path:
+                node = self.dirs[path]
+                parent = self.dirs[path.rpartition(b"/")[0]]
+                parent[2] += node[2]
+                parent[3] += node[3]
+                parent[4] += node[4]
+
+    def name(self, index):
+        """文件在压缩包内的完整路径"""
+        start = self.name_ends[index - 1] if index else 0
+        raw = bytes(self.names[start:self.name_ends[index]])
+        return raw.decode('utf-8' if self.utf8[index] else 'cp437', errors='replace')
+
+    def dir_name(self, path):
+        """目录的名称（最后一级），与文件名一样按UTF-8标记选择编码"""
+        raw = path.rpartition(b"/")[2]
+        return raw.decode('utf-8' if self.dir_utf8.get(path, True) else 'cp437', errors='replace')
+
+    def children(self, path=b""):
+        """返回(排序后的子目录路径列表, 文件序号array)"""
+        node = self.dirs[path]
+        prefix = path + b"/" if path else b""
+        return [prefix + name for name in sorted(node[0])], node[1]
+
+    def totals(self, path=b""):
+        """返回目录的(文件数, 总大小, 压缩后总大小)"""
+        return tuple(self.dirs[path][2:])
+
+
+def find_central_directory(f, end):
+    """从end向前查找ZIP结束记录，返回(中央目录的文件偏移, 中央目录大小, ZIP数据起始偏移)，找不到返回None
+
+    支持ZIP64以及前面带有其他数据（如EXE）的文件，只读取末尾的一小段数据。
+    """
+    tail_size = min(end, ZIP_EOCD_SEARCH)
+    f.seek(end - tail_size)
+    tail = f.read(tail_size)
+    pos = tail.rfind(zipfile.stringEndArchive)
+    if pos < 0 or len(tail) - pos < zipfile.sizeEndCentDir:
+        return None
+    _, _, _, _, _, cd_size, cd_offset, _ = struct.unpack_from(zipfile.structEndArchive, tail, pos)
+    cd_end = end - tail_size + pos
+
+    # 超出32位范围时从ZIP64结束记录读取
+    locator_pos = pos - zipfile.sizeEndCentDir64Locator
+    if locator_pos >= 0 and tail[locator_pos:locator_pos + 4] == zipfile.stringEndArchive64Locator:
+        cd_end -= zipfile.sizeEndCentDir64Locator + zipfile.sizeEndCentDir64
+        f.seek(cd_end)
+        record = f.read(zipfile.sizeEndCentDir64)
+        if record[:4] == zipfile.stringEndArchive64:
+            _, _, _, _, _, _, _, _, cd_size, cd_offset = struct.unpack(zipfile.structEndArchive64, record)
+
+    # ZIP前面拼接了其他数据时，记录中的偏移需要加上这段数据的长度
+    cd_start = cd_end - cd_size
+    if cd_start < 0 or cd_start < cd_offset:
+        return None
+    if cd_size:
+        f.seek(cd_start)
+        if f.read(4) != zipfile.stringCentralDir:
+            return None
+    return cd_start, cd_size, cd_start - cd_offset
+
+
+def _read_central_directory(f):
+    """读取ZIP中央目录的原始数据，返回(数据, ZIP数据起始偏移)"""
+    f.seek(0, os.SEEK_END)
+    location = find_central_directory(f, f.tell())
+    if location is None:
+        raise Exception("未找到ZIP目录，不是有效的压缩包")
+    cd_start, cd_size, zip_start = location
+    f.seek(cd_start)
+    data = f.read(cd_size)
+    if len(data) != cd_size:
+        raise Exception("ZIP目录不完整，压缩包可能已损坏")
+    return data, zip_start
+
+
+def _read_small_member(f, data, pos, zip_start):
+    """读取中央目录中pos处条目的数据，用于读取很小的压缩包信息文件，只支持存储和Deflate，不支持时返回None"""
+    method, packed_size, name_len, extra_len, header_offset = struct.unpack_from("<10xH8xL4xHH10xL", data, pos)
+    if header_offset == 0xFFFFFFFF:
+        # 本地文件头偏移超出32位范围，存放在ZIP64扩展字段中（大小都没有超出范围）
+        extra_start = pos + ZIP_CENTRAL_ENTRY.size + name_len
+        extra = data[extra_start:extra_start + extra_len]
+        while len(extra) >= 4:
+            tag, length = struct.unpack_from("<HH", extra)
+            if tag == 1:
+                header_offset, = struct.unpack_from("<Q", extra, 4)
+                break
+            extra = extra[4 + length:]
+    f.seek(zip_start + header_offset)
+    header = f.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise Exception("ZIP目录格式错误，压缩包可能已损坏")
+    local_name_len, local_extra_len = struct.unpack_from("<HH", header, 26)
+    f.seek(zip_start + header_offset + zipfile.sizeFileHeader + local_name_len + local_extra_len)
+    packed = f.read(packed_size)
+    if method == zipfile.ZIP_STORED:
+        return packed
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(packed, -15)
+    return None
+
+
+def build_archive_index(path):
+    """读取压缩包或自解压EXE的中央目录，生成ArchiveIndex
+
+    列出的文件与解压时写出的一致：不含压缩包信息文件和二进制补丁，
+    包含去重后只存储一份的重复文件，增量包中的补丁显示为它更新的文件。
+    """
+    source = open_payload(path)
+    with open(source, 'rb') if isinstance(source, str) else source as f:
+        data, zip_start = _read_central_directory(f)
+        index, info_pos, patch_sizes = _index_central_directory(data)
+        info = None
+        if info_pos is not None:
+            raw_info = _read_small_member(f, data, info_pos, zip_start)
+            if raw_info is not None:
+                info = json.loads(raw_info.decode('utf-8'))
+
+    if info:
+        # 重复文件和补丁更新的文件都以压缩包内路径登记，压缩后大小计入实际存储的数据
+        prefix = "packed_files/"
+        files = info["files"]
+        for rel_path in info.get("links", {}):
+            index.add((prefix + rel_path).encode('utf-8'), True, files[rel_path][0], 0)
+        for rel_path in (info["delta"] or {}).get("patches", []):
+            index.add((prefix + rel_path).encode('utf-8'), True, files[rel_path][0], patch_sizes.get(rel_path, 0))
+    index.finish()
+    return index
+
+
+def _index_central_directory(data):
+    """把中央目录中的文件登记到ArchiveIndex，返回(索引, 压缩包信息文件的条目位置, {补丁相对路径: 压缩后大小})"""
+    info_name = ARCHIVE_INFO_NAME.encode('utf-8')
+    delta_prefix = DELTA_PREFIX.encode('utf-8')
+    info_pos = None
+    patch_sizes = {}
+
+    # 条目数量可能达到数十万，循环内只使用局部变量，相邻条目通常位于同一目录，缓存上一次的目录
+    index = ArchiveIndex()
+    names, name_ends, utf8, sizes, packed_sizes = (
+        index.names, index.name_ends, index.utf8, index.sizes, index.packed_sizes)
+    get_dir = index._get_dir
+    unpack_entry = ZIP_CENTRAL_ENTRY.unpack_from
+    entry_size = ZIP_CENTRAL_ENTRY.size
+    last_dir = last_node = None
+    pos = 0
+    while pos + entry_size <= len(data):
+        signature, flags, packed_size, size, name_len, extra_len, comment_len = unpack_entry(data, pos)
+        if signature != zipfile.stringCentralDir:
+            raise Exception("ZIP目录格式错误，压缩包可能已损坏")
+        entry_pos = pos
+        name_start = pos + entry_size
+        extra_start = name_start + name_len
+        pos = extra_start + extra_len + comment_len
+        raw_name = data[name_start:extra_start]
+        if raw_name.endswith(b"/"):
+            # 目录项只登记目录
+            get_dir(raw_name.rstrip(b"/"), flags & 0x800)
+            continue
+        if size == 0xFFFFFFFF or packed_size == 0xFFFFFFFF:
+            # ZIP64扩展字段中依次存放超出范围的大小和压缩后大小
+            extra = data[extra_start:extra_start + extra_len]
+            while len(extra) >= 4:
+                tag, length = struct.unpack_from("<HH", extra)
+                if tag == 1:
+                    values = iter(struct.unpack_from(f"<{length // 8}Q", extra, 4))
+                    if size == 0xFFFFFFFF:
+                        size = next(values)
+                    if packed_size == 0xFFFFFFFF:
+                        packed_size = next(values)
+                    break
+                extra = extra[4 + length:]
+
+        # 压缩包信息文件和二进制补丁不是解压后的文件（打包的文件都在packed_files/下，先只比较首字节）
+        if raw_name[:1] == b"_":
+            if raw_name == info_name:
+                info_pos = entry_pos
+                continue
+            if raw_name.startswith(delta_prefix):
+                patch_sizes[raw_name[len(delta_prefix):].decode('utf-8', errors='replace')] = packed_size
+                continue
+
+        dir_path = raw_name[:raw_name.rfind(b"/") + 1]
+        if dir_path != last_dir:
+            last_dir = dir_path
+            last_node = get_dir(dir_path[:-1], flags & 0x800)
+        last_node[1].append(len(sizes))
+        last_node[2] += 1
+        last_node[3] += size
+        last_node[4] += packed_size
+        names += raw_name
+        name_ends.append(len(names))
+        utf8.append(1 if flags & 0x800 else 0)
+        sizes.append(size)
+        packed_sizes.append(packed_size)
+    return index, info_pos, patch_sizes
+
+
+# 解压相关参数
+EXTRACT_BUFFER_SIZE = 1024 * 1024  # 流式解压时复用的缓冲区大小
+
+
+def get_target_path(extract_path, relative_path):
+    """计算成员的解压目标路径，拒绝跳出解压目录的路径"""
+    root = os.path.abspath(extract_path)
+    target_path = os.path.abspath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, target_path]) != root:
+        raise Exception(f"非法的文件路径: {relative_path}")
+    return target_path
+
+
+class ExtractionCancelled(Exception):
+    """解压被用户取消"""
+
+
+def stream_member(zip_ref, member, target_path, buffer, is_cancelled=None):
+    """把ZIP成员直接流式写入目标路径，buffer为复用的bytearray
+
+    每写完一个缓冲区检查一次is_cancelled，取消时删除写了一半的文件并抛出ExtractionCancelled，
+    大文件也能在一个缓冲区的时间内停下来。写完后把修改时间设为成员记录的时间，供同步模式比较。
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if os.path.isdir(target_path):
+        shutil.rmtree(target_path)
+    view = memoryview(buffer)
+    cancelled = False
+    with zip_ref.open(member) as src, open(target_path, 'wb') as dst:
+        while True:
+            n = src.readinto(view)
+            if not n:
+                break
+            dst.write(view[:n])
+            if is_cancelled and is_cancelled():
+                cancelled = True
+                break
+    if cancelled:
+        os.remove(target_path)
+        raise ExtractionCancelled()
+    mtime = zip_mtime(zip_ref.getinfo(member) if isinstance(member, str) else member)
+    os.utime(target_path, (mtime, mtime))
+
+
+def zip_mtime(info):
+    """ZIP成员记录的修改时间（本地时间）转为时间戳"""
+    return time.mktime(info.date_time + (0, 0, -1))
+
+
+def is_unchanged(target_path, size, crc, mtime):
+    """同步模式：解压目录中的文件与成员内容相同时返回True
+
+    大小不同直接判为已变化；大小和修改时间都一致时认为未变化，不读取文件；
+    修改时间不同时才读取文件计算CRC，CRC一致则补上修改时间，下次同步不必再读。
+    """
+    if not os.path.isfile(target_path):
+        return False
+    st = os.stat(target_path)
+    if st.st_size != size:
+        return False
+    if abs(st.st_mtime - mtime) < SYNC_MTIME_TOLERANCE:
+        return True
+    if _crc_file(target_path) != crc:
+        return False
+    os.utime(target_path, (mtime, mtime))
+    return True
+
+
+def filter_unchanged(zip_ref, members, extract_path, zip_name, workers, is_cancelled=None):
+    """同步模式：并行比较成员与解压目录中的文件，返回需要写入的成员
+
+    比较大文件需要计算CRC，is_cancelled返回True时抛出ExtractionCancelled。
+    """
+    prefix = f"{zip_name}/"
+
+    def check(member):
+        if is_cancelled and is_cancelled():
+            raise ExtractionCancelled()
+        info = zip_ref.getinfo(member)
+        target_path = get_target_path(extract_path, member[len(prefix):])
+        return is_unchanged(target_path, info.file_size, info.CRC, zip_mtime(info))
+
+    results = ordered_map(check, [(member,) for member in members], workers)
+    return [member for member, unchanged in zip(members, results) if not unchanged]
+
+
+# 增量更新相关参数
+ARCHIVE_INFO_NAME = "__sfx__.json"  # 压缩包信息: 版本号、完整文件列表、增量信息
+DELTA_PREFIX = "__delta__/"  # 二进制补丁在压缩包内的目录
+VERSION_MARKER = ".sfx_version"  # 解压目录中记录当前版本号的文件
+JOURNAL_NAME = ".sfx_journal"  # 解压目录中记录已完成成员的日志，解压中断后据此继续
+SYNC_MTIME_TOLERANCE = 2  # 同步模式比较修改时间的容差（秒），ZIP记录的时间精度为2秒
+DELTA_BLOCK_SIZE = 64 * 1024  # 二进制补丁的匹配块大小
+DELTA_RESYNC_WINDOW = 1024 * 1024  # 不匹配时向后查找旧文件后续块的范围
+DELTA_RESYNC_BLOCKS = 8  # 不匹配时查找上一个匹配块之后的旧块数
+DELTA_PROBE_SIZE = 32  # 查找旧块时先比较的开头字节数，找到后再比较整块摘要
+DELTA_PROBE_TRIES = 16  # 每次查找中同一旧块最多比较的候选位置数
+DELTA_MIN_SIZE = 4 * 1024 * 1024  # 超过该大小的修改文件尝试生成二进制补丁
+DELTA_MAX_RATIO = 0.8  # 补丁超过新文件该比例时改为直接打包新文件
+DELTA_HEADER = struct.Struct("<8sQI")  # 标记, 新文件大小, 新文件CRC
+DELTA_MAGIC = b"SFXDELT1"
+DELTA_COPY = struct.Struct("<QI")  # b'C': 从旧文件复制(偏移, 长度)
+DELTA_DATA = struct.Struct("<I")  # b'D': 补丁中的新数据(长度)
+
+
+def compute_archive_id(files):
+    """根据{相对路径: (大小, CRC)}计算版本号"""
+    digest = hashlib.sha256()
+    for rel_path in sorted(files):
+        size, crc = files[rel_path]
+        digest.update(f"{rel_path}\0{size}\0{crc}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def list_archive_files(zip_ref, zip_name):
+    """返回压缩包中打包文件的{相对路径: (大小, CRC)}"""
+    prefix = f"{zip_name}/"
+    return {
+        info.filename[len(prefix):]: (info.file_size, info.CRC)
+        for info in zip_ref.infolist()
+        if info.filename.startswith(prefix) and not info.is_dir()
+    }
+
+
+def read_archive_info(zip_ref, zip_name):
+    """读取压缩包信息；旧版本生成的压缩包没有信息文件，按内容计算版本号"""
+    try:
+        info = json.loads(zip_ref.read(ARCHIVE_INFO_NAME).decode('utf-8'))
+    except KeyError:
+        files = list_archive_files(zip_ref, zip_name)
+        info = {"id": compute_archive_id(files), "files": files, "delta": None}
+    info["files"] = {rel_path: tuple(value) for rel_path, value in info["files"].items()}
+    info.setdefault("links", {})
+    info.setdefault("hashes", {})  # 旧版本生成的压缩包没有摘要清单
+    info.setdefault("hash_chunk", HASH_CHUNK_SIZE)
+    return info
+
+
+def check_base_version(extract_path, base_id):
+    """确认解压目录中现有文件的版本与增量包的基准版本一致"""
+    try:
+        with open(os.path.join(extract_path, VERSION_MARKER), 'r', encoding='utf-8') as f:
+            current_id = f.read().strip()
+    except OSError:
+        current_id = ""
+    if current_id != base_id:
+        raise Exception(
+            f"解压目录中的版本({current_id or '未知'})与增量包的基准版本({base_id})不一致，无法应用增量更新")
+
+
+def write_version_marker(extract_path, archive_id):
+    with open(os.path.join(extract_path, VERSION_MARKER), 'w', encoding='utf-8') as f:
+        f.write(archive_id)
+
+
+class ExtractionJournal:
+    """解压日志：每完成一个成员追加一行（成员名、大小、CRC），解压被中断后重新运行时跳过已完成的成员
+
+    日志第一行是压缩包版本号，版本不同时忽略旧日志；全部完成后调用finish删除日志。
+    """
+
+    def __init__(self, extract_path, archive_id):
+        self.extract_path = extract_path
+        self.path = os.path.join(extract_path, JOURNAL_NAME)
+        self.done = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                if f.readline().rstrip("\n") == archive_id:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break  # 最后一行可能只写了一半
+                        name, size, crc = line[:-1].rsplit("\t", 2)
+                        self.done[name] = (int(size), int(crc))
+        except (OSError, ValueError):
+            self.done = {}
+        os.makedirs(extract_path, exist_ok=True)
+        if self.done:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.file = open(self.path, 'w', encoding='utf-8')
+            self.file.write(archive_id + "\n")
+            self.file.flush()
+
+    def is_done(self, info, target_path=None):
+        """成员在上次解压中已完成时返回True，给出target_path时还要求文件仍在且大小一致"""
+        if self.done.get(info.filename) != (info.file_size, info.CRC):
+            return False
+        return target_path is None or (
+            os.path.isfile(target_path) and os.path.getsize(target_path) == info.file_size)
+
+    def pending(self, zip_ref, members, zip_name):
+        """返回还需要解压的成员"""
+        if not self.done:
+            return list(members)
+        prefix = f"{zip_name}/"
+        return [member for member in members if not self.is_done(
+            zip_ref.getinfo(member), get_target_path(self.extract_path, member[len(prefix):]))]
+
+    def record(self, info):
+        self.file.write(f"{info.filename}\t{info.file_size}\t{info.CRC}\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def finish(self):
+        """解压全部完成，删除日志"""
+        self.file.close()
+        os.remove(self.path)
+
+
+def combine_chunk_digests(digests):
+    """由各块的SHA-256得到文件摘要（十六进制）
+
+    只有一块（不超过HASH_CHUNK_SIZE）时就是文件的SHA-256，否则是各块摘要拼接后的SHA-256，
+    这样大文件的各块可以在多个核心上同时计算。
+    """
+    if len(digests) == 1:
+        return digests[0].hex()
+    return hashlib.sha256(b"".join(digests)).hexdigest()
+
+
+def ordered_map(func, items, workers):
+    """用线程池并行执行func(*item)，按items的顺序返回结果，在途任务数量有上限"""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(executor.submit(func, *item))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _hash_member(zip_ref, member, chunk_size):
+    """读取压缩包成员并计算摘要，CRC不一致时zipfile会抛出异常"""
+    digests = []
+    with zip_ref.open(member) as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            digests.append(hashlib.sha256(block).digest())
+    return combine_chunk_digests(digests or [hashlib.sha256().digest()])
+
+
+def verify_members(zip_ref, archive_info, zip_name, workers, on_progress=None):
+    """多线程读取全部成员，检查CRC和摘要清单，返回[(成员名, 问题)]
+
+    on_progress(已完成数, 总数)在每个成员校验完后调用。
+    """
+    prefix = f"{zip_name}/"
+    hashes = archive_info["hashes"]
+    chunk_size = archive_info["hash_chunk"]
+    members = [info.filename for info in zip_ref.infolist()
+               if not info.is_dir() and info.filename != ARCHIVE_INFO_NAME]
+
+    def check(member):
+        try:
+            digest = _hash_member(zip_ref, member, chunk_size)
+        except zipfile.BadZipFile as e:
+            return str(e)
+        expected = hashes.get(member[len(prefix):]) if member.startswith(prefix) else None
+        if expected is not None and digest != expected:
+            return "SHA-256不一致"
+        return None
+
+    problems = []
+    for done, (member, problem) in enumerate(
+            zip(members, ordered_map(check, [(member,) for member in members], workers)), 1):
+        if problem:
+            problems.append((member, problem))
+        if on_progress:
+            on_progress(done, len(members))
+    return problems
+
+
+def _hash_chunk(path, offset, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return hashlib.sha256(f.read(chunk_size)).digest()
+
+
+def verify_files(extract_path, archive_info, workers, on_progress=None):
+    """按摘要清单校验已解压的文件，返回[(相对路径, 问题)]
+
+    所有文件按块拆分后由线程池并行计算，单个大文件也能用满多个核心；
+    on_progress(已完成数, 总数)在每个文件校验完后调用。
+    """
+    hashes = archive_info["hashes"]
+    if not hashes:
+        raise Exception("该压缩包没有文件摘要清单（由旧版本生成），只能校验压缩包本身")
+    chunk_size = archive_info["hash_chunk"]
+    files = archive_info["files"]
+    problems = []
+    checked = []
+    for rel_path in sorted(hashes):
+        path = get_target_path(extract_path, rel_path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            problems.append((rel_path, "文件不存在"))
+            continue
+        if rel_path in files and files[rel_path][0] != size:
+            problems.append((rel_path, "大小不一致"))
+            continue
+        checked.append((rel_path, path, size))
+
+    def chunks():
+        for rel_path, path, size in checked:
+            for offset in range(0, max(size, 1), chunk_size):
+                yield path, offset, chunk_size
+
+    results = ordered_map(_hash_chunk, chunks(), workers)
+    for done, (rel_path, path, size) in enumerate(checked, 1):
+        digests = [next(results) for _ in range(max(1, -(-size // chunk_size)))]
+        if combine_chunk_digests(digests) != hashes[rel_path]:
+            problems.append((rel_path, "SHA-256不一致"))
+        if on_progress:
+            on_progress(done, len(checked))
+    return problems
+
+
+def _find_resync(buf, pos, base, blocks, next_block, searched):
+    """在buf中pos之后查找上一个匹配块之后的几个旧块，返回最早出现的位置，找不到返回None
+
+    先用开头的探测字节查找，找到后再比较整块摘要；searched记录每个旧块已查找到的新文件偏移，
+    连续不匹配时同一范围不会重复查找。
+    """
+    view = memoryview(buf)
+    limit = min(pos + 1 + DELTA_RESYNC_WINDOW, len(buf) - DELTA_BLOCK_SIZE + DELTA_PROBE_SIZE)
+    best = None
+    for number in range(next_block, min(next_block + DELTA_RESYNC_BLOCKS, len(blocks))):
+        digest, probe = blocks[number]
+        start = max(pos + 1, searched.get(number, 0) - base)
+        end = limit if best is None else min(limit, best + DELTA_PROBE_SIZE - 1)
+        found = buf.find(probe, start, end)
+        tries = 0
+        while found >= 0:
+            if hashlib.sha1(view[found:found + DELTA_BLOCK_SIZE]).digest() == digest:
+                best = found
+                break
+            tries += 1
+            if tries >= DELTA_PROBE_TRIES:
+                # 探测字节重复出现太多次（例如全零数据），本次只查找到这里
+                end = found + DELTA_PROBE_SIZE
+                break
+            found = buf.find(probe, found + 1, end)
+        searched[number] = max(searched.get(number, 0), base + end - DELTA_PROBE_SIZE + 1)
+    return best
+
+
+def create_binary_delta(base_stream, new_path, patch_path):
+    """生成把旧文件变为新文件的二进制补丁，返回(新文件大小, 新文件CRC, 补丁大小)
+
+    旧文件按固定块建立摘要索引，新文件中与旧块相同的数据记为复制，其余写入补丁数据。
+    新文件从上一个匹配位置起逐块比较，不匹配时在DELTA_RESYNC_WINDOW范围内查找紧跟在上一个匹配块之后的旧块，
+    插入或删除数据后能在任意偏移处重新对上。没有按每个字节计算滚动校验（纯Python处理大文件太慢），
+    所以被移动到其他位置、且不紧跟上一个匹配块的数据不会匹配，补丁不够小时由调用方改为完整打包。
+    """
+    index = {}
+    blocks = []  # 按顺序的完整旧块: (摘要, 开头的探测字节)
+    offset = 0
+    while True:
+        block = base_stream.read(DELTA_BLOCK_SIZE)
+        if not block:
+            break
+        digest = hashlib.sha1(block).digest()
+        index.setdefault(digest, (offset, len(block)))
+        if len(block) == DELTA_BLOCK_SIZE:
+            blocks.append((digest, bytes(block[:DELTA_PROBE_SIZE])))
+        offset += len(block)
+
+    new_size = 0
+    new_crc = 0
+    with open(new_path, 'rb') as src, open(patch_path, 'wb') as patch:
+        patch.write(DELTA_HEADER.pack(DELTA_MAGIC, 0, 0))
+        copy_offset, copy_length = None, 0
+        buf = b""
+        pos = 0
+        base = 0  # buf[0]在新文件中的偏移
+        eof = False
+        next_block = 0  # 上一个匹配块之后的旧块编号
+        searched = {}
+        while True:
+            # 缓冲区中至少保留一个块和查找范围的数据
+            if not eof and len(buf) - pos < DELTA_BLOCK_SIZE + DELTA_RESYNC_WINDOW:
+                more = src.read(DELTA_RESYNC_WINDOW * 4)
+                if more:
+                    new_size += len(more)
+                    new_crc = zlib.crc32(more, new_crc)
+                    base += pos
+                    buf = buf[pos:] + more
+                    pos = 0
+                else:
+                    eof = True
+                continue
+            if pos >= len(buf):
+                break
+
+            view = memoryview(buf)
+            block = view[pos:pos + DELTA_BLOCK_SIZE]
+            match = index.get(hashlib.sha1(block).digest())
+            if match and match[1] == len(block):
+                # 与上一个复制区间连续时合并
+                if copy_offset is not None and copy_offset + copy_length == match[0] and copy_length < 1 << 30:
+                    copy_length += len(block)
+                else:
+                    if copy_offset is not None:
+                        patch.write(b'C' + DELTA_COPY.pack(copy_offset, copy_length))
+                    copy_offset, copy_length = match
+                pos += len(block)
+                next_block = match[0] // DELTA_BLOCK_SIZE + 1
+                searched.clear()
+                continue
+
+            # 不匹配的数据写入补丁，直到重新对上旧文件的后续块
+            found = _find_resync(buf, pos, base, blocks, next_block, searched)
+            end = found if found is not None else min(pos + DELTA_BLOCK_SIZE, len(buf))
+            if copy_offset is not None:
+                patch.write(b'C' + DELTA_COPY.pack(copy_offset, copy_length))
+                copy_offset, copy_length = None, 0
+            patch.write(b'D' + DELTA_DATA.pack(end - pos))
+            patch.write(view[pos:end])
+            pos = end
+        if copy_offset is not None:
+            patch.write(b'C' + DELTA_COPY.pack(copy_offset, copy_length))
+        patch_size = patch.tell()
+        patch.seek(0)
+        patch.write(DELTA_HEADER.pack(DELTA_MAGIC, new_size, new_crc))
+    return new_size, new_crc, patch_size
+
+
+def apply_binary_delta(patch_stream, old_path, new_path, buffer):
+    """用补丁和旧文件生成新文件，并校验大小和CRC"""
+    magic, new_size, new_crc = DELTA_HEADER.unpack(patch_stream.read(DELTA_HEADER.size))
+    if magic != DELTA_MAGIC:
+        raise Exception(f"补丁格式错误: {new_path}")
+
+    view = memoryview(buffer)
+    size = 0
+    crc = 0
+    with open(old_path, 'rb') as old, open(new_path, 'wb') as dst:
+        while True:
+            op = patch_stream.read(1)
+            if not op:
+                break
+            if op == b'C':
+                offset, length = DELTA_COPY.unpack(patch_stream.read(DELTA_COPY.size))
+                old.seek(offset)
+                source = old
+            elif op == b'D':
+                length, = DELTA_DATA.unpack(patch_stream.read(DELTA_DATA.size))
+                source = patch_stream
+            else:
+                raise Exception(f"补丁格式错误: {new_path}")
+            while length > 0:
+                n = source.readinto(view[:min(length, len(view))])
+                if not n:
+                    raise Exception(f"补丁数据不完整: {new_path}")
+                dst.write(view[:n])
+                crc = zlib.crc32(view[:n], crc)
+                size += n
+                length -= n
+
+    if size != new_size or crc != new_crc:
+        os.remove(new_path)
+        raise Exception(f"应用补丁后文件校验失败，现有文件可能已被修改: {new_path}")
+
+
+def apply_delta(zip_ref, delta, extract_path, buffer, journal=None):
+    """在已解压的旧版本上应用二进制补丁并删除新版本中已移除的文件
+
+    补丁只能应用一次，应用后记入journal，中断后重新运行时跳过已应用的补丁。
+    """
+    for rel_path in delta["patches"]:
+        info = zip_ref.getinfo(DELTA_PREFIX + rel_path)
+        if journal and journal.is_done(info):
+            continue
+        target_path = get_target_path(extract_path, rel_path)
+        temp_path = target_path + ".sfx_new"
+        with zip_ref.open(info) as patch_stream:
+            apply_binary_delta(patch_stream, target_path, temp_path, buffer)
+        os.replace(temp_path, target_path)
+        if journal:
+            journal.record(info)
+
+    for rel_path in delta["deleted"]:
+        target_path = get_target_path(extract_path, rel_path)
+        if os.path.isfile(target_path):
+            os.remove(target_path)
+
+
+def extract_members(zip_ref, members, extract_path, zip_name, workers, is_cancelled=None, timings=None):
+    """用线程池并行解压成员，每解压完一个返回其成员名
+
+    zlib解压和文件写入都会释放GIL，多个线程共用同一个压缩包句柄，
+    每个线程使用自己的缓冲区；在途任务数量有上限，中途停止迭代时未开始的任务会被取消。
+    is_cancelled返回True时正在解压的成员也会停下，迭代抛出ExtractionCancelled。
+    timings为字典时写入每个成员的解压耗时: {成员名: 秒数}。
+    """
+    local = threading.local()
+
+    def extract_one(member):
+        buffer = getattr(local, 'buffer', None)
+        if buffer is None:
+            buffer = local.buffer = bytearray(EXTRACT_BUFFER_SIZE)
+        target_path = get_target_path(extract_path, os.path.relpath(member, f"{zip_name}/"))
+        start = time.perf_counter()
+        stream_member(zip_ref, member, target_path, buffer, is_cancelled)
+        if timings is not None:
+            timings[member] = time.perf_counter() - start
+        return member
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        in_flight = deque()
+        for member in members:
+            if is_cancelled and is_cancelled():
+                raise ExtractionCancelled()
+            in_flight.append(executor.submit(extract_one, member))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def restore_duplicates(links, extract_path, sync_files=None):
+    """去重打包的文件只存储了一份，解压后从已写出的文件复制到其余路径，返回跳过的副本数
+
+    sync_files为压缩包的{相对路径: (大小, CRC)}时（同步模式）跳过内容未变化的副本。
+    """
+    skipped = 0
+    for rel_path, source_rel_path in links.items():
+        target_path = get_target_path(extract_path, rel_path)
+        source_path = get_target_path(extract_path, source_rel_path)
+        if sync_files is not None and is_unchanged(target_path, *sync_files[rel_path],
+                                                   os.path.getmtime(source_path)):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copy2(source_path, target_path)
+    return skipped
+
+
+def _hash_file(path):
+    """工作进程入口：计算文件内容摘要，用于去重"""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def plan_dedup(entries, workers):
+    """找出内容相同的文件，每份内容只打包一次
+
+    先按大小分组，只对大小相同的文件计算摘要。
+    返回(需要打包的entries, {重复文件压缩包内路径: 源文件压缩包内路径}, 节省的字节数)
+    """
+    by_size = {}
+    for entry in entries:
+        by_size.setdefault(entry[2], []).append(entry)
+    candidates = [entry for size, group in by_size.items() if len(group) > 1 and size > 0 for entry in group]
+
+    if workers > 1 and len(candidates) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(_hash_file, [entry[0] for entry in candidates], chunksize=16))
+    else:
+        digests = [_hash_file(entry[0]) for entry in candidates]
+
+    first_by_digest = {}
+    links = {}
+    saved = 0
+    for (path, arcname, size, *_), digest in zip(candidates, digests):
+        key = (size, digest)
+        if key in first_by_digest:
+            links[arcname] = first_by_digest[key]
+            saved += size
+        else:
+            first_by_digest[key] = arcname
+
+    unique_entries = [entry for entry in entries if entry[1] not in links]
+    return unique_entries, links, saved
+
+
+def _crc_file(path):
+    """工作进程入口：计算文件CRC"""
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return crc
+            crc = zlib.crc32(block, crc)
+
+
+def hash_file(path):
+    """按combine_chunk_digests的规则计算文件摘要"""
+    digests = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_CHUNK_SIZE)
+            if not block:
+                break
+            digests.append(hashlib.sha256(block).digest())
+    return combine_chunk_digests(digests or [hashlib.sha256().digest()])
+
+
+def _delta_task(base_path, member, new_path, patch_path):
+    """工作进程入口：从基准压缩包读取旧文件并生成补丁，返回(新文件大小, CRC, 补丁大小, 新文件摘要)"""
+    with open_archive(base_path) as base_zip, base_zip.open(member) as base_stream:
+        return create_binary_delta(base_stream, new_path, patch_path) + (hash_file(new_path),)
+
+
+def plan_delta(base_path, entries, zip_name, patch_dir, workers):
+    """对比基准自解压文件，决定哪些文件需要打包
+
+    返回(需要完整打包的entries, 补丁entries, {补丁相对路径: (大小, CRC)},
+         未变化文件{相对路径: (大小, CRC)}, 已删除的相对路径列表, 基准版本号,
+         未变化和打补丁文件的{相对路径: 文件摘要})
+    """
+    # 基准的压缩数据不能直接读取时，先取出一份供各进程使用
+    location = locate_payload(base_path)
+    if location is not None and location[2]:
+        base_copy = os.path.join(patch_dir, PAYLOAD_NAME)
+        with open_payload(base_path) as src, open(base_copy, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        base_path = base_copy
+
+    with open_archive(base_path) as base_zip:
+        base_info = read_archive_info(base_zip, zip_name)
+    base_files = base_info["files"]
+    prefix = f"{zip_name}/"
+
+    # 大小相同的文件计算CRC判断是否变化
+    same_size = [entry for entry in entries if base_files.get(entry[1][len(prefix):], (None,))[0] == entry[2]]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            crcs = list(executor.map(_crc_file, [entry[0] for entry in same_size], chunksize=16))
+    else:
+        crcs = [_crc_file(entry[0]) for entry in same_size]
+    unchanged = {}
+    for entry, crc in zip(same_size, crcs):
+        rel_path = entry[1][len(prefix):]
+        if base_files[rel_path][1] == crc:
+            unchanged[rel_path] = base_files[rel_path]
+
+    full_entries = []
+    delta_jobs = []
+    for entry in entries:
+        rel_path = entry[1][len(prefix):]
+        if rel_path in unchanged:
+            continue
+        if rel_path in base_files and base_info.get("delta") is None and entry[2] >= DELTA_MIN_SIZE:
+            patch_path = os.path.join(patch_dir, f"{len(delta_jobs)}.patch")
+            delta_jobs.append((entry, rel_path, patch_path))
+        else:
+            full_entries.append(entry)
+
+    # 大文件生成二进制补丁，补丁不够小时改为完整打包
+    patch_entries = []
+    patches = {}
+    # 基准中去重存储的文件要从其源文件读取
+    base_links = base_info.get("links", {})
+    jobs = [(base_path, prefix + base_links.get(rel_path, rel_path), path, patch_path)
+            for (path, *_), rel_path, patch_path in delta_jobs]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_delta_task, *zip(*jobs)))
+    else:
+        results = [_delta_task(*job) for job in jobs]
+    # 未变化的文件沿用基准的摘要（基准由旧版本生成时没有摘要）
+    hashes = {rel_path: base_info["hashes"][rel_path] for rel_path in unchanged if rel_path in base_info["hashes"]}
+    for (entry, rel_path, patch_path), (size, crc, patch_size, digest) in zip(delta_jobs, results):
+        if patch_size > size * DELTA_MAX_RATIO:
+            os.remove(patch_path)
+            full_entries.append(entry)
+        else:
+            patch_entries.append(stat_entry(patch_path, DELTA_PREFIX + rel_path))
+            patches[rel_path] = (size, crc)
+            hashes[rel_path] = digest
+
+    new_rel_paths = {entry[1][len(prefix):] for entry in entries}
+    deleted = sorted(rel_path for rel_path in base_files if rel_path not in new_rel_paths)
+    return full_entries, patch_entries, patches, unchanged, deleted, base_info["id"], hashes
+
+
+def write_archive_info(zip_path, zip_name, unchanged=None, patches=None, deleted=None, base_id=None, links=None,
+                       hashes=None):
+    """在压缩包中写入信息文件（版本号、完整文件列表、文件摘要、去重和增量信息），返回版本号
+
+    links为{重复文件压缩包内路径: 源文件压缩包内路径}，hashes为{相对路径: 文件摘要}。
+    """
+    prefix = f"{zip_name}/"
+    with zipfile.ZipFile(zip_path, 'a', zipfile.ZIP_DEFLATED) as zipf:
+        files = dict(unchanged or {})
+        files.update(patches or {})
+        files.update(list_archive_files(zipf, zip_name))
+        links = {arcname[len(prefix):]: source[len(prefix):] for arcname, source in (links or {}).items()}
+        hashes = dict(hashes or {})
+        for rel_path, source_rel_path in links.items():
+            files[rel_path] = files[source_rel_path]
+            if source_rel_path in hashes:
+                hashes[rel_path] = hashes[source_rel_path]
+        info = {"id": compute_archive_id(files), "files": files, "links": links, "delta": None,
+                "hashes": hashes, "hash_chunk": HASH_CHUNK_SIZE}
+        if base_id is not None:
+            info["delta"] = {"base_id": base_id, "patches": sorted(patches), "deleted": deleted}
+        zipf.writestr(ARCHIVE_INFO_NAME, json.dumps(info, ensure_ascii=False))
+    return info["id"]
+
+
+# 解压程序中与本工具共用的常量和函数，生成解压程序时直接复制其源码
+EXTRACTOR_RUNTIME_CONSTANTS = [
+    "STUB_MAGIC", "STUB_TRAILER", "PYINSTALLER_MAGIC", "PYINSTALLER_COOKIE", "VOLUME_OPEN_FILES",
+    "RATE_SAMPLE_INTERVAL", "RATE_SMOOTHING", "RATE_LOG_INTERVAL", "EXTRACT_BUFFER_SIZE", "HASH_CHUNK_SIZE",
+    "ARCHIVE_INFO_NAME", "DELTA_PREFIX",
+    "VERSION_MARKER", "JOURNAL_NAME", "SYNC_MTIME_TOLERANCE",
+    "DELTA_HEADER", "DELTA_MAGIC", "DELTA_COPY", "DELTA_DATA",
+]
+EXTRACTOR_RUNTIME_FUNCTIONS = [
+    find_package_start, read_stub_trailer, PayloadSlice, find_volumes, VolumeReader, open_volumes, format_size,
+    RateEstimator, get_target_path, ExtractionCancelled, stream_member, zip_mtime, is_unchanged, filter_unchanged,
+    _crc_file, extract_members,
+    compute_archive_id, list_archive_files, read_archive_info, check_base_version, write_version_marker,
+    ExtractionJournal, combine_chunk_digests, ordered_map, _hash_member, verify_members, _hash_chunk, verify_files,
+    apply_binary_delta, apply_delta, restore_duplicates,
+]
+
+
+def get_extractor_runtime_code():
+    """生成解压程序中共用部分的源码"""
+    lines = []
+    for name in EXTRACTOR_RUNTIME_CONSTANTS:
+        value = globals()[name]
+        if isinstance(value, struct.Struct):
+            lines.append(f"{name} = struct.Struct({value.format!r})")
+        else:
+            lines.append(f"{name} = {value!r}")
+    code = "\n".join(lines) + "\n\n"
+    code += "\n\n".join(inspect.getsource(function) for function in EXTRACTOR_RUNTIME_FUNCTIONS)
+    return code
+
+
+# 使用Zstandard压缩时插入解压程序的类和函数，同样直接复制源码
+EXTRACTOR_ZSTD_FUNCTIONS = [ZstdZipDecompressor, enable_zipfile_zstd]
+
+
+def create_extractor_script(temp_dir, zip_name, stub_mode=False, method=zipfile.ZIP_DEFLATED):
+    """创建包含自启动解压逻辑的脚本
+
+    stub_mode为True时图片和ZIP数据附加在EXE末尾，运行时直接映射自身EXE读取，不经过临时目录；
+    否则图片以固定文件名SPLASH_NAME打包进EXE内部。脚本中不含输出文件名、图片名等每次不同的内容，
+    同一压缩方式生成的脚本完全相同，构建缓存可以复用。method为压缩方式，脚本中只导入对应的解压库。
+    """
+    zstd_support = ""
+    runtime_code = get_extractor_runtime_code()
+    if method == ZIP_ZSTANDARD:
+        # zstandard与其他解压模块一样在第一帧显示后导入，导入后为zipfile注册解压器
+        zstd_support = "    global zstandard\n    import zstandard\n    enable_zipfile_zstd()"
+        runtime_code += f"\n\nZIP_ZSTANDARD = {ZIP_ZSTANDARD}\n\n" + "\n\n".join(
+            inspect.getsource(function) for function in EXTRACTOR_ZSTD_FUNCTIONS)
+    extractor_code = f"""
+import time
+STARTUP_TIME = time.perf_counter()
+
+# 启动时只导入显示界面所需的模块，其余模块在第一帧显示后由load_runtime_modules导入
+import os
+import sys
+import struct
+import mmap
+import base64
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+STUB_MODE = {stub_mode}
+STARTUP_BUDGET = {STARTUP_BUDGET}
+UI_REFRESH_INTERVAL = 50  # 界面刷新间隔（毫秒），解压线程投递的事件在每次刷新时合并处理
+
+def load_runtime_modules():
+    \"\"\"导入解压用到的模块\"\"\"
+    global zipfile, zlib, json, hashlib, bisect, threading, queue, shutil, deque, ThreadPoolExecutor
+    import zipfile
+    import zlib
+    import json
+    import hashlib
+    import bisect
+    import threading
+    import queue
+    import shutil
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+{zstd_support}
+
+def get_image_data():
+    \"\"\"返回解压时显示的图片数据（打包时已缩放为PNG）\"\"\"
+    if STUB_MODE:
+        trailer = read_stub_trailer(sys.executable)
+        if trailer is None:
+            raise Exception("未找到图片数据")
+        with PayloadSlice(sys.executable, trailer[0], trailer[1]) as f:
+            return f.read()
+
+    # 获取pyinstaller打包后的资源路径
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.abspath('.')
+    with open(os.path.join(base_path, "{SPLASH_NAME}"), 'rb') as f:
+        return f.read()
+
+def get_zip_source():
+    \"\"\"返回打包的ZIP数据（路径或文件对象）\"\"\"
+    if STUB_MODE:
+        trailer = read_stub_trailer(sys.executable)
+        if trailer is None:
+            raise Exception(f"未找到压缩数据: {{sys.executable}}")
+        if trailer[3] == 0:
+            # 分卷模式，ZIP数据在EXE旁边的分卷文件中
+            return open_volumes(sys.executable)
+        return PayloadSlice(sys.executable, trailer[2], trailer[3])
+
+    # 获取打包的ZIP文件路径
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+        zip_path = os.path.join(base_path, "{zip_name}.zip")
+    else:
+        zip_path = "{zip_name}.zip"
+
+    # 检查ZIP文件是否存在
+    if not os.path.exists(zip_path):
+        raise Exception(f"未找到压缩数据: {{zip_path}}")
+    return zip_path
+
+{runtime_code}
+
+def get_extract_workers():
+    \"\"\"解压线程数，可用 --threads=N 指定，默认按CPU核数\"\"\"
+    for arg in sys.argv[1:]:
+        if arg.startswith("--threads="):
+            return max(1, int(arg.split("=", 1)[1]))
+    return min(32, os.cpu_count() or 1)
+
+def is_sync_mode():
+    \"\"\"--sync: 同步模式，跳过解压目录中内容未变化的文件\"\"\"
+    return "--sync" in sys.argv[1:]
+
+class ExtractorApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("正在解压...")
+        self.root.geometry("600x400")
+        self.root.resizable(False, False)
+
+        # 设置中文字体
+        self.setup_fonts()
+
+        # 使用用户文档目录作为解压路径（避免权限问题）
+        self.extract_path = os.path.join(os.path.expanduser('~'), "Documents", "extracted_files")
+
+        # 创建界面
+        self.create_widgets()
+        # 关闭窗口等同于点击取消，解压线程停下后再关闭
+        self.root.protocol("WM_DELETE_WINDOW", self.cancel_extraction)
+
+        # 先显示第一帧，再导入解压模块并开始解压
+        self.root.after_idle(self.on_first_frame)
+
+    def setup_fonts(self):
+        default_font = ('SimHei', 10)
+        self.root.option_add("*Font", default_font)
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 显示图片
+        image_frame = ttk.Frame(main_frame)
+        image_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+        try:
+            photo = tk.PhotoImage(data=base64.b64encode(get_image_data()))
+
+            self.image_label = ttk.Label(image_frame, image=photo)
+            self.image_label.image = photo  # 保持引用
+            self.image_label.pack()
+        except Exception as e:
+            ttk.Label(
+                image_frame, 
+                text=f"无法加载图片: {{str(e)}}\\n将使用默认界面",
+                justify=tk.CENTER
+            ).pack(expand=True)
+
+        # 进度条
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
+        self.progress_bar.pack(fill=tk.X, pady=5)
+
+        # 状态标签
+        self.status_label = ttk.Label(main_frame, text="准备解压...")
+        self.status_label.pack(pady=5)
+
+        # 速度和剩余时间
+        self.rate_label = ttk.Label(main_frame, text="")
+        self.rate_label.pack(pady=5)
+
+        # 解压路径显示
+        path_frame = ttk.Frame(main_frame)
+        path_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Label(path_frame, text="解压到:").pack(side=tk.LEFT)
+        self.path_label = ttk.Label(path_frame, text=self.extract_path)
+        self.path_label.pack(side=tk.LEFT, padx=5)
+
+        # 取消按钮
+        cancel_btn = ttk.Button(main_frame, text="取消", command=self.cancel_extraction)
+        cancel_btn.pack(pady=10)
+
+        self.cancelled = False
+
+    def cancel_extraction(self):
+        self.cancelled = True  # 解压线程在写完当前数据块后停下
+        self.status_label.config(text="正在取消...")
+
+    def on_first_frame(self):
+        \"\"\"第一帧显示后记录启动耗时，再开始解压\"\"\"
+        elapsed = time.perf_counter() - STARTUP_TIME
+        if "--startup-time" in sys.argv:
+            # 解压程序没有控制台，耗时显示在窗口标题中，并写入EXE旁边的文件
+            text = f"启动耗时: {{elapsed * 1000:.0f}} ms（目标 {{STARTUP_BUDGET * 1000:.0f}} ms）"
+            self.root.title(f"正在解压... {{text}}")
+            exe_path = sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(sys.argv[0])
+            try:
+                with open(os.path.splitext(exe_path)[0] + ".startup.txt", 'a', encoding='utf-8') as f:
+                    f.write(text + "\\n")
+            except OSError:
+                pass  # EXE所在目录不可写时只显示在标题中
+        self.root.after(1, self.start_extraction)
+
+    def start_extraction(self):
+        \"\"\"在后台线程解压，界面线程只定时处理解压线程投递的事件\"\"\"
+        load_runtime_modules()
+        self.events = queue.Queue()
+        self.done = False
+        threading.Thread(target=self.run_extraction, daemon=True).start()
+        self.root.after(UI_REFRESH_INTERVAL, self.process_events)
+
+    def post(self, *event):
+        self.events.put(event)
+
+    def process_events(self):
+        \"\"\"合并处理解压线程投递的事件，进度和状态只保留最新值\"\"\"
+        progress = status = rate = None
+        calls = []
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    progress = event[1]
+                elif event[0] == "status":
+                    status = event[1]
+                elif event[0] == "rate":
+                    rate = event[1]
+                else:
+                    calls.append(event[1:])
+        except queue.Empty:
+            pass
+
+        if progress is not None:
+            self.progress_var.set(progress)
+        if status is not None and not self.cancelled:
+            self.status_label.config(text=status)
+        if rate is not None:
+            self.rate_label.config(text=rate)
+        for func, *args in calls:
+            func(*args)
+        if not self.done:
+            self.root.after(UI_REFRESH_INTERVAL, self.process_events)
+
+    def finish(self, status, title, message, open_path=None, error=False):
+        \"\"\"解压结束：提示结果后关闭窗口\"\"\"
+        self.done = True
+        self.status_label.config(text=status)
+        if error:
+            messagebox.showerror(title, message)
+        else:
+            messagebox.showinfo(title, message)
+        self.root.destroy()
+
+        # 打开解压目录
+        if open_path:
+            try:
+                os.startfile(open_path)
+            except:
+                pass  # 忽略打开目录失败的情况
+
+    def run_extraction(self):
+        \"\"\"解压线程：不直接操作界面，进度通过事件队列交给界面线程\"\"\"
+        try:
+            # 创建解压目录
+            os.makedirs(self.extract_path, exist_ok=True)
+
+            # 从ZIP文件中解压
+            with zipfile.ZipFile(get_zip_source(), 'r') as zip_ref:
+                # 获取所有文件列表
+                file_list = zip_ref.namelist()
+
+                # 过滤出属于我们打包的文件
+                target_files = [f for f in file_list if f.startswith("{zip_name}/")]
+
+                # 增量包只能应用在对应的基准版本上
+                archive_info = read_archive_info(zip_ref, "{zip_name}")
+                delta = archive_info["delta"]
+                if delta:
+                    check_base_version(self.extract_path, delta["base_id"])
+
+                if not target_files and not delta:
+                    raise Exception("未找到可解压的文件")
+
+                # 上次解压被中断时只解压剩余的成员
+                journal = ExtractionJournal(self.extract_path, archive_info["id"])
+                pending = journal.pending(zip_ref, target_files, "{zip_name}")
+
+                # 同步模式只写入内容有变化的文件
+                sync = is_sync_mode()
+                if sync:
+                    self.post("status", "正在比较已有文件...")
+                    try:
+                        pending = filter_unchanged(zip_ref, pending, self.extract_path, "{zip_name}",
+                                                   get_extract_workers(), lambda: self.cancelled)
+                    except ExtractionCancelled:
+                        journal.close()
+                        self.post("call", self.finish, "解压已取消", "取消", "解压已被取消，重新运行时将从中断处继续")
+                        return
+
+                # 多线程并行解压文件
+                buffer = bytearray(EXTRACT_BUFFER_SIZE)
+                rate = RateEstimator(sum(zip_ref.getinfo(f).file_size for f in pending), unpacking=True)
+                extracted = extract_members(zip_ref, pending, self.extract_path, "{zip_name}",
+                                            get_extract_workers(), lambda: self.cancelled)
+                try:
+                    for file in extracted:
+                        if self.cancelled:
+                            raise ExtractionCancelled()
+
+                        # 更新进度
+                        info = zip_ref.getinfo(file)
+                        journal.record(info)
+                        if rate.update(info.file_size, info.compress_size, 1):
+                            self.post("rate", rate.summary())
+                        self.post("progress", rate.progress() * 100)
+                        self.post("status", f"正在解压: {{os.path.basename(file)}}")
+
+                    links = archive_info["links"]
+                    links_skipped = restore_duplicates(links, self.extract_path,
+                                                       archive_info["files"] if sync else None)
+                    if delta:
+                        self.post("status", "正在应用增量更新...")
+                        apply_delta(zip_ref, delta, self.extract_path, buffer, journal)
+                    write_version_marker(self.extract_path, archive_info["id"])
+                except ExtractionCancelled:
+                    # 保留已完成的文件和解压日志，重新运行时继续（写了一半的文件已由stream_member删除）
+                    extracted.close()
+                    journal.close()
+                    self.post("call", self.finish, "解压已取消", "取消", "解压已被取消，重新运行时将从中断处继续")
+                    return
+                except BaseException:
+                    journal.close()
+                    raise
+                journal.finish()
+
+            message = f"文件已成功解压到:\\n{{self.extract_path}}"
+            if sync:
+                message += (f"\\n写入 {{len(pending) + len(links) - links_skipped}} 个文件，"
+                            f"跳过 {{len(target_files) - len(pending) + links_skipped}} 个未变化的文件")
+            self.post("call", self.finish, "解压完成!", "成功", message, self.extract_path)
+
+        except Exception as e:
+            self.post("call", self.finish, "解压失败", "错误", f"解压失败: {{str(e)}}", None, True)
+
+if __name__ == "__main__":
+    # 实现双击自动解压逻辑
+    if len(sys.argv) > 1 and sys.argv[1] in ("--verify", "--verify-files"):
+        # 校验模式: --verify 校验压缩数据，--verify-files 按摘要清单校验已解压的文件
+        extract_path = os.path.join(os.path.expanduser('~'), "Documents", "extracted_files")
+        load_runtime_modules()
+        try:
+            with zipfile.ZipFile(get_zip_source(), 'r') as zip_ref:
+                archive_info = read_archive_info(zip_ref, "{zip_name}")
+                if sys.argv[1] == "--verify":
+                    problems = verify_members(zip_ref, archive_info, "{zip_name}", get_extract_workers())
+                else:
+                    problems = verify_files(extract_path, archive_info, get_extract_workers())
+            for path, problem in problems:
+                print(f"{{path}}: {{problem}}")
+            if problems:
+                details = "\\n".join(f"{{path}}: {{problem}}" for path, problem in problems[:20])
+                messagebox.showwarning("校验结果", f"发现 {{len(problems)}} 个问题:\\n{{details}}")
+            else:
+                messagebox.showinfo("校验结果", "校验完成，全部正常")
+            sys.exit(1 if problems else 0)
+        except Exception as e:
+            messagebox.showerror("错误", f"校验失败: {{str(e)}}")
+            sys.exit(1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--extract":
+        # 命令行模式（供外部调用）
+        extract_path = os.path.join(os.path.expanduser('~'), "Documents", "extracted_files")
+        os.makedirs(extract_path, exist_ok=True)
+        load_runtime_modules()
+
+        try:
+            with zipfile.ZipFile(get_zip_source(), 'r') as zip_ref:
+                file_list = zip_ref.namelist()
+                target_files = [f for f in file_list if f.startswith("{zip_name}/")]
+
+                archive_info = read_archive_info(zip_ref, "{zip_name}")
+                delta = archive_info["delta"]
+                if delta:
+                    check_base_version(extract_path, delta["base_id"])
+
+                if not target_files and not delta:
+                    raise Exception("未找到可解压的文件")
+
+                # 上次解压被中断时只解压剩余的成员
+                journal = ExtractionJournal(extract_path, archive_info["id"])
+                pending = journal.pending(zip_ref, target_files, "{zip_name}")
+                sync = is_sync_mode()
+                if sync:
+                    pending = filter_unchanged(zip_ref, pending, extract_path, "{zip_name}", get_extract_workers())
+                try:
+                    for file in extract_members(zip_ref, pending, extract_path, "{zip_name}",
+                                                get_extract_workers()):
+                        journal.record(zip_ref.getinfo(file))
+
+                    buffer = bytearray(EXTRACT_BUFFER_SIZE)
+
+                    links = archive_info["links"]
+                    links_skipped = restore_duplicates(links, extract_path, archive_info["files"] if sync else None)
+                    if delta:
+                        apply_delta(zip_ref, delta, extract_path, buffer, journal)
+                    write_version_marker(extract_path, archive_info["id"])
+                except BaseException:
+                    journal.close()
+                    raise
+                journal.finish()
+
+            message = f"文件已解压到:\\n{{extract_path}}"
+            if sync:
+                message += (f"\\n写入 {{len(pending) + len(links) - links_skipped}} 个文件，"
+                            f"跳过 {{len(target_files) - len(pending) + links_skipped}} 个未变化的文件")
+            messagebox.showinfo("成功", message)
+            try:
+                os.startfile(extract_path)
+            except:
+                pass
+        except Exception as e:
+            messagebox.showerror("错误", f"解压失败: {{str(e)}}")
+    else:
+        # 图形界面模式
+        root = tk.Tk()
+        app = ExtractorApp(root)
+        root.mainloop()
+    """
+
+    # 将解压程序代码写入临时文件
+    extractor_script_path = os.path.join(temp_dir, "extractor.py")
+    with open(extractor_script_path, "w", encoding="utf-8") as f:
+        f.write(extractor_code)
+
+    return extractor_script_path
+
+
+def _ignore(*args):
+    pass
+
+
+def scan_manifest(items, zip_name):
+    """用os.scandir遍历一次待压缩的文件和文件夹，生成文件清单
+
+    返回(源文件, 压缩包内路径, 大小, 修改时间, 权限位)列表，去重、增量对比、压缩和进度计算
+    都使用这份清单，不再重复遍历目录或读取文件属性。与os.walk一样不进入指向目录的符号链接。
+    """
+    manifest = []
+    for item in items:
+        if os.path.isfile(item):
+            manifest.append(stat_entry(item, f"{zip_name}/{os.path.basename(item)}"))
+        elif os.path.isdir(item):
+            # 文件夹内的文件路径相对于文件夹的上级目录，再放到以文件夹命名的目录下
+            name = os.path.basename(item)
+            stack = [(item, f"{zip_name}/{name}/{name}")]
+            while stack:
+                dir_path, dir_arcname = stack.pop()
+                sub_dirs = []
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        arcname = f"{dir_arcname}/{entry.name}"
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                sub_dirs.append((entry.path, arcname))
+                            continue
+                        st = entry.stat()
+                        manifest.append((entry.path, arcname, st.st_size, st.st_mtime, st.st_mode))
+                stack.extend(reversed(sub_dirs))
+    return manifest
+
+
+def stat_entry(path, arcname):
+    """读取单个文件的信息，生成文件清单中的一项"""
+    st = os.stat(path)
+    return path, arcname, st.st_size, st.st_mtime, st.st_mode
+
+
+# PyInstaller构建进度: 按输出中的阶段标记判断当前阶段，各阶段的预计耗时取以往构建的平滑值
+PYINSTALLER_PHASES = (
+    # (日志中的阶段标记, 界面显示, 没有历史记录时的预计耗时(秒))
+    ((), "启动PyInstaller", 2.0),
+    (("Initializing module dependency graph", "Running Analysis"), "分析依赖", 20.0),
+    (("Building PYZ",), "打包Python模块", 3.0),
+    (("Building PKG",), "打包程序文件", 8.0),
+    (("Building EXE",), "生成EXE", 3.0),
+)
+PYINSTALLER_PROGRESS_INTERVAL = 0.5  # 构建期间刷新进度的间隔（秒）
+PYINSTALLER_TIMING_SMOOTHING = 0.5  # 本次构建耗时在历史记录中的权重
+PYINSTALLER_TIMINGS_NAME = "pyinstaller_timings.json"  # 缓存目录中记录各阶段耗时的文件
+_pyinstaller_timings_lock = threading.Lock()
+
+
+def load_pyinstaller_timings(key):
+    """读取以往同类构建各阶段的耗时，没有记录时使用默认值"""
+    try:
+        with open(os.path.join(get_cache_dir(), PYINSTALLER_TIMINGS_NAME), 'r', encoding='utf-8') as f:
+            timings = json.load(f).get(key)
+        if timings and len(timings) == len(PYINSTALLER_PHASES):
+            return [float(seconds) for seconds in timings]
+    except (OSError, ValueError, AttributeError, TypeError):
+        pass
+    return [phase[2] for phase in PYINSTALLER_PHASES]
+
+
+def save_pyinstaller_timings(key, durations):
+    """用本次构建各阶段的耗时更新记录（指数平滑），同时进行的构建依次写入"""
+    path = os.path.join(get_cache_dir(), PYINSTALLER_TIMINGS_NAME)
+    with _pyinstaller_timings_lock:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+        old = data.get(key)
+        if isinstance(old, list) and len(old) == len(durations):
+            durations = [PYINSTALLER_TIMING_SMOOTHING * new + (1 - PYINSTALLER_TIMING_SMOOTHING) * previous
+                         for new, previous in zip(durations, old)]
+        data[key] = [round(seconds, 3) for seconds in durations]
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(partial_path, path)
+
+
+def run_pyinstaller(cmd, cwd, debug=False, log=_ignore, on_progress=_ignore, timing_key="default"):
+    """执行PyInstaller命令并把输出写入日志，失败时抛出异常
+
+    输出由单独的线程逐行读取并识别阶段标记；主线程等待进程结束，每隔PYINSTALLER_PROGRESS_INTERVAL
+    按已完成阶段和当前阶段已用时间估算进度，调用on_progress(0-1的比例, 阶段说明)。
+    各阶段的预计耗时按timing_key区分（完整构建、使用构建缓存、预编译解压程序的耗时差别很大）。
+    """
+    # 如果是调试模式，添加详细输出参数
+    if debug:
+        cmd.insert(3, "--debug=all")
+
+    log(f"执行PyInstaller命令: {' '.join(cmd)}")
+
+    # 使用Popen实时获取输出
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,  # 合并stdout和stderr
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1
+    )
+
+    expected = load_pyinstaller_timings(timing_key)
+    phase_starts = [time.perf_counter()]  # 已进入的各阶段的开始时间，只由读取线程追加
+
+    def read_output():
+        # 读取线程阻塞在readline上，输出结束（进程退出）时返回
+        for line in process.stdout:
+            log(line.strip())
+            for index in range(len(phase_starts), len(PYINSTALLER_PHASES)):
+                if any(marker in line for marker in PYINSTALLER_PHASES[index][0]):
+                    # 输出中没有出现的阶段（如缓存命中时跳过分析）耗时记为0
+                    phase_starts.extend([time.perf_counter()] * (index + 1 - len(phase_starts)))
+                    break
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+
+    reported = 0.0
+    while True:
+        try:
+            process.wait(timeout=PYINSTALLER_PROGRESS_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        index = len(phase_starts) - 1
+        elapsed = time.perf_counter() - phase_starts[index]
+        # 超出预计耗时的阶段停在该阶段末尾附近，等出现下一个阶段标记再前进
+        done = sum(expected[:index]) + min(elapsed, expected[index] * 0.95)
+        fraction = done / max(sum(expected), 0.001)
+        if fraction > reported:
+            reported = fraction
+            on_progress(fraction, PYINSTALLER_PHASES[index][1])
+    reader.join()
+    end = time.perf_counter()
+
+    if process.returncode != 0:
+        log(f"PyInstaller执行失败，返回代码: {process.returncode}")
+        raise Exception(f"生成EXE时出错，返回代码: {process.returncode}")
+
+    # 识别出全部阶段时记录本次耗时，用于校准下次构建的进度
+    if len(phase_starts) == len(PYINSTALLER_PHASES):
+        durations = [later - earlier for earlier, later in zip(phase_starts, phase_starts[1:] + [end])]
+        try:
+            save_pyinstaller_timings(timing_key, durations)
+        except OSError as e:
+            log(f"无法保存构建耗时记录: {str(e)}")
+    on_progress(1.0, PYINSTALLER_PHASES[-1][1])
+
+
+def get_build_key(extractor_script, debug=False):
+    """计算构建缓存键: 解压程序源码 + 解释器/PyInstaller版本 + 平台 + 调试模式"""
+    import PyInstaller
+    digest = hashlib.sha256()
+    with open(extractor_script, 'rb') as f:
+        digest.update(f.read())
+    for part in (sys.version, PyInstaller.__version__, sys.platform, str(debug)):
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+# 同一进程内的并发任务共用一个预编译解压程序，只需构建一次
+_stub_build_lock = threading.Lock()
+
+
+def get_extractor_stub(temp_dir, zip_name, method=zipfile.ZIP_DEFLATED, debug=False, log=_ignore,
+                       on_progress=_ignore, tracer=None):
+    """获取当前平台、指定压缩方式的预编译通用解压程序，不存在时构建一次并缓存"""
+    trace = tracer or Tracer()
+    stub_dir = os.path.join(temp_dir, "stub")
+    os.makedirs(stub_dir, exist_ok=True)
+    with trace.span("script"):
+        extractor_script = create_extractor_script(stub_dir, zip_name, stub_mode=True, method=method)
+
+    stub_name = f"extractor_stub-{get_build_key(extractor_script, debug)}"
+    exe_suffix = ".exe" if sys.platform.startswith('win') else ""
+    stub_path = os.path.join(get_cache_dir("stubs"), stub_name + exe_suffix)
+
+    with _stub_build_lock:
+        if os.path.exists(stub_path):
+            log(f"使用已缓存的预编译解压程序: {stub_path}")
+            return stub_path
+
+        log("未找到预编译解压程序，开始构建（每个平台只需构建一次）...")
+        dist_dir = os.path.join(stub_dir, "dist")
+        cmd = [
+            sys.executable,
+            "-m", "PyInstaller",
+            "--onefile",
+            f"--distpath={dist_dir}",
+            f"--workpath={os.path.join(stub_dir, 'build')}",
+            f"--specpath={stub_dir}",
+            f"--name={stub_name}",
+            "--noconsole",
+            *[f"--exclude-module={module}" for module in get_excluded_modules(method)],
+            extractor_script
+        ]
+        with trace.span("pyinstaller"):
+            run_pyinstaller(cmd, stub_dir, debug, log, on_progress, timing_key="stub")
+
+        built_path = os.path.join(dist_dir, stub_name + exe_suffix)
+        if not os.path.exists(built_path):
+            log(f"预编译解压程序未找到: {built_path}")
+            raise Exception("构建预编译解压程序失败，文件未找到")
+
+        # 先复制到临时文件再改名，避免并发构建时读到不完整的文件
+        partial_path = f"{stub_path}.{os.getpid()}.tmp"
+        shutil.copy2(built_path, partial_path)
+        os.replace(partial_path, stub_path)
+        log(f"预编译解压程序已缓存: {stub_path}")
+        return stub_path
+
+
+def write_packed_zip(zip_target, entries, zip_name, workers, method, level, on_write=None, on_start=None,
+                     force_zip64=False, patch_entries=(), delta_args=None, log=_ignore, status=_ignore, tracer=None):
+    """生成打包数据：去重、并行压缩、写入压缩包信息，返回(版本号, 去重节省的字节数)
+
+    entries为scan_manifest的结果，zip_target为ZIP路径或VolumeWriter。
+    patch_entries为增量模式的二进制补丁（不参与去重），delta_args为write_archive_info的增量参数，
+    其中的hashes为未变化文件的摘要。on_start(条目列表)在去重后、开始压缩前调用，on_write同parallel_write_zip。
+    """
+    trace = tracer or Tracer()
+    delta_args = dict(delta_args or {})
+
+    # 内容相同的文件只打包一份
+    status("正在查找重复文件...")
+    total_bytes = sum(entry[2] for entry in entries)
+    with trace.span("dedup") as span:
+        entries, links, saved_bytes = plan_dedup(entries, workers)
+        span.update(links=len(links), saved_bytes=saved_bytes)
+    if links:
+        log(f"去重: {len(links)} 个重复文件只存储一份，节省 {format_size(saved_bytes)}"
+            f"（去重率 {saved_bytes / max(total_bytes, 1):.1%}）")
+    delta_args["links"] = links
+    entries = entries + list(patch_entries)
+    if on_start:
+        on_start(entries)
+
+    totals = [0, 0]  # 原始字节数, 压缩字节数
+
+    def write_callback(file_path, arcname, raw_len, packed_len, file_done):
+        totals[0] += raw_len
+        totals[1] += packed_len
+        if on_write:
+            on_write(file_path, arcname, raw_len, packed_len, file_done)
+
+    log(f"使用 {workers} 个进程并行压缩，压缩方式: {COMPRESSION_NAMES[method]} 级别 {level}")
+    packed_hashes = {}
+    timings = {}
+    with trace.span("compress", workers=workers, method=COMPRESSION_NAMES[method], level=level) as span:
+        method_stats = parallel_write_zip(zip_target, entries, workers, write_callback, method, level,
+                                          force_zip64=force_zip64, hashes=packed_hashes, timings=timings)
+        span.update(files=len(entries), bytes_read=totals[0], bytes_written=totals[1])
+    trace.count("bytes_read", totals[0])
+    trace.count("bytes_written", totals[1])
+    sizes = {entry[1]: entry[2] for entry in entries}
+    for arcname, seconds in timings.items():
+        trace.record_file("compress", arcname, seconds, sizes.get(arcname, 0))
+    log("压缩方式统计:")
+    for line in format_method_stats(method_stats):
+        log(f"  {line}")
+
+    # 摘要清单随压缩包信息一起写入，解压后可以校验每个文件
+    prefix = f"{zip_name}/"
+    hashes = delta_args.pop("hashes", {})
+    hashes.update((arcname[len(prefix):], digest) for arcname, digest in packed_hashes.items()
+                  if arcname.startswith(prefix))
+    archive_id = write_archive_info(zip_target, zip_name, hashes=hashes, **delta_args)
+    log(f"压缩包版本号: {archive_id}")
+    return archive_id, saved_bytes
+
+
+def pack_archive(items, image_path, output_path, workers=None, use_stub=True, method=zipfile.ZIP_DEFLATED,
+                 level=None, delta_base="", debug=False, on_log=None, on_progress=None, on_status=None,
+                 on_rate=None, volume_size=None, tracer=None):
+    """把文件和文件夹打包成自解压EXE，失败时抛出异常
+
+    on_log/on_progress/on_status/on_rate为日志、进度(0-100)、状态文字和速度说明的回调，
+    可在无界面环境中省略，速度也会定时写入日志。
+    level为None时使用压缩方式的默认级别，workers为None时使用全部CPU核心。
+    指定volume_size（字节）时ZIP数据以ZIP64格式直接写成输出EXE旁边的分卷（名称.001 ...）和
+    校验文件（名称.sha256），EXE中只追加图片，适合几十GB以上的数据。
+    tracer为Tracer时记录各阶段（扫描、压缩、图片、脚本、PyInstaller等）的耗时和最慢的文件。
+    """
+    log = on_log or _ignore
+    status = on_status or _ignore
+    show_rate = on_rate or _ignore
+    trace = tracer or Tracer()
+    progress = on_progress or _ignore
+
+    def pyinstaller_progress(start, end):
+        """把PyInstaller的构建进度映射到总进度的start-end区间，阶段变化时更新状态文字"""
+        current_phase = None
+
+        def update(fraction, phase):
+            nonlocal current_phase
+            progress(start + (end - start) * fraction)
+            if phase != current_phase:
+                current_phase = phase
+                status(f"正在生成EXE文件: {phase}...")
+        return update
+
+    workers = workers or os.cpu_count() or 1
+    if level is None:
+        level = COMPRESSION_CODECS[COMPRESSION_NAMES[method]][1]
+    if method == ZIP_ZSTANDARD and zstandard is None:
+        raise Exception("使用Zstandard压缩需要先安装zstandard库: pip install zstandard")
+    if volume_size and volume_size < VOLUME_MIN_SIZE:
+        raise Exception(f"分卷大小不能小于 {format_size(VOLUME_MIN_SIZE)}")
+
+    status("准备压缩...")
+    progress(0)
+    log("准备压缩...")
+
+    # 创建临时目录
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log(f"创建临时目录: {temp_dir}")
+        status("创建临时文件...")
+        progress(5)
+
+        # 创建ZIP文件名称
+        zip_name = "packed_files"
+        zip_path = os.path.join(temp_dir, f"{zip_name}.zip")
+
+        # 打包文件
+        status("正在打包文件...")
+        progress(10)
+        log("开始打包文件...")
+
+        # 只遍历一次目录，生成包含大小和修改时间的文件清单
+        with trace.span("scan") as span:
+            entries = scan_manifest(items, zip_name)
+            span.update(files=len(entries), bytes=sum(entry[2] for entry in entries))
+        log(f"总计需要处理 {len(entries)} 个文件，共 {format_size(sum(entry[2] for entry in entries))}")
+
+        delta_args = {}
+        patch_entries = []
+        if delta_base:
+            # 增量模式: 只打包新增或变化的文件，大文件生成二进制补丁
+            status("正在对比增量基准...")
+            log(f"对比增量基准: {delta_base}")
+            patch_dir = os.path.join(temp_dir, "patches")
+            os.makedirs(patch_dir, exist_ok=True)
+            with trace.span("delta"):
+                full_entries, patch_entries, patches, unchanged, deleted, base_id, hashes = plan_delta(
+                    delta_base, entries, zip_name, patch_dir, workers)
+            log(f"基准版本 {base_id}: 未变化 {len(unchanged)} 个, 新增/修改 {len(full_entries)} 个, "
+                f"二进制补丁 {len(patch_entries)} 个, 删除 {len(deleted)} 个")
+            entries = full_entries
+            delta_args = dict(unchanged=unchanged, patches=patches, deleted=deleted, base_id=base_id, hashes=hashes)
+
+        # 按实际写入的字节数计算进度，大文件在压缩过程中进度也会前进
+        rate = None
+
+        def on_start(planned):
+            nonlocal rate
+            rate = RateEstimator(sum(entry[2] for entry in planned))
+
+        def on_write(file_path, arcname, raw_len, packed_len, file_done):
+            sampled = rate.update(raw_len, packed_len, 1 if file_done else 0)
+            progress(10 + rate.progress() * 30)
+            if file_done:
+                status(f"正在打包: {os.path.basename(file_path)}")
+                log(f"添加文件: {file_path}")
+            if sampled:
+                show_rate(rate.summary())
+                if rate.log_due():
+                    log(f"压缩进度 {rate.progress():.1%}: {rate.summary()}")
+
+        if volume_size:
+            # 分卷直接写到输出目录，不经过临时目录，也不再复制进EXE
+            volume_base = os.path.splitext(output_path)[0]
+            zip_target = VolumeWriter(volume_base, volume_size)
+            log(f"分卷模式: 每卷 {format_size(volume_size)}，写入 {volume_base}.001 ...")
+        else:
+            zip_target = zip_path
+        try:
+            write_packed_zip(zip_target, entries, zip_name, workers, method, level, on_write, on_start,
+                             force_zip64=bool(volume_size), patch_entries=patch_entries, delta_args=delta_args,
+                             log=log, status=status, tracer=trace)
+            show_rate("")
+        finally:
+            if volume_size:
+                zip_target.close()
+
+        if volume_size:
+            status("正在计算分卷校验值...")
+            checksum_path = f"{volume_base}.sha256"
+            with trace.span("volume_checksums", volumes=len(zip_target.paths)):
+                write_volume_checksums(zip_target.paths, checksum_path, workers)
+            log(f"ZIP数据已拆分为 {len(zip_target.paths)} 个分卷，共 {format_size(zip_target.size)}，"
+                f"校验文件: {checksum_path}")
+            zip_path = None
+        else:
+            log(f"ZIP文件创建完成: {zip_path}")
+        progress(40)
+
+        # 图片预先缩放为解压界面的尺寸，解压程序启动时直接显示
+        with trace.span("image") as span:
+            temp_image_path = render_splash(image_path, temp_dir)
+            span["bytes"] = os.path.getsize(temp_image_path)
+        log(f"图片已转换为解压界面尺寸: {temp_image_path} ({format_size(os.path.getsize(temp_image_path))})")
+
+        # 图片和ZIP数据默认附加在EXE末尾，解压程序直接映射自身读取，无需先释放到临时目录；
+        # 附加的数据中不能出现PyInstaller的归档标记，否则启动器会找错归档，此时只能打包进EXE内部
+        append_payload = True
+        for path in (temp_image_path, zip_path):
+            if path is not None and file_contains(path, PYINSTALLER_MAGIC):
+                if volume_size:
+                    raise Exception("图片中包含PyInstaller归档标记，分卷模式下无法使用，请换一张图片")
+                log(f"{os.path.basename(path)} 中包含PyInstaller归档标记，改为打包进EXE内部（运行时需要先释放到临时目录）")
+                append_payload = use_stub = False
+                break
+
+        if use_stub:
+            # 使用预编译的通用解压程序，直接追加图片和ZIP数据
+            status("准备预编译解压程序...")
+            progress(50)
+            with trace.span("stub"):
+                stub_path = get_extractor_stub(temp_dir, zip_name, method, debug, log,
+                                               pyinstaller_progress(50, 90), trace)
+
+            status("正在生成EXE文件...")
+            progress(90)
+            log(f"追加数据到预编译解压程序: {stub_path}")
+            with trace.span("append_payload"):
+                append_stub_payload(stub_path, temp_image_path, zip_path, output_path)
+        else:
+            # 创建解压程序脚本
+            status("创建解压程序...")
+            progress(50)
+            log("创建解压程序脚本...")
+
+            with trace.span("script"):
+                extractor_script = create_extractor_script(temp_dir, zip_name, stub_mode=append_payload, method=method)
+            log(f"解压程序脚本创建完成: {extractor_script}")
+
+            # 使用pyinstaller打包解压程序
+            status("正在生成EXE文件...")
+            progress(60)
+            log("开始生成EXE文件...")
+
+            # 解压程序源码不变时复用持久化的构建目录，PyInstaller只需重新打包数据
+            build_key = get_build_key(extractor_script, debug)
+            cache_entry = acquire_build_cache(build_key)
+            if cache_entry:
+                log(f"使用构建缓存: {cache_entry}")
+                build_dir = cache_entry
+                cached_script = os.path.join(cache_entry, "extractor.py")
+                # 只在首次使用时写入脚本，保持修改时间不变，以便PyInstaller跳过分析阶段
+                if not os.path.exists(cached_script):
+                    shutil.copy2(extractor_script, cached_script)
+                extractor_script = cached_script
+                if not append_payload:
+                    data_dir = os.path.join(cache_entry, "data")
+                    os.makedirs(data_dir, exist_ok=True)
+                    zip_path = shutil.move(zip_path, os.path.join(data_dir, os.path.basename(zip_path)))
+                    temp_image_path = shutil.move(temp_image_path, os.path.join(data_dir, SPLASH_NAME))
+            else:
+                log("构建缓存正被其他任务占用，本次使用临时目录构建")
+                build_dir = temp_dir
+
+            # 构建pyinstaller命令：始终用固定名称构建到临时目录（PyInstaller的中间目录和spec文件按名称区分，
+            # 用输出文件名会使每个新名称都重新分析），再追加数据写到输出路径或直接移动到输出路径
+            dist_dir = os.path.join(temp_dir, "dist")
+            if append_payload:
+                data_args = []
+            else:
+                sep = ';' if sys.platform.startswith('win') else ':'
+                data_args = [f"--add-data={zip_path}{sep}.", f"--add-data={temp_image_path}{sep}."]
+            cmd = [
+                sys.executable,  # 使用当前Python解释器
+                "-m", "PyInstaller",  # 确保使用正确的PyInstaller模块
+                "--onefile",
+                "--noconfirm",
+                *data_args,
+                f"--distpath={dist_dir}",
+                f"--workpath={os.path.join(build_dir, 'build')}",
+                f"--specpath={build_dir}",
+                f"--name={EXTRACTOR_BUILD_NAME}",
+                "--noconsole",
+                *[f"--exclude-module={module}" for module in get_excluded_modules(method)],
+                extractor_script
+            ]
+
+            try:
+                with trace.span("pyinstaller", build_cache=bool(cache_entry)):
+                    run_pyinstaller(cmd, build_dir, debug, log, pyinstaller_progress(60, 90),
+                                    timing_key="build_cache" if cache_entry else "full")
+            finally:
+                if cache_entry:
+                    # 数据文件每次都不同，构建后删除，只保留分析结果和中间产物
+                    shutil.rmtree(os.path.join(cache_entry, "data"), ignore_errors=True)
+                    release_build_cache(cache_entry)
+                    for removed in evict_build_cache(BUILD_CACHE_LIMIT):
+                        log(f"淘汰构建缓存: {removed}")
+
+            exe_suffix = ".exe" if sys.platform.startswith('win') else ""
+            built_path = os.path.join(dist_dir, EXTRACTOR_BUILD_NAME + exe_suffix)
+            if not os.path.exists(built_path):
+                log(f"生成的EXE文件未找到: {built_path}")
+                raise Exception("生成EXE失败，文件未找到")
+            if not append_payload:
+                try:
+                    os.replace(built_path, output_path)
+                except OSError:
+                    shutil.copyfile(built_path, output_path)  # 输出目录与临时目录不在同一磁盘
+            else:
+                status("正在追加数据...")
+                progress(90)
+                log(f"追加数据到解压程序: {built_path}")
+                with trace.span("append_payload"):
+                    append_stub_payload(built_path, temp_image_path, zip_path, output_path)
+
+        # 检查输出文件是否存在
+        if not os.path.exists(output_path):
+            log(f"生成的EXE文件未找到: {output_path}")
+            raise Exception("生成EXE失败，文件未找到")
+
+        log(f"EXE文件生成成功: {output_path}")
+        progress(100)
+        status("压缩完成!")
+        return output_path
+
+
+def extract_archive(archive, extract_path, workers=None, on_progress=None, on_status=None, is_cancelled=None,
+                    on_log=None, sync=False, tracer=None):
+    """把自解压EXE或ZIP解压到指定目录，完成返回True，被取消返回False
+
+    archive为文件路径或文件对象；on_progress(已完成数, 总数, 文件名, RateEstimator)在每个文件解压后调用，
+    is_cancelled返回True时停止解压，解压速度定时通过on_log写入日志。
+    取消时保留已完成的文件和解压日志，再次解压到同一目录时只解压剩余的成员。
+    sync为True时（同步模式）跳过解压目录中内容未变化的文件。
+    tracer为Tracer时记录各阶段耗时和解压最慢的文件。
+    """
+    status = on_status or _ignore
+    log = on_log or _ignore
+    trace = tracer or Tracer()
+    workers = workers or os.cpu_count() or 1
+
+    # 整个解压过程只打开一次压缩包，成员数据直接流式写入目标路径
+    with open_archive(archive) if isinstance(archive, str) else zipfile.ZipFile(archive, 'r') as zip_ref:
+        file_list = zip_ref.namelist()
+
+        # 过滤出属于我们打包的文件
+        zip_name = "packed_files"
+        target_files = [f for f in file_list if f.startswith(f"{zip_name}/")]
+
+        # 增量包只能应用在对应的基准版本上
+        archive_info = read_archive_info(zip_ref, zip_name)
+        delta = archive_info["delta"]
+        if delta:
+            check_base_version(extract_path, delta["base_id"])
+
+        if not target_files and not delta:
+            raise Exception("未找到可解压的文件，可能不是本工具生成的自解压文件")
+
+        # 上次解压被中断时只解压剩余的成员
+        journal = ExtractionJournal(extract_path, archive_info["id"])
+        total_files = len(target_files)
+        pending = journal.pending(zip_ref, target_files, zip_name)
+        skipped = total_files - len(pending)
+        if skipped:
+            log(f"继续上次中断的解压: 已完成 {skipped} 个文件，剩余 {len(pending)} 个")
+
+        # 同步模式只写入内容有变化的文件
+        if sync:
+            status("正在比较已有文件...")
+            try:
+                with trace.span("sync_compare", files=len(pending)) as span:
+                    pending = filter_unchanged(zip_ref, pending, extract_path, zip_name, workers, is_cancelled)
+                    span["changed"] = len(pending)
+            except ExtractionCancelled:
+                # 同步模式取消时保留已有文件
+                journal.close()
+                return False
+            skipped = total_files - len(pending)
+
+        # 多线程并行解压文件
+        buffer = bytearray(EXTRACT_BUFFER_SIZE)
+        rate = RateEstimator(sum(zip_ref.getinfo(f).file_size for f in pending), unpacking=True)
+        timings = {}
+        extracted = extract_members(zip_ref, pending, extract_path, zip_name, workers, is_cancelled, timings)
+        try:
+            with trace.span("extract", workers=workers, files=len(pending)):
+                for i, file in enumerate(extracted, skipped + 1):
+                    if is_cancelled and is_cancelled():
+                        raise ExtractionCancelled()
+                    info = zip_ref.getinfo(file)
+                    journal.record(info)
+                    if rate.update(info.file_size, info.compress_size, 1) and rate.log_due():
+                        log(f"解压进度 {rate.progress():.1%}: {rate.summary()}")
+                    if on_progress:
+                        on_progress(i, total_files, file, rate)
+            trace.count("bytes_read", rate.totals[1])
+            trace.count("bytes_written", rate.totals[0])
+            for file, seconds in timings.items():
+                trace.record_file("extract", file, seconds, zip_ref.getinfo(file).file_size)
+
+            links = archive_info["links"]
+            with trace.span("restore_duplicates", files=len(links)):
+                links_skipped = restore_duplicates(links, extract_path, archive_info["files"] if sync else None)
+            if delta:
+                status("正在应用增量更新...")
+                with trace.span("apply_delta", patches=len(delta["patches"])):
+                    apply_delta(zip_ref, delta, extract_path, buffer, journal)
+            write_version_marker(extract_path, archive_info["id"])
+            if sync:
+                log(f"同步完成: 写入 {len(pending) + len(links) - links_skipped} 个文件，"
+                    f"跳过 {skipped + links_skipped} 个未变化的文件")
+        except ExtractionCancelled:
+            # 保留已完成的文件和解压日志，重新运行时继续（写了一半的文件已由stream_member删除）
+            extracted.close()
+            journal.close()
+            return False
+        except BaseException:
+            journal.close()
+            raise
+        journal.finish()
+    return True
+
+
+def verify_archive(archive, extract_path=None, workers=None, on_progress=None, on_log=None, tracer=None):
+    """校验自解压EXE，返回[(路径, 问题)]，没有问题时返回空列表
+
+    extract_path为None时读取并校验压缩包中的全部成员（CRC和SHA-256），
+    否则按压缩包中的摘要清单校验extract_path中已解压的文件；on_progress(已完成数, 总数)。
+    """
+    log = on_log or _ignore
+    trace = tracer or Tracer()
+    workers = workers or os.cpu_count() or 1
+    zip_name = "packed_files"
+    with open_archive(archive) as zip_ref:
+        archive_info = read_archive_info(zip_ref, zip_name)
+        if extract_path is None:
+            with trace.span("verify", target="archive", workers=workers) as span:
+                problems = verify_members(zip_ref, archive_info, zip_name, workers, on_progress)
+                span.update(files=len(archive_info["files"]), problems=len(problems))
+            return problems
+
+    unhashed = len(set(archive_info["files"]) - set(archive_info["hashes"]))
+    if unhashed and archive_info["hashes"]:
+        log(f"{unhashed} 个文件没有摘要（增量基准由旧版本生成），跳过校验")
+    with trace.span("verify", target="files", workers=workers) as span:
+        problems = verify_files(extract_path, archive_info, workers, on_progress)
+        span.update(files=len(archive_info["hashes"]), problems=len(problems))
+    return problems
+
+
+def is_valid_archive(file_path):
+    """验证文件是否为有效的ZIP或自解压EXE格式
+
+    通过locate_payload从文件末尾定位压缩数据并检查其ZIP目录，不读取或解压文件内容。
+    """
+    try:
+        if not os.path.exists(file_path) or not os.path.isfile(file_path):
+            return False
+
+        location = locate_payload(file_path)
+        if location is None:
+            return False
+        offset, size, compressed = location
+        if compressed:
+            # 压缩存放在PyInstaller归档中，不解压时只能确认条目存在
+            return True
+        if size == 0:
+            with open_volumes(file_path) as f:
+                return find_central_directory(f, f.size) is not None
+        with open(file_path, 'rb') as f:
+            return find_central_directory(f, offset + size) is not None
+    except Exception as e:
+        print(f"验证文件时出错: {e}")
+        return False
+
+
+def load_jobs(job_file):
+    """读取批量任务文件，相对路径按任务文件所在目录解析
+
+    任务文件格式: {"defaults": {...}, "archives": [{"output": ..., "inputs": [...], ...}, ...]}，
+    每个任务可用的字段: output, inputs, image, codec, level, workers, stub, delta_base, debug, volume_size,
+    trace, profile（阶段名列表）；defaults中的字段作为所有任务的默认值。也可以直接写成任务列表。
+    """
+    with open(job_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"archives": data}
+
+    base_dir = os.path.dirname(os.path.abspath(job_file))
+    defaults = data.get("defaults", {})
+    jobs = []
+    for index, archive in enumerate(data.get("archives", []), 1):
+        job = dict(defaults, **archive)
+        for key in ("output", "image"):
+            if not job.get(key):
+                raise Exception(f"第 {index} 个任务缺少 {key} 字段")
+            job[key] = os.path.join(base_dir, job[key])
+        if not job.get("inputs"):
+            raise Exception(f"第 {index} 个任务缺少 inputs 字段")
+        job["inputs"] = [os.path.join(base_dir, item) for item in job["inputs"]]
+        for key in ("delta_base", "trace"):
+            if job.get(key):
+                job[key] = os.path.join(base_dir, job[key])
+        if job.get("codec", "Deflate") not in COMPRESSION_CODECS:
+            raise Exception(f"第 {index} 个任务的压缩方式无效: {job['codec']}")
+        jobs.append(job)
+    return jobs
+
+
+def run_job(job, workers=None, log=print):
+    """执行单个打包任务，返回输出路径"""
+    missing = [item for item in job["inputs"] + [job["image"]] if not os.path.exists(item)]
+    if missing:
+        raise Exception(f"文件不存在: {', '.join(missing)}")
+    if job.get("delta_base") and not is_valid_archive(job["delta_base"]):
+        raise Exception(f"增量基准不是有效的自解压文件: {job['delta_base']}")
+
+    output_path = job["output"]
+    if not output_path.lower().endswith(".exe"):
+        output_path += ".exe"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    codec = job.get("codec", "Deflate")
+    method, _, min_level, max_level = COMPRESSION_CODECS[codec]
+    if job.get("level") is not None and not min_level <= job["level"] <= max_level:
+        raise Exception(f"{codec} 的压缩级别应在 {min_level}-{max_level} 之间")
+    tracer = Tracer(job.get("profile") or ()) if job.get("trace") else None
+    try:
+        return pack_archive(job["inputs"], job["image"], output_path,
+                            workers=job.get("workers") or workers,
+                            use_stub=job.get("stub", True),
+                            method=method,
+                            level=job.get("level"),
+                            delta_base=job.get("delta_base", ""),
+                            debug=job.get("debug", False),
+                            on_log=log,
+                            volume_size=parse_size(job["volume_size"]) if job.get("volume_size") else None,
+                            tracer=tracer)
+    finally:
+        if tracer:
+            tracer.save(job["trace"])
+            log(f"跟踪文件已保存: {job['trace']}")
+
+
+def run_batch(jobs, parallel=None, log=print):
+    """并发执行多个打包任务，返回失败的任务及原因列表
+
+    同时运行parallel个任务，CPU核心在任务之间平均分配给各自的压缩进程池。
+    """
+    parallel = max(1, min(parallel or os.cpu_count() or 1, len(jobs) or 1))
+    workers = max(1, (os.cpu_count() or 1) // parallel)
+    log_lock = threading.Lock()
+    failures = []
+
+    def job_log(name):
+        def write(text):
+            with log_lock:
+                log(f"[{name}] {text}")
+        return write
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {}
+        for job in jobs:
+            name = os.path.basename(job["output"])
+            futures[executor.submit(run_job, job, workers, job_log(name))] = (job, name)
+        for future, (job, name) in futures.items():
+            try:
+                output_path = future.result()
+                job_log(name)(f"完成: {output_path}")
+            except Exception as e:
+                job_log(name)(f"失败: {str(e)}")
+                failures.append((job, e))
+    return failures
+
+
+def add_trace_arguments(parser):
+    parser.add_argument("--trace", help="把各阶段耗时、字节数和最慢的文件写入该跟踪文件（JSON）")
+    parser.add_argument("--profile", default="",
+                        help="同时用cProfile采集的阶段，逗号分隔（如 compress,pyinstaller），all表示全部；需配合--trace")
+
+
+def parse_profile(text):
+    return [name.strip() for name in (text or "").split(",") if name.strip()]
+
+
+def main(argv=None):
+    """命令行入口，支持单个打包、批量打包和解压"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="自解压EXE打包工具（无界面模式）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="打包单个自解压EXE")
+    pack_parser.add_argument("inputs", nargs="+", help="要打包的文件或文件夹")
+    pack_parser.add_argument("-o", "--output", required=True, help="输出的EXE路径")
+    pack_parser.add_argument("-i", "--image", required=True, help="解压时显示的图片")
+    pack_parser.add_argument("--codec", choices=list(COMPRESSION_CODECS), default="Deflate", help="压缩方式")
+    pack_parser.add_argument("--level", type=int, help="压缩级别，默认使用压缩方式的默认级别")
+    pack_parser.add_argument("--workers", type=int, help="并行压缩进程数，默认为CPU核心数")
+    pack_parser.add_argument("--full-build", action="store_true", help="不使用预编译解压程序，完整构建EXE")
+    pack_parser.add_argument("--delta-base", default="", help="增量基准（上一版本的自解压EXE）")
+    pack_parser.add_argument("--debug", action="store_true", help="PyInstaller调试模式")
+    pack_parser.add_argument("--volume-size", help="分卷大小（如 4G、700M），数据写成EXE旁边的分卷，适合超大数据")
+    add_trace_arguments(pack_parser)
+
+    batch_parser = subparsers.add_parser("batch", help="按任务文件并发打包多个自解压EXE")
+    batch_parser.add_argument("job_file", help="JSON格式的任务文件")
+    batch_parser.add_argument("-j", "--jobs", type=int, help="同时执行的任务数，默认为CPU核心数")
+
+    extract_parser = subparsers.add_parser("extract", help="解压自解压EXE")
+    extract_parser.add_argument("archive", help="自解压EXE路径")
+    extract_parser.add_argument("-d", "--dest", required=True, help="解压目录")
+    extract_parser.add_argument("--workers", type=int, help="并行解压线程数，默认为CPU核心数")
+    extract_parser.add_argument("--sync", action="store_true", help="同步模式，跳过解压目录中内容未变化的文件")
+    add_trace_arguments(extract_parser)
+
+    verify_parser = subparsers.add_parser("verify", help="校验自解压EXE或已解压的文件")
+    verify_parser.add_argument("archive", help="自解压EXE路径")
+    verify_parser.add_argument("-d", "--dest", help="已解压的目录，指定时按摘要清单校验其中的文件，否则校验压缩包")
+    verify_parser.add_argument("--workers", type=int, help="并行校验线程数，默认为CPU核心数")
+    add_trace_arguments(verify_parser)
+
+    volumes_parser = subparsers.add_parser("check-volumes", help="按校验文件逐个检查分卷")
+    volumes_parser.add_argument("checksum_file", help="打包时生成的 .sha256 校验文件")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "pack":
+            job = {"output": args.output, "inputs": args.inputs, "image": args.image, "codec": args.codec,
+                   "level": args.level, "workers": args.workers, "stub": not args.full_build,
+                   "delta_base": args.delta_base, "debug": args.debug, "volume_size": args.volume_size,
+                   "trace": args.trace, "profile": parse_profile(args.profile)}
+            print(f"EXE文件生成成功: {run_job(job)}")
+        elif args.command == "batch":
+            jobs = load_jobs(args.job_file)
+            failures = run_batch(jobs, args.jobs)
+            print(f"共 {len(jobs)} 个任务，成功 {len(jobs) - len(failures)} 个，失败 {len(failures)} 个")
+            return 1 if failures else 0
+        elif args.command == "verify":
+            tracer = Tracer(parse_profile(args.profile)) if args.trace else None
+            try:
+                problems = verify_archive(args.archive, args.dest, args.workers, on_log=print, tracer=tracer)
+            finally:
+                if tracer:
+                    tracer.save(args.trace)
+                    print(f"跟踪文件已保存: {args.trace}")
+            for path, problem in problems:
+                print(f"{path}: {problem}")
+            print(f"校验完成，发现 {len(problems)} 个问题" if problems else "校验完成，全部正常")
+            return 1 if problems else 0
+        elif args.command == "check-volumes":
+            results = verify_volumes(args.checksum_file)
+            for name, result in results:
+                print(f"{name}: {result}")
+            bad = [name for name, result in results if result != "正常"]
+            print(f"共 {len(results)} 个分卷，异常 {len(bad)} 个")
+            return 1 if bad else 0
+        else:
+            if not is_valid_archive(args.archive):
+                raise Exception("所选文件不是有效的自解压文件，无法解压")
+            os.makedirs(args.dest, exist_ok=True)
+            tracer = Tracer(parse_profile(args.profile)) if args.trace else None
+            try:
+                extract_archive(args.archive, args.dest, args.workers,
+                                on_progress=lambda done, total, file, rate: print(f"[{done}/{total}] {file}"),
+                                on_log=print, sync=args.sync, tracer=tracer)
+            finally:
+                if tracer:
+                    tracer.save(args.trace)
+                    print(f"跟踪文件已保存: {args.trace}")
+            print(f"文件已解压到: {args.dest}")
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
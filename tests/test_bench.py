@@ -0,0 +1,29 @@
+"""性能基准结果对比的测试"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_bench  # noqa: E402
+
+
+def report(**results):
+    return {"scale": 1, "codec": "Deflate", "workers": 4, "results": results}
+
+
+class CompareResultsTest(unittest.TestCase):
+    def test_small_absolute_change_is_not_a_regression(self):
+        # 10ms -> 30ms 增加了200%，但低于绝对下限
+        regressions = sfx_bench.compare_results(report(**{"tiny/pack": {"wall_time": 0.03}}),
+                                                report(**{"tiny/pack": {"wall_time": 0.01}}))
+        self.assertEqual(regressions, [])
+
+    def test_large_change_is_a_regression(self):
+        regressions = sfx_bench.compare_results(report(**{"huge/pack": {"wall_time": 2.0, "cpu_time": 1.0}}),
+                                                report(**{"huge/pack": {"wall_time": 1.0, "cpu_time": 1.0}}))
+        self.assertEqual([(name, metric) for name, metric, _, _, _ in regressions], [("huge/pack", "wall_time")])
+
+
+if __name__ == '__main__':
+    unittest.main()
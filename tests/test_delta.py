@@ -0,0 +1,85 @@
+"""二进制补丁的测试"""
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class BinaryDeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = self.temp.name
+        self.random = random.Random(1)
+        self.old = self.random.randbytes(2 * 1024 * 1024 + 1000)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def round_trip(self, old, new):
+        """生成并应用补丁，检查结果与新文件一致，返回补丁大小"""
+        old_path = os.path.join(self.dir, "old.bin")
+        new_path = os.path.join(self.dir, "new.bin")
+        patch_path = os.path.join(self.dir, "new.patch")
+        result_path = os.path.join(self.dir, "result.bin")
+        with open(old_path, 'wb') as f:
+            f.write(old)
+        with open(new_path, 'wb') as f:
+            f.write(new)
+        size, crc, patch_size = sfx_core.create_binary_delta(io.BytesIO(old), new_path, patch_path)
+        self.assertEqual(size, len(new))
+        self.assertEqual(patch_size, os.path.getsize(patch_path))
+        with open(patch_path, 'rb') as patch:
+            sfx_core.apply_binary_delta(patch, old_path, result_path, bytearray(64 * 1024))
+        with open(result_path, 'rb') as f:
+            self.assertEqual(f.read(), new)
+        return patch_size
+
+    def test_identical(self):
+        self.assertLess(self.round_trip(self.old, self.old), 100)
+
+    def test_insert_at_unaligned_offset(self):
+        new = self.old[:300001] + self.random.randbytes(777) + self.old[300001:]
+        # 插入点之后的数据整体偏移，仍应按复制处理
+        self.assertLess(self.round_trip(self.old, new), 2 * sfx_core.DELTA_BLOCK_SIZE)
+
+    def test_delete_at_unaligned_offset(self):
+        new = self.old[:500003] + self.old[500003 + 12345:]
+        self.assertLess(self.round_trip(self.old, new), 2 * sfx_core.DELTA_BLOCK_SIZE)
+
+    def test_several_edits(self):
+        new = (self.old[:100000] + b"x" * 10 + self.old[100000:900000] + self.old[950007:1800000]
+               + self.random.randbytes(300000) + self.old[1800000:])
+        self.assertLess(self.round_trip(self.old, new), 300000 + 4 * sfx_core.DELTA_BLOCK_SIZE)
+
+    def test_repeated_data(self):
+        old = bytes(1024 * 1024) + self.old[:1024 * 1024]
+        new = b"\1" + bytes(1024 * 1024 - 5) + self.old[:1024 * 1024] + bytes(5000)
+        self.round_trip(old, new)
+
+    def test_unrelated_and_empty(self):
+        self.round_trip(self.old, self.random.randbytes(300000))
+        self.round_trip(self.old, b"")
+        self.round_trip(b"", self.old[:100000])
+
+    def test_modified_old_file_is_rejected(self):
+        new = self.old[:1000] + b"changed" + self.old[1000:]
+        old_path = os.path.join(self.dir, "old.bin")
+        new_path = os.path.join(self.dir, "new.bin")
+        patch_path = os.path.join(self.dir, "new.patch")
+        with open(new_path, 'wb') as f:
+            f.write(new)
+        sfx_core.create_binary_delta(io.BytesIO(self.old), new_path, patch_path)
+        with open(old_path, 'wb') as f:
+            f.write(self.old[:-1] + bytes([self.old[-1] ^ 1]))
+        with open(patch_path, 'rb') as patch, self.assertRaises(Exception):
+            sfx_core.apply_binary_delta(patch, old_path, os.path.join(self.dir, "result.bin"), bytearray(4096))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""解压和同步模式的测试"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class SyncCancelTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.temp.name, "data.zip")
+        self.extract_path = os.path.join(self.temp.name, "out")
+        with zipfile.ZipFile(self.archive, 'w') as zip_ref:
+            for i in range(20):
+                zip_ref.writestr(f"packed_files/{i}.txt", f"file {i}\n" * 100)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_cancel_during_sync_compare_keeps_files(self):
+        self.assertTrue(sfx_core.extract_archive(self.archive, self.extract_path, 2))
+        statuses = []
+        done = sfx_core.extract_archive(self.archive, self.extract_path, 2, on_status=statuses.append,
+                                        is_cancelled=lambda: True, sync=True)
+        self.assertFalse(done)
+        self.assertIn("正在比较已有文件...", statuses)
+        for i in range(20):
+            self.assertTrue(os.path.isfile(os.path.join(self.extract_path, f"{i}.txt")))
+
+    def test_cancel_keeps_finished_files_and_resumes(self):
+        other = os.path.join(self.extract_path, "unrelated.txt")
+        os.makedirs(self.extract_path)
+        with open(other, 'w') as f:
+            f.write("keep")
+        first = []
+        done = sfx_core.extract_archive(self.archive, self.extract_path, 2,
+                                        on_progress=lambda *args: first.append(args[0]),
+                                        is_cancelled=lambda: len(first) >= 5)
+        self.assertFalse(done)
+        self.assertEqual(len(first), 5)
+        self.assertTrue(os.path.exists(other))
+        self.assertTrue(os.path.exists(os.path.join(self.extract_path, sfx_core.JOURNAL_NAME)))
+
+        # 再次解压只处理剩余的成员，序号从已完成的数量之后开始
+        second = []
+        self.assertTrue(sfx_core.extract_archive(self.archive, self.extract_path, 2,
+                                                 on_progress=lambda *args: second.append(args[0])))
+        self.assertEqual(second, list(range(6, 21)))
+        for i in range(20):
+            with open(os.path.join(self.extract_path, f"{i}.txt")) as f:
+                self.assertEqual(f.read(), f"file {i}\n" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.extract_path, sfx_core.JOURNAL_NAME)))
+
+    def test_sync_skips_unchanged(self):
+        self.assertTrue(sfx_core.extract_archive(self.archive, self.extract_path, 2))
+        progress = []
+        self.assertTrue(sfx_core.extract_archive(self.archive, self.extract_path, 2,
+                                                 on_progress=lambda *args: progress.append(args), sync=True))
+        self.assertEqual(progress, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""并行压缩写入ZIP的测试"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class ChangedFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp.name, "src")
+        os.makedirs(self.source)
+        for name in ("a.txt", "b.txt"):
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(b"x" * 1000)
+        self.entries = sfx_core.scan_manifest([self.source], "packed_files")
+        self.zip_path = os.path.join(self.temp.name, "out.zip")
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def resize(self, name, size):
+        with open(os.path.join(self.source, name), 'wb') as f:
+            f.write(b"y" * size)
+
+    def test_unchanged_files_pack(self):
+        sfx_core.parallel_write_zip(self.zip_path, self.entries, 1)
+        with zipfile.ZipFile(self.zip_path) as zip_ref:
+            self.assertIsNone(zip_ref.testzip())
+            self.assertEqual(len(zip_ref.namelist()), 2)
+
+    def test_file_shrunk_after_scan(self):
+        self.resize(os.path.basename(self.entries[0][0]), 400)
+        with self.assertRaisesRegex(Exception, "打包过程中被修改"):
+            sfx_core.parallel_write_zip(self.zip_path, self.entries, 1)
+
+    def test_file_grown_after_scan(self):
+        self.resize(os.path.basename(self.entries[-1][0]), 1500)
+        with self.assertRaisesRegex(Exception, "打包过程中被修改"):
+            sfx_core.parallel_write_zip(self.zip_path, self.entries, 1)
+
+    def test_large_file_shrunk_after_scan(self):
+        # 超过PACK_CHUNK_SIZE的文件按块压缩
+        path = os.path.join(self.source, "a.txt")
+        with open(path, 'wb') as f:
+            f.write(b"z" * (sfx_core.PACK_CHUNK_SIZE + 1000))
+        entries = sfx_core.scan_manifest([path], "packed_files")
+        self.resize("a.txt", sfx_core.PACK_CHUNK_SIZE + 10)
+        with self.assertRaisesRegex(Exception, "打包过程中被修改"):
+            sfx_core.parallel_write_zip(self.zip_path, entries, 1)
+
+
+class MethodStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp.name, "src")
+        os.makedirs(self.source)
+        self.zip_path = os.path.join(self.temp.name, "out.zip")
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.source, name), 'wb') as f:
+            f.write(data)
+
+    def test_fallback_to_stored_is_not_counted_as_skipped(self):
+        # 随机数据压缩后不会变小，由工作进程改为存储；.zip文件按扩展名直接存储
+        self.write("random.bin", os.urandom(5000))
+        self.write("archive.zip", os.urandom(3000))
+        self.write("text.txt", b"abc" * 10000)
+        entries = sfx_core.scan_manifest([self.source], "packed_files")
+        stats = sfx_core.parallel_write_zip(self.zip_path, entries, 1)
+        stored = stats[zipfile.ZIP_STORED]
+        self.assertEqual((stored['files'], stored['raw'], stored['skipped']), (2, 8000, 3000))
+        self.assertEqual(stats[zipfile.ZIP_DEFLATED]['skipped'], 0)
+
+    def test_no_savings_estimate_without_skipped_files(self):
+        stats = {
+            zipfile.ZIP_STORED: {'files': 1, 'raw': 5000, 'packed': 5000, 'seconds': 0.1, 'skipped': 0},
+            zipfile.ZIP_DEFLATED: {'files': 1, 'raw': 30000, 'packed': 100, 'seconds': 0.1, 'skipped': 0},
+        }
+        self.assertNotIn("跳过压缩", "".join(sfx_core.format_method_stats(stats)))
+        stats[zipfile.ZIP_STORED]['skipped'] = 3000
+        self.assertIn("跳过压缩约节省 0.0 秒", sfx_core.format_method_stats(stats)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""压缩包预览索引的测试"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class ArchiveIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = self.temp.name
+        self.zip_path = os.path.join(self.dir, "packed_files.zip")
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def names(self, index):
+        return sorted(index.name(i) for i in range(len(index)))
+
+    def test_duplicates_listed_and_info_hidden(self):
+        source = os.path.join(self.dir, "src")
+        os.makedirs(source)
+        for i in range(5):
+            with open(os.path.join(source, f"same{i}.txt"), 'w') as f:
+                f.write("same content\n" * 100)
+        with open(os.path.join(source, "other.txt"), 'w') as f:
+            f.write("other")
+        entries = sfx_core.scan_manifest([source], "packed_files")
+        sfx_core.write_packed_zip(self.zip_path, entries, "packed_files", 1, zipfile.ZIP_DEFLATED, 6)
+
+        index = sfx_core.build_archive_index(self.zip_path)
+        expected = sorted(f"packed_files/src/src/same{i}.txt" for i in range(5)) + ["packed_files/src/src/other.txt"]
+        self.assertEqual(self.names(index), sorted(expected))
+        files, size, packed = index.totals()
+        self.assertEqual(files, 6)
+        self.assertEqual(size, 5 * 1300 + 5)
+        self.assertEqual(index.totals(b"packed_files/src/src")[0], 6)
+
+    def test_delta_patches_shown_as_updated_files(self):
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            zip_ref.writestr("packed_files/new.txt", "new")
+            zip_ref.writestr(sfx_core.DELTA_PREFIX + "dir/big.bin", b"patch" * 10)
+        sfx_core.write_archive_info(self.zip_path, "packed_files", unchanged={"same.txt": (4, 1)},
+                                    patches={"dir/big.bin": (1000, 2)}, deleted=[], base_id="base")
+
+        index = sfx_core.build_archive_index(self.zip_path)
+        self.assertEqual(self.names(index), ["packed_files/dir/big.bin", "packed_files/new.txt"])
+        self.assertEqual(index.totals()[:2], (2, 1003))
+
+
+if __name__ == '__main__':
+    unittest.main()
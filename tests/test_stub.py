@@ -0,0 +1,69 @@
+"""stub模式追加数据的测试"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class StubPayloadTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = self.temp.name
+        self.image = os.path.join(self.dir, "splash.png")
+        with open(self.image, 'wb') as f:
+            f.write(b"image" * 100)
+        self.zip_path = os.path.join(self.dir, "packed_files.zip")
+        with zipfile.ZipFile(self.zip_path, 'w') as zip_ref:
+            zip_ref.writestr("packed_files/a.txt", "hello\n" * 1000)
+        self.output = os.path.join(self.dir, "out.exe")
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def write_stub(self, data):
+        path = os.path.join(self.dir, "stub.exe")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def check_payload(self):
+        image_offset, image_size, zip_offset, zip_size, image_name = sfx_core.read_stub_trailer(self.output)
+        self.assertEqual(image_name, "splash.png")
+        with open(self.output, 'rb') as f:
+            f.seek(image_offset)
+            self.assertEqual(f.read(image_size), b"image" * 100)
+        self.assertEqual(zip_size, os.path.getsize(self.zip_path))
+        with sfx_core.open_archive(self.output) as zip_ref:
+            self.assertEqual(zip_ref.read("packed_files/a.txt"), b"hello\n" * 1000)
+
+    def test_payload_inserted_before_pyinstaller_archive(self):
+        # 启动器只需要在文件末尾找到cookie，归档内容整体后移后仍按cookie中的长度定位
+        package = b"toc and data" * 50
+        cookie = sfx_core.PYINSTALLER_COOKIE
+        package += cookie.pack(sfx_core.PYINSTALLER_MAGIC, len(package) + cookie.size, 0, 0, 312, b"python312.dll")
+        bootloader = b"MZ" + b"\0" * 1000
+        sfx_core.append_stub_payload(self.write_stub(bootloader + package), self.image, self.zip_path, self.output)
+
+        with open(self.output, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(bootloader))
+        self.assertTrue(data.endswith(package))
+        with open(self.output, 'rb') as f:
+            self.assertEqual(sfx_core.find_package_start(f, len(data)), len(data) - len(package))
+        self.check_payload()
+
+    def test_payload_appended_without_archive_at_end(self):
+        stub = b"\x7fELF" + b"\0" * 1000
+        sfx_core.append_stub_payload(self.write_stub(stub), self.image, self.zip_path, self.output)
+        with open(self.output, 'rb') as f:
+            self.assertTrue(f.read().startswith(stub))
+        self.check_payload()
+
+
+if __name__ == '__main__':
+    unittest.main()
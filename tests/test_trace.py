@@ -0,0 +1,39 @@
+"""性能跟踪的测试"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class TracerTest(unittest.TestCase):
+    def test_nested_spans_profile_outermost_only(self):
+        tracer = sfx_core.Tracer(["all"])
+        with tracer.span("stub"):
+            with tracer.span("script"):
+                sum(range(1000))
+            with tracer.span("pyinstaller"):
+                sum(range(1000))
+        with tracer.span("append_payload"):
+            pass
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "trace.json")
+            tracer.save(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                trace = json.load(f)
+            self.assertEqual(sorted(trace["profiles"]), ["append_payload", "stub"])
+            for name in trace["profiles"].values():
+                self.assertTrue(os.path.exists(name))
+        spans = {span["name"]: span for span in trace["spans"]}
+        self.assertEqual(spans["script"]["profiled_in"], "stub")
+        self.assertEqual(spans["pyinstaller"]["profiled_in"], "stub")
+        self.assertNotIn("profiled_in", spans["stub"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""分卷写入和读取的测试"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfx_core  # noqa: E402
+
+
+class VolumeRepackTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = self.temp.name
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def pack(self, base, size):
+        """把size字节的数据以1KB一卷写成分卷ZIP"""
+        source = os.path.join(self.dir, "data.bin")
+        with open(source, 'wb') as f:
+            f.write(os.urandom(size))
+        entries = sfx_core.scan_manifest([source], "packed_files")
+        writer = sfx_core.VolumeWriter(base, 1024)
+        try:
+            sfx_core.parallel_write_zip(writer, entries, 1, method=zipfile.ZIP_STORED, force_zip64=True)
+        finally:
+            writer.close()
+        return writer.paths
+
+    def test_repack_to_fewer_volumes_removes_stale_volumes(self):
+        # 输出文件名中带点时，分卷名称是去掉.exe后的 rel-1.2.001 ...
+        base = os.path.join(self.dir, "rel-1.2")
+        unrelated = os.path.join(self.dir, "rel-1.001")
+        with open(unrelated, 'wb') as f:
+            f.write(b"keep")
+
+        first = self.pack(base, 8 * 1024)
+        second = self.pack(base, 2 * 1024)
+        self.assertLess(len(second), len(first))
+
+        self.assertEqual(sfx_core.find_volumes(base + ".exe"), second)
+        self.assertTrue(os.path.exists(unrelated))
+        with zipfile.ZipFile(sfx_core.open_volumes(base + ".exe")) as zip_ref:
+            self.assertIsNone(zip_ref.testzip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,13 +4,32 @@ import zipfile
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
 from PIL import Image, ImageTk
-import shutil
 import tempfile
 import subprocess
-import time
 import threading
 import traceback
-from pathlib import Path
+import queue
+import multiprocessing
+
+from sfx_core import (
+    COMPRESSION_CODECS,
+    ZIP_ZSTANDARD,
+    zstandard,
+    compare_codecs,
+    pack_archive,
+    extract_archive,
+    is_valid_archive,
+    open_archive,
+    verify_archive,
+    scan_manifest,
+    build_archive_index,
+    format_size,
+    find_volumes,
+    Tracer,
+)
+
+UI_REFRESH_INTERVAL = 50  # 界面刷新间隔（毫秒），后台线程投递的事件在每次刷新时合并处理
+PREVIEW_PAGE_SIZE = 2000  # 预览中每次展开最多显示的条目数，其余条目在"显示更多"节点展开时再加载
 
 
 class FileCompressorDecompressor:
@@ -31,9 +50,11 @@ class FileCompressorDecompressor:
         self.image_path = ""
         self.output_dir = os.getcwd()
         self.pyinstaller_log = ""  # 存储PyInstaller的日志
+        self.ui_events = queue.Queue()  # 后台线程投递的界面事件，只在主线程中处理
 
         # 创建界面
         self.create_widgets()
+        self.root.after(UI_REFRESH_INTERVAL, self.process_ui_events)
 
     def setup_fonts(self):
         # 设置默认字体支持中文
@@ -91,12 +112,60 @@ class FileCompressorDecompressor:
         self.pyinstaller_log = ""
 
     def append_log(self, text):
-        """向日志添加内容"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, text + "\n")
-        self.log_text.see(tk.END)  # 滚动到最后
-        self.log_text.config(state=tk.DISABLED)
-        self.pyinstaller_log += text + "\n"
+        """向日志添加内容（可在任意线程调用）"""
+        self.ui_events.put(("log", text))
+
+    def show_message(self, show, title, message):
+        """在主线程中弹出消息框（可在任意线程调用）"""
+        self.call_in_ui(show, title, message)
+
+    def call_in_ui(self, func, *args):
+        """在主线程中调用func(*args)（可在任意线程调用）"""
+        self.ui_events.put(("call", func) + args)
+
+    def process_ui_events(self):
+        """定时处理后台线程投递的界面事件
+
+        进度和状态只保留最新值，日志合并成一次插入，界面更新次数与文件数量无关。
+        """
+        progress = status = rate = None
+        logs = []
+        calls = []
+        try:
+            while True:
+                event = self.ui_events.get_nowait()
+                if event[0] == "progress":
+                    progress = event[1]
+                elif event[0] == "status":
+                    status = event[1:]
+                elif event[0] == "rate":
+                    rate = event[1]
+                elif event[0] == "log":
+                    logs.append(event[1])
+                else:
+                    calls.append(event[1:])
+        except queue.Empty:
+            pass
+
+        if logs:
+            text = "\n".join(logs) + "\n"
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, text)
+            self.log_text.see(tk.END)  # 滚动到最后
+            self.log_text.config(state=tk.DISABLED)
+            self.pyinstaller_log += text
+        if progress is not None:
+            self.compress_progress_var.set(progress)
+            self.compress_percent_label.config(text=f"{int(progress)}%")
+        if status is not None:
+            text, is_error = status
+            self.compress_status_label.config(text=text, foreground="red" if is_error else "blue")
+        if rate is not None:
+            self.compress_rate_label.config(text=rate)
+        for func, *args in calls:
+            func(*args)
+
+        self.root.after(UI_REFRESH_INTERVAL, self.process_ui_events)
 
     def create_compress_tab(self):
         # 压缩标签页内容
@@ -170,6 +239,25 @@ class FileCompressorDecompressor:
 
         ttk.Label(name_frame, text=".exe").pack(side=tk.LEFT, padx=5)
 
+        # 压缩方式
+        codec_frame = ttk.Frame(options_frame)
+        codec_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Label(codec_frame, text="压缩方式:").pack(side=tk.LEFT, padx=5)
+        self.compress_codec = tk.StringVar(value="Deflate")
+        codec_combo = ttk.Combobox(codec_frame, textvariable=self.compress_codec, state="readonly",
+                                   values=list(COMPRESSION_CODECS), width=12)
+        codec_combo.pack(side=tk.LEFT, padx=5)
+        codec_combo.bind("<<ComboboxSelected>>", self.on_codec_selected)
+
+        ttk.Label(codec_frame, text="级别:").pack(side=tk.LEFT, padx=5)
+        self.compress_level = tk.IntVar(value=COMPRESSION_CODECS["Deflate"][1])
+        self.level_spin = ttk.Spinbox(codec_frame, from_=1, to=9, textvariable=self.compress_level, width=5)
+        self.level_spin.pack(side=tk.LEFT, padx=5)
+
+        compare_btn = ttk.Button(codec_frame, text="对比压缩方式", command=self.start_codec_comparison)
+        compare_btn.pack(side=tk.LEFT, padx=5)
+
         # 高级选项
         advanced_frame = ttk.LabelFrame(options_frame, text="高级选项", padding="5")
         advanced_frame.pack(fill=tk.X, pady=5)
@@ -178,6 +266,45 @@ class FileCompressorDecompressor:
         debug_check = ttk.Checkbutton(advanced_frame, text="调试模式（显示更多日志）", variable=self.debug_mode)
         debug_check.pack(anchor=tk.W, padx=5, pady=2)
 
+        self.stub_mode = tk.BooleanVar(value=True)
+        stub_check = ttk.Checkbutton(advanced_frame, text="使用预编译解压程序（只需构建一次，生成速度快）",
+                                     variable=self.stub_mode)
+        stub_check.pack(anchor=tk.W, padx=5, pady=2)
+
+        self.trace_mode = tk.BooleanVar(value=False)
+        trace_check = ttk.Checkbutton(advanced_frame, text="记录性能跟踪（各阶段耗时，保存为EXE旁边的 .trace.json）",
+                                      variable=self.trace_mode)
+        trace_check.pack(anchor=tk.W, padx=5, pady=2)
+
+        base_frame = ttk.Frame(advanced_frame)
+        base_frame.pack(fill=tk.X, padx=5, pady=2)
+
+        ttk.Label(base_frame, text="增量基准（上一版自解压EXE，留空则完整打包）:").pack(side=tk.LEFT)
+        self.delta_base_entry = ttk.Entry(base_frame)
+        self.delta_base_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        browse_base_btn = ttk.Button(base_frame, text="浏览", command=self.browse_delta_base)
+        browse_base_btn.pack(side=tk.LEFT, padx=5)
+
+        workers_frame = ttk.Frame(advanced_frame)
+        workers_frame.pack(anchor=tk.W, padx=5, pady=2)
+
+        ttk.Label(workers_frame, text="并行压缩进程数:").pack(side=tk.LEFT)
+        cpu_count = os.cpu_count() or 1
+        self.compress_workers = tk.IntVar(value=cpu_count)
+        workers_spin = ttk.Spinbox(workers_frame, from_=1, to=max(cpu_count, 64),
+                                   textvariable=self.compress_workers, width=5)
+        workers_spin.pack(side=tk.LEFT, padx=5)
+
+        volume_frame = ttk.Frame(advanced_frame)
+        volume_frame.pack(anchor=tk.W, padx=5, pady=2)
+
+        ttk.Label(volume_frame, text="分卷大小（MB，0为不分卷，超大数据建议使用）:").pack(side=tk.LEFT)
+        self.volume_size_mb = tk.IntVar(value=0)
+        volume_spin = ttk.Spinbox(volume_frame, from_=0, to=1024 * 1024, increment=1024,
+                                  textvariable=self.volume_size_mb, width=8)
+        volume_spin.pack(side=tk.LEFT, padx=5)
+
         # 进度区域
         progress_frame = ttk.Frame(main_frame)
         progress_frame.pack(fill=tk.X, pady=10)
@@ -191,7 +318,11 @@ class FileCompressorDecompressor:
 
         # 状态标签
         self.compress_status_label = ttk.Label(main_frame, text="就绪", foreground="blue")
-        self.compress_status_label.pack(anchor=tk.W, pady=(0, 10))
+        self.compress_status_label.pack(anchor=tk.W)
+
+        # 速度和剩余时间
+        self.compress_rate_label = ttk.Label(main_frame, text="")
+        self.compress_rate_label.pack(anchor=tk.W, pady=(0, 10))
 
         # 压缩按钮
         compress_btn = ttk.Button(main_frame, text="生成自解压EXE", command=self.start_compression)
@@ -226,13 +357,45 @@ class FileCompressorDecompressor:
         browse_output_btn = ttk.Button(output_frame, text="浏览", command=self.browse_decompress_output)
         browse_output_btn.pack(side=tk.LEFT, padx=5)
 
+        # 解压线程数
+        workers_frame = ttk.Frame(main_frame)
+        workers_frame.pack(fill=tk.X, pady=(0, 10))
+
+        ttk.Label(workers_frame, text="解压线程数:").pack(side=tk.LEFT, padx=5)
+        cpu_count = os.cpu_count() or 1
+        self.decompress_workers = tk.IntVar(value=min(32, cpu_count))
+        workers_spin = ttk.Spinbox(workers_frame, from_=1, to=max(cpu_count, 64),
+                                   textvariable=self.decompress_workers, width=5)
+        workers_spin.pack(side=tk.LEFT, padx=5)
+
+        # 同步模式: 重复解压到同一目录时只写入有变化的文件
+        self.decompress_sync = tk.BooleanVar(value=False)
+        sync_check = ttk.Checkbutton(workers_frame, text="同步模式（跳过未变化的文件）", variable=self.decompress_sync)
+        sync_check.pack(side=tk.LEFT, padx=15)
+
         # 预览区域
         preview_frame = ttk.LabelFrame(main_frame, text="预览", padding="10")
         preview_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
 
-        self.preview_text = scrolledtext.ScrolledText(preview_frame, wrap=tk.WORD, height=10)
-        self.preview_text.pack(fill=tk.BOTH, expand=True)
-        self.preview_text.config(state=tk.DISABLED)
+        # 目录树只在展开时加载子节点，大目录分页显示
+        self.preview_tree = ttk.Treeview(preview_frame, columns=("size", "packed", "files"), height=10)
+        self.preview_tree.heading("#0", text="名称")
+        self.preview_tree.heading("size", text="大小")
+        self.preview_tree.heading("packed", text="压缩后")
+        self.preview_tree.heading("files", text="文件数")
+        self.preview_tree.column("#0", width=400)
+        for column in ("size", "packed", "files"):
+            self.preview_tree.column(column, width=100, anchor=tk.E)
+        preview_scroll = ttk.Scrollbar(preview_frame, orient=tk.VERTICAL, command=self.preview_tree.yview)
+        self.preview_tree.configure(yscrollcommand=preview_scroll.set)
+        preview_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.preview_tree.pack(fill=tk.BOTH, expand=True)
+        self.preview_tree.bind("<<TreeviewOpen>>", self.on_preview_open)
+        self.preview_tree.bind("<<TreeviewClose>>", self.on_preview_close)
+        self.preview_index = None
+        self.preview_nodes = {}  # 未加载的节点: 节点ID -> (目录路径, 已显示条目数, 是否显示全部剩余条目)
+        self.preview_dirs = {}  # 已显示的目录节点: 节点ID -> 目录路径，折叠时释放其子节点
+        self.preview_generation = 0  # 折叠目录或重新预览时加一，停止正在分批显示的条目
 
         # 进度区域
         progress_frame = ttk.Frame(main_frame)
@@ -250,9 +413,19 @@ class FileCompressorDecompressor:
         self.decompress_status_label = ttk.Label(main_frame, text="就绪", foreground="blue")
         self.decompress_status_label.pack(anchor=tk.W, pady=(0, 10))
 
-        # 解压按钮
-        decompress_btn = ttk.Button(main_frame, text="开始解压", command=self.start_decompression)
-        decompress_btn.pack(pady=10)
+        # 解压和校验按钮
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=10)
+
+        decompress_btn = ttk.Button(button_frame, text="开始解压", command=self.start_decompression)
+        decompress_btn.pack(side=tk.LEFT, padx=5)
+
+        verify_btn = ttk.Button(button_frame, text="校验压缩包", command=lambda: self.start_verification(False))
+        verify_btn.pack(side=tk.LEFT, padx=5)
+
+        verify_files_btn = ttk.Button(button_frame, text="校验已解压文件",
+                                      command=lambda: self.start_verification(True))
+        verify_files_btn.pack(side=tk.LEFT, padx=5)
 
     def create_about_tab(self):
         # 关于标签页内容
@@ -268,12 +441,18 @@ class FileCompressorDecompressor:
 2. 自定义解压过程中显示的图片
 3. 解压由本工具生成的自解压EXE文件（支持双击自动解压）
 4. 直观的进度显示和操作反馈
+5. 可选Deflate、LZMA、BZIP2、Zstandard压缩方式和压缩级别
+   （点击"对比压缩方式"可用待压缩文件实测各方式的压缩率和速度）
+6. 增量自解压包：指定上一版自解压EXE作为基准，只打包新增或变化的文件，
+   大文件生成二进制补丁，解压时在已解压的基准版本上直接更新
+7. 完整性校验：压缩包内附带每个文件的SHA-256清单，可多线程校验压缩包或已解压的文件
+   （生成的EXE也可用 --verify、--verify-files 参数运行校验）
 
 使用说明：
 - 在"压缩文件"标签页添加需要压缩的文件/文件夹，选择解压图片和输出目录，点击"生成自解压EXE"
 - 生成的EXE文件可双击直接解压，也可在"解压文件"标签页选择解压
 
-版本: 1.3.1
+版本: 1.4.0
         """
 
         text_widget = scrolledtext.ScrolledText(main_frame, wrap=tk.WORD, font=('SimHei', 10))
@@ -323,14 +502,53 @@ class FileCompressorDecompressor:
             self.compress_output_entry.delete(0, tk.END)
             self.compress_output_entry.insert(0, directory)
 
+    def browse_delta_base(self):
+        file_path = filedialog.askopenfilename(
+            title="选择上一版自解压EXE",
+            filetypes=[("EXE文件", "*.exe"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            self.delta_base_entry.delete(0, tk.END)
+            self.delta_base_entry.insert(0, file_path)
+
+    def on_codec_selected(self, event=None):
+        """切换压缩方式时更新级别范围和默认值"""
+        _, level, min_level, max_level = COMPRESSION_CODECS[self.compress_codec.get()]
+        self.level_spin.config(from_=min_level, to=max_level)
+        self.compress_level.set(level)
+
+    def start_codec_comparison(self):
+        if not self.compress_files:
+            messagebox.showwarning("警告", "请添加要压缩的文件或文件夹")
+            return
+        threading.Thread(target=self.perform_codec_comparison, daemon=True).start()
+
+    def perform_codec_comparison(self):
+        """用待压缩文件的样本对比各压缩方式的压缩率和速度，结果写入日志"""
+        try:
+            self.update_compress_status("正在对比压缩方式...")
+            paths = [entry[0] for entry in scan_manifest(self.compress_files, "")]
+
+            self.append_log("压缩方式对比（样本最多16MB，各方式使用默认级别）:")
+            self.append_log(f"  {'方式':<10}{'级别':>4}{'压缩率':>10}{'压缩MB/s':>12}{'解压MB/s':>12}")
+            for name, level, ratio, compress_speed, decompress_speed in compare_codecs(paths):
+                self.append_log(f"  {name:<10}{level:>4}{ratio:>10.1%}{compress_speed:>12.1f}{decompress_speed:>12.1f}")
+            if zstandard is None:
+                self.append_log("  （未安装zstandard库，跳过Zstandard）")
+            self.update_compress_status("压缩方式对比完成，结果见'运行日志'")
+        except Exception as e:
+            self.append_log(f"对比压缩方式出错: {str(e)}")
+            self.append_log(traceback.format_exc())
+            self.update_compress_status(f"对比压缩方式失败: {str(e)}", is_error=True)
+
     def update_compress_progress(self, value):
-        self.compress_progress_var.set(value)
-        self.compress_percent_label.config(text=f"{int(value)}%")
-        self.root.update_idletasks()
+        self.ui_events.put(("progress", value))
 
     def update_compress_status(self, text, is_error=False):
-        self.compress_status_label.config(text=text, foreground="red" if is_error else "blue")
-        self.root.update_idletasks()
+        self.ui_events.put(("status", text, is_error))
+
+    def update_compress_rate(self, text):
+        self.ui_events.put(("rate", text))
 
     # 解压相关方法
     def browse_decompress_file(self):
@@ -360,32 +578,120 @@ class FileCompressorDecompressor:
         self.root.update_idletasks()
 
     def preview_archive(self):
-        try:
-            self.preview_text.config(state=tk.NORMAL)
-            self.preview_text.delete(1.0, tk.END)
+        """在后台线程读取压缩包目录，完成后显示目录树"""
+        self.preview_tree.delete(*self.preview_tree.get_children())
+        self.preview_index = None
+        self.preview_nodes = {}
+        self.preview_dirs = {}
+        self.preview_generation += 1
 
-            if not self.extract_file or not os.path.exists(self.extract_file):
-                self.preview_text.insert(tk.END, "请选择有效的EXE文件")
-                self.preview_text.config(state=tk.DISABLED)
-                return
+        if not self.extract_file or not os.path.exists(self.extract_file):
+            self.preview_tree.insert("", tk.END, text="请选择有效的EXE文件")
+            return
 
-            # 先验证是否为有效的ZIP或自解压文件
-            if not self.is_valid_zip(self.extract_file):
-                self.preview_text.insert(tk.END, "所选文件不是有效的自解压文件")
-                self.preview_text.config(state=tk.DISABLED)
-                return
+        # 先验证是否为有效的ZIP或自解压文件
+        if not self.is_valid_zip(self.extract_file):
+            self.preview_tree.insert("", tk.END, text="所选文件不是有效的自解压文件")
+            return
 
-            # 尝试预览压缩包内容
-            with zipfile.ZipFile(self.extract_file, 'r') as zip_ref:
-                self.preview_text.insert(tk.END, "压缩包内容预览:\n\n")
-                for file_info in zip_ref.infolist():
-                    if not file_info.filename.endswith('/'):  # 只显示文件，不显示目录
-                        self.preview_text.insert(tk.END, f"- {file_info.filename}\n")
+        self.preview_tree.insert("", tk.END, text="正在读取压缩包目录...")
+        threading.Thread(target=self.load_preview_index, args=(self.extract_file,), daemon=True).start()
 
-            self.preview_text.config(state=tk.DISABLED)
+    def load_preview_index(self, file_path):
+        try:
+            index = build_archive_index(file_path)
         except Exception as e:
-            self.preview_text.insert(tk.END, f"无法预览压缩包内容: {str(e)}")
-            self.preview_text.config(state=tk.DISABLED)
+            self.call_in_ui(self.show_preview, file_path, None, f"无法预览压缩包内容: {str(e)}")
+            return
+        self.call_in_ui(self.show_preview, file_path, index, None)
+
+    def show_preview(self, file_path, index, error):
+        # 读取期间已经选择了其他文件时忽略结果
+        if file_path != self.extract_file:
+            return
+        self.preview_tree.delete(*self.preview_tree.get_children())
+        if error:
+            self.preview_tree.insert("", tk.END, text=error)
+            return
+        self.preview_index = index
+        files, size, packed = index.totals()
+        self.decompress_status_label.config(
+            text=f"共 {files} 个文件，{format_size(size)}，压缩后 {format_size(packed)}", foreground="blue")
+        self.load_preview_page("", b"", 0)
+
+    def load_preview_page(self, parent, dir_path, start, more_nodes=True):
+        """在parent节点下显示目录中从start开始的一页条目，返回显示到的位置"""
+        index = self.preview_index
+        sub_dirs, files = index.children(dir_path)
+        total = len(sub_dirs) + len(files)
+        end = min(start + PREVIEW_PAGE_SIZE, total)
+        for i in range(start, end):
+            if i < len(sub_dirs):
+                path = sub_dirs[i]
+                count, size, packed = index.totals(path)
+                node = self.preview_tree.insert(
+                    parent, tk.END, text=index.dir_name(path),
+                    values=(format_size(size), format_size(packed), count))
+                # 先放一个占位子节点，展开时再加载
+                self.preview_tree.insert(node, tk.END)
+                self.preview_nodes[node] = (path, 0, False)
+                self.preview_dirs[node] = path
+            else:
+                file_index = files[i - len(sub_dirs)]
+                self.preview_tree.insert(
+                    parent, tk.END, text=index.name(file_index).rpartition("/")[2],
+                    values=(format_size(index.sizes[file_index]), format_size(index.packed_sizes[file_index]), ""))
+        if more_nodes and end < total:
+            node = self.preview_tree.insert(parent, tk.END, text=f"... 还有 {total - end} 项（展开显示更多）")
+            self.preview_tree.insert(node, tk.END)
+            self.preview_nodes[node] = (dir_path, end, False)
+            node = self.preview_tree.insert(parent, tk.END, text=f"... 展开显示全部剩余 {total - end} 项")
+            self.preview_tree.insert(node, tk.END)
+            self.preview_nodes[node] = (dir_path, end, True)
+        return end
+
+    def load_preview_rest(self, parent, dir_path, start, generation):
+        """分批显示目录中剩余的全部条目，每批之间处理界面事件，窗口不会卡住"""
+        if generation != self.preview_generation:
+            return  # 已折叠目录或选择了其他文件
+        end = self.load_preview_page(parent, dir_path, start, more_nodes=False)
+        sub_dirs, files = self.preview_index.children(dir_path)
+        if end < len(sub_dirs) + len(files):
+            self.root.after(1, self.load_preview_rest, parent, dir_path, end, generation)
+
+    def on_preview_open(self, event=None):
+        node = self.preview_tree.focus()
+        if node not in self.preview_nodes:
+            return
+        dir_path, start, load_all = self.preview_nodes.pop(node)
+        if start:
+            # "显示更多"节点: 删除两个"显示更多"节点，换成下一页或全部剩余条目
+            parent = self.preview_tree.parent(node)
+            for child in self.preview_tree.get_children(parent)[-2:]:
+                self.preview_nodes.pop(child, None)
+                self.preview_tree.delete(child)
+            if load_all:
+                self.load_preview_rest(parent, dir_path, start, self.preview_generation)
+            else:
+                self.load_preview_page(parent, dir_path, start)
+        else:
+            self.preview_tree.delete(*self.preview_tree.get_children(node))
+            self.load_preview_page(node, dir_path, 0)
+
+    def on_preview_close(self, event=None):
+        """折叠目录时释放其全部子节点，再次展开时重新加载"""
+        node = self.preview_tree.focus()
+        path = self.preview_dirs.get(node)
+        if path is None:
+            return
+        self.preview_generation += 1
+        self.preview_tree.delete(*self.preview_tree.get_children(node))
+        self.preview_tree.insert(node, tk.END)
+        self.preview_nodes = {item: value for item, value in self.preview_nodes.items()
+                              if self.preview_tree.exists(item)}
+        self.preview_dirs = {item: value for item, value in self.preview_dirs.items()
+                             if self.preview_tree.exists(item)}
+        self.preview_nodes[node] = (path, 0, False)
 
     # 核心功能实现
     def start_compression(self):
@@ -414,6 +720,36 @@ class FileCompressorDecompressor:
 
         output_path = os.path.join(output_dir, f"{archive_name}.exe")
 
+        try:
+            workers = max(1, int(self.compress_workers.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("警告", "请输入有效的并行压缩进程数")
+            return
+
+        codec = self.compress_codec.get()
+        method, _, min_level, max_level = COMPRESSION_CODECS[codec]
+        if method == ZIP_ZSTANDARD and zstandard is None:
+            messagebox.showerror("错误", "使用Zstandard压缩需要先安装zstandard库:\npip install zstandard")
+            return
+        try:
+            level = int(self.compress_level.get())
+        except (tk.TclError, ValueError):
+            level = None
+        if level is None or not min_level <= level <= max_level:
+            messagebox.showwarning("警告", f"{codec} 的压缩级别应在 {min_level}-{max_level} 之间")
+            return
+
+        try:
+            volume_size = max(0, int(self.volume_size_mb.get())) * 1024 * 1024
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("警告", "请输入有效的分卷大小")
+            return
+
+        delta_base = self.delta_base_entry.get().strip()
+        if delta_base and not self.is_valid_zip(delta_base):
+            messagebox.showwarning("警告", "增量基准不是有效的自解压文件")
+            return
+
         # 确认是否覆盖已有文件
         if os.path.exists(output_path):
             if not messagebox.askyesno("确认", f"文件 {output_path} 已存在，是否覆盖?"):
@@ -424,404 +760,52 @@ class FileCompressorDecompressor:
         self.append_log("开始压缩流程...")
 
         # 在新线程中执行压缩，避免界面卡顿
-        threading.Thread(target=self.perform_compression, args=(output_path,), daemon=True).start()
-
-    def perform_compression(self, output_path):
+        # 界面变量只能在主线程中读取，这里读出后作为参数传给压缩线程
+        threading.Thread(target=self.perform_compression,
+                         args=(output_path, workers, self.stub_mode.get(), method, level, delta_base, volume_size,
+                               self.debug_mode.get(), self.trace_mode.get()),
+                         daemon=True).start()
+
+    def perform_compression(self, output_path, workers=1, use_stub=False, method=zipfile.ZIP_DEFLATED, level=6,
+                            delta_base="", volume_size=0, debug=False, trace=False):
+        tracer = Tracer() if trace else None
         try:
-            self.update_compress_status("准备压缩...")
-            self.update_compress_progress(0)
-            self.append_log("准备压缩...")
-
-            # 创建临时目录
-            with tempfile.TemporaryDirectory() as temp_dir:
-                self.append_log(f"创建临时目录: {temp_dir}")
-                self.update_compress_status("创建临时文件...")
-                self.update_compress_progress(5)
-
-                # 创建ZIP文件名称
-                zip_name = "packed_files"
-                zip_path = os.path.join(temp_dir, f"{zip_name}.zip")
-
-                # 打包文件
-                self.update_compress_status("正在打包文件...")
-                self.update_compress_progress(10)
-                self.append_log("开始打包文件...")
-
-                total_items = self.count_items(self.compress_files)
-                processed_items = 0
-                self.append_log(f"总计需要处理 {total_items} 个文件")
-
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for item in self.compress_files:
-                        if os.path.isfile(item):
-                            # 添加文件
-                            rel_path = os.path.basename(item)
-                            zipf.write(item, arcname=f"{zip_name}/{rel_path}")
-                            processed_items += 1
-                            progress = 10 + (processed_items / total_items * 30)
-                            self.update_compress_progress(progress)
-                            self.update_compress_status(f"正在打包: {os.path.basename(item)}")
-                            self.append_log(f"添加文件: {item}")
-                        elif os.path.isdir(item):
-                            # 添加文件夹
-                            for root_dir, dirs, files in os.walk(item):
-                                for file in files:
-                                    file_path = os.path.join(root_dir, file)
-                                    rel_path = os.path.relpath(file_path, os.path.dirname(item))
-                                    zipf.write(file_path, arcname=f"{zip_name}/{os.path.basename(item)}/{rel_path}")
-                                    processed_items += 1
-                                    progress = 10 + (processed_items / total_items * 30)
-                                    self.update_compress_progress(progress)
-                                    self.update_compress_status(f"正在打包: {os.path.basename(file_path)}")
-                                    self.append_log(f"添加文件: {file_path}")
-
-                self.update_compress_progress(40)
-                self.append_log(f"ZIP文件创建完成: {zip_path}")
-
-                # 复制图片到临时目录
-                image_name = os.path.basename(self.image_path)
-                temp_image_path = os.path.join(temp_dir, image_name)
-                shutil.copy2(self.image_path, temp_image_path)
-                self.append_log(f"复制图片到临时目录: {temp_image_path}")
-
-                # 创建解压程序脚本
-                self.update_compress_status("创建解压程序...")
-                self.update_compress_progress(50)
-                self.append_log("创建解压程序脚本...")
-
-                extractor_script = self.create_extractor_script(temp_dir, zip_name, image_name)
-                self.append_log(f"解压程序脚本创建完成: {extractor_script}")
-
-                # 使用pyinstaller打包解压程序
-                self.update_compress_status("正在生成EXE文件...")
-                self.update_compress_progress(60)
-                self.append_log("开始生成EXE文件...")
-
-                # 构建pyinstaller命令
-                sep = ';' if sys.platform.startswith('win') else ':'
-                cmd = [
-                    sys.executable,  # 使用当前Python解释器
-                    "-m", "PyInstaller",  # 确保使用正确的PyInstaller模块
-                    "--onefile",
-                    f"--add-data={zip_path}{sep}.",
-                    f"--add-data={temp_image_path}{sep}.",
-                    f"--distpath={os.path.dirname(output_path)}",
-                    f"--name={os.path.basename(output_path).replace('.exe', '')}",
-                    "--noconsole",
-                    extractor_script
-                ]
-
-                # 如果是调试模式，添加详细输出参数
-                if self.debug_mode.get():
-                    cmd.insert(2, "--debug=all")
-
-                self.append_log(f"执行PyInstaller命令: {' '.join(cmd)}")
-
-                # 执行pyinstaller命令
-                try:
-                    # 使用Popen实时获取输出
-                    process = subprocess.Popen(
-                        cmd,
-                        cwd=temp_dir,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,  # 合并stdout和stderr
-                        text=True,
-                        encoding="utf-8",
-                        bufsize=1
-                    )
-
-                    # 实时读取输出并添加到日志
-                    while process.poll() is None:
-                        line = process.stdout.readline()
-                        if line:
-                            self.append_log(line.strip())
-                            # 更新进度（模拟，因为无法直接获取PyInstaller的进度）
-                            current_progress = self.compress_progress_var.get()
-                            if current_progress < 90:
-                                self.update_compress_progress(current_progress + 0.01)
-
-                    # 读取剩余输出
-                    remaining_output = process.stdout.read()
-                    if remaining_output:
-                        self.append_log(remaining_output.strip())
-
-                    self.update_compress_progress(90)
-
-                    if process.returncode != 0:
-                        self.append_log(f"PyInstaller执行失败，返回代码: {process.returncode}")
-                        self.update_compress_status(f"生成EXE失败，返回代码: {process.returncode}", is_error=True)
-                        messagebox.showerror(
-                            "错误",
-                            f"生成EXE时出错，返回代码: {process.returncode}\n"
-                            f"请查看'运行日志'标签页获取详细信息"
-                        )
-                        return
-                except Exception as e:
-                    self.append_log(f"执行PyInstaller时出错: {str(e)}")
-                    self.append_log(traceback.format_exc())
-                    self.update_compress_status(f"执行PyInstaller失败: {str(e)}", is_error=True)
-                    messagebox.showerror("错误", f"执行PyInstaller时出错:\n{str(e)}")
-                    return
-
-                # 检查输出文件是否存在
-                if not os.path.exists(output_path):
-                    self.append_log(f"生成的EXE文件未找到: {output_path}")
-                    messagebox.showerror("错误", "生成EXE失败，文件未找到")
-                    return
-
-                self.append_log(f"EXE文件生成成功: {output_path}")
-                self.update_compress_progress(100)
-                self.update_compress_status("压缩完成!")
-                messagebox.showinfo("成功", f"自解压EXE已生成:\n{output_path}\n\n可双击该文件直接解压")
+            pack_archive(self.compress_files, self.image_path, output_path,
+                         workers=workers,
+                         use_stub=use_stub,
+                         method=method,
+                         level=level,
+                         delta_base=delta_base,
+                         debug=debug,
+                         on_log=self.append_log,
+                         on_progress=self.update_compress_progress,
+                         on_status=self.update_compress_status,
+                         on_rate=self.update_compress_rate,
+                         volume_size=volume_size or None,
+                         tracer=tracer)
+            if volume_size:
+                self.show_message(messagebox.showinfo, "成功",
+                                  f"自解压EXE已生成:\n{output_path}\n\n"
+                                  f"数据分卷保存在同目录下（{len(find_volumes(output_path))} 个），"
+                                  f"分发时需与EXE放在一起")
+            else:
+                self.show_message(messagebox.showinfo, "成功", f"自解压EXE已生成:\n{output_path}\n\n可双击该文件直接解压")
 
         except Exception as e:
             self.append_log(f"压缩过程出错: {str(e)}")
             self.append_log(traceback.format_exc())
             self.update_compress_status(f"压缩失败: {str(e)}", is_error=True)
-            messagebox.showerror("错误", f"压缩过程中发生错误:\n{str(e)}\n请查看'运行日志'标签页获取详细信息")
-
-    def count_items(self, items):
-        """计算要压缩的项目总数（文件数量）"""
-        count = 0
-        for item in items:
-            if os.path.isfile(item):
-                count += 1
-            elif os.path.isdir(item):
-                for root_dir, dirs, files in os.walk(item):
-                    count += len(files)
-        return count
-
-    def create_extractor_script(self, temp_dir, zip_name, image_name):
-        """创建包含自启动解压逻辑的脚本"""
-        extractor_code = f"""
-import os
-import sys
-import zipfile
-import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-import tempfile
-import shutil
-import time
-
-class ExtractorApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("正在解压...")
-        self.root.geometry("600x400")
-        self.root.resizable(False, False)
-
-        # 设置中文字体
-        self.setup_fonts()
-
-        # 使用用户文档目录作为解压路径（避免权限问题）
-        self.extract_path = os.path.join(os.path.expanduser('~'), "Documents", "extracted_files")
-
-        # 创建界面
-        self.create_widgets()
-
-        # 开始解压
-        self.start_extraction()
-
-    def setup_fonts(self):
-        default_font = ('SimHei', 10)
-        self.root.option_add("*Font", default_font)
-
-    def create_widgets(self):
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.pack(fill=tk.BOTH, expand=True)
-
-        # 显示图片
-        image_frame = ttk.Frame(main_frame)
-        image_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-
-        try:
-            # 获取pyinstaller打包后的资源路径
-            if getattr(sys, 'frozen', False):
-                base_path = sys._MEIPASS
-            else:
-                base_path = os.path.abspath('.')
-            image_path = os.path.join(base_path, "{image_name}")
-            image = Image.open(image_path)
-            # 调整图片大小适应窗口
-            image.thumbnail((560, 300))
-            photo = ImageTk.PhotoImage(image)
-
-            self.image_label = ttk.Label(image_frame, image=photo)
-            self.image_label.image = photo  # 保持引用
-            self.image_label.pack()
-        except Exception as e:
-            ttk.Label(
-                image_frame, 
-                text=f"无法加载图片: {{str(e)}}\\n将使用默认界面",
-                justify=tk.CENTER
-            ).pack(expand=True)
-
-        # 进度条
-        self.progress_var = tk.DoubleVar()
-        self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
-        self.progress_bar.pack(fill=tk.X, pady=5)
-
-        # 状态标签
-        self.status_label = ttk.Label(main_frame, text="准备解压...")
-        self.status_label.pack(pady=5)
-
-        # 解压路径显示
-        path_frame = ttk.Frame(main_frame)
-        path_frame.pack(fill=tk.X, pady=5)
-
-        ttk.Label(path_frame, text="解压到:").pack(side=tk.LEFT)
-        self.path_label = ttk.Label(path_frame, text=self.extract_path)
-        self.path_label.pack(side=tk.LEFT, padx=5)
-
-        # 取消按钮
-        cancel_btn = ttk.Button(main_frame, text="取消", command=self.cancel_extraction)
-        cancel_btn.pack(pady=10)
-
-        self.cancelled = False
-
-    def cancel_extraction(self):
-        self.cancelled = True
-        self.status_label.config(text="正在取消...")
-
-    def update_progress(self, value):
-        self.progress_var.set(value)
-        self.root.update_idletasks()
-
-    def update_status(self, text):
-        self.status_label.config(text=text)
-        self.root.update_idletasks()
-
-    def start_extraction(self):
-        try:
-            # 创建解压目录
-            os.makedirs(self.extract_path, exist_ok=True)
-
-            # 获取打包的ZIP文件路径
-            if getattr(sys, 'frozen', False):
-                base_path = sys._MEIPASS
-                zip_path = os.path.join(base_path, "{zip_name}.zip")
-            else:
-                zip_path = "{zip_name}.zip"
-
-            # 检查ZIP文件是否存在
-            if not os.path.exists(zip_path):
-                raise Exception(f"未找到压缩数据: {{zip_path}}")
-
-            # 从ZIP文件中解压
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                # 获取所有文件列表
-                file_list = zip_ref.namelist()
-
-                # 过滤出属于我们打包的文件
-                target_files = [f for f in file_list if f.startswith("{zip_name}/")]
-
-                if not target_files:
-                    raise Exception("未找到可解压的文件")
-
-                # 解压文件
-                total_files = len(target_files)
-                for i, file in enumerate(target_files):
-                    if self.cancelled:
-                        self.update_status("解压已取消")
-                        # 清理可能的部分文件
-                        if os.path.exists(self.extract_path):
-                            shutil.rmtree(self.extract_path, ignore_errors=True)
-                        messagebox.showinfo("取消", "解压已被取消")
-                        self.root.destroy()
-                        return
-
-                    # 更新进度
-                    progress = (i + 1) / total_files * 100
-                    self.update_progress(progress)
-                    self.update_status(f"正在解压: {{os.path.basename(file)}}")
-
-                    # 解压文件
-                    zip_ref.extract(file, tempfile.gettempdir())
-
-                    # 移动到目标目录
-                    temp_path = os.path.join(tempfile.gettempdir(), file)
-                    target_path = os.path.join(self.extract_path, os.path.relpath(file, "{zip_name}/"))
-
-                    # 确保目标目录存在
-                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-                    # 移动文件
-                    if os.path.exists(target_path):
-                        os.remove(target_path)
-                    shutil.move(temp_path, target_path)
-                    time.sleep(0.01)  # 稍微延迟，让用户能看到进度
-
-            self.update_status("解压完成!")
-            messagebox.showinfo("成功", f"文件已成功解压到:\\n{self.extract_path}")
-            self.root.destroy()
-
-            # 打开解压目录
-            try:
-                os.startfile(self.extract_path)
-            except:
-                pass  # 忽略打开目录失败的情况
-
-        except Exception as e:
-            self.update_status(f"解压失败: {{str(e)}}")
-
-if __name__ == "__main__":
-    # 实现双击自动解压逻辑
-    if len(sys.argv) > 1 and sys.argv[1] == "--extract":
-        # 命令行模式（供外部调用）
-        extract_path = os.path.join(os.path.expanduser('~'), "Documents", "extracted_files")
-        os.makedirs(extract_path, exist_ok=True)
-
-        try:
-            # 获取打包的ZIP文件路径
-            if getattr(sys, 'frozen', False):
-                base_path = sys._MEIPASS
-                zip_path = os.path.join(base_path, "{zip_name}.zip")
-            else:
-                zip_path = "{zip_name}.zip"
-
-            if not os.path.exists(zip_path):
-                raise Exception(f"未找到压缩数据: {{zip_path}}")
-
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                target_files = [f for f in file_list if f.startswith("{zip_name}/")]
-
-                if not target_files:
-                    raise Exception("未找到可解压的文件")
-
-                for file in target_files:
-                    temp_path = zip_ref.extract(file, tempfile.gettempdir())
-                    target_path = os.path.join(extract_path, os.path.relpath(file, "{zip_name}/"))
-                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-                    if os.path.exists(target_path):
-                        if os.path.isfile(target_path):
-                            os.remove(target_path)
-                        else:
-                            shutil.rmtree(target_path)
-                    shutil.move(temp_path, target_path)
-
-            messagebox.showinfo("成功", f"文件已解压到:\\n{self.extract_path}")
-            try:
-                os.startfile(extract_path)
-            except:
-                pass
-        except Exception as e:
-            messagebox.showerror("错误", f"解压失败: {{str(e)}}")
-    else:
-        # 图形界面模式
-        root = tk.Tk()
-        app = ExtractorApp(root)
-        root.mainloop()
-        """
-
-        # 将解压程序代码写入临时文件
-        extractor_script_path = os.path.join(temp_dir, "extractor.py")
-        with open(extractor_script_path, "w", encoding="utf-8") as f:
-            f.write(extractor_code)
-
-        return extractor_script_path
+            self.show_message(messagebox.showerror, "错误",
+                              f"压缩过程中发生错误:\n{str(e)}\n请查看'运行日志'标签页获取详细信息")
+        finally:
+            if tracer:
+                # 打包失败时也保存，便于查看停在哪个阶段
+                trace_path = os.path.splitext(output_path)[0] + ".trace.json"
+                try:
+                    tracer.save(trace_path)
+                    self.append_log(f"性能跟踪已保存: {trace_path}")
+                except OSError as e:
+                    self.append_log(f"保存性能跟踪失败: {str(e)}")
 
     # 解压相关方法
     def start_decompression(self):
@@ -879,8 +863,8 @@ if __name__ == "__main__":
                     image_files = [f for f in zip_ref.namelist() if
                                    f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
             else:
-                # 直接读取EXE文件
-                with zipfile.ZipFile(self.extract_file, 'r') as zip_ref:
+                # 从EXE中定位压缩数据读取
+                with open_archive(self.extract_file) as zip_ref:
                     image_files = [f for f in zip_ref.namelist() if
                                    f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
 
@@ -892,7 +876,7 @@ if __name__ == "__main__":
                         with zipfile.ZipFile(os.path.join(base_path, "packed_files.zip"), 'r') as zip_ref:
                             f.write(zip_ref.read(image_files[0]))
                     else:
-                        with zipfile.ZipFile(self.extract_file, 'r') as zip_ref:
+                        with open_archive(self.extract_file) as zip_ref:
                             f.write(zip_ref.read(image_files[0]))
 
                 # 显示图片
@@ -923,6 +907,10 @@ if __name__ == "__main__":
         status_label = ttk.Label(main_frame, text="准备解压...")
         status_label.pack(pady=5)
 
+        # 速度和剩余时间
+        rate_label = ttk.Label(main_frame, text="")
+        rate_label.pack(pady=5)
+
         # 解压路径显示
         path_frame = ttk.Frame(main_frame)
         path_frame.pack(fill=tk.X, pady=5)
@@ -940,121 +928,150 @@ if __name__ == "__main__":
 
         cancel_btn = ttk.Button(main_frame, text="取消", command=cancel_extraction)
         cancel_btn.pack(pady=10)
+        # 关闭窗口等同于取消，窗口在解压线程结束后再销毁
+        extract_window.protocol("WM_DELETE_WINDOW", cancel_extraction)
 
-        # 开始解压
-        extract_window.after(100, self.perform_decompression, extract_path, progress_var, status_label, extract_window,
-                             cancelled)
-
-    def perform_decompression(self, extract_path, progress_var, status_label, window, cancelled):
+        # 界面变量只能在主线程中读取，这里读出后作为参数传给解压线程
         try:
-            # 获取ZIP文件路径
-            if getattr(sys, 'frozen', False):
-                # 从资源目录读取
-                base_path = sys._MEIPASS
-                zip_path = os.path.join(base_path, "packed_files.zip")
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    file_list = zip_ref.namelist()
+            workers = max(1, int(self.decompress_workers.get()))
+        except (tk.TclError, ValueError):
+            workers = os.cpu_count() or 1
+
+        # 在新线程中执行解压，避免界面卡顿
+        threading.Thread(target=self.perform_decompression,
+                         args=(extract_path, workers, self.decompress_sync.get(), progress_var, status_label,
+                               rate_label, extract_window, cancelled),
+                         daemon=True).start()
+
+    def perform_decompression(self, extract_path, workers, sync, progress_var, status_label, rate_label, window,
+                              cancelled):
+        """解压线程：不直接操作界面，进度通过事件队列交给主线程"""
+        last_percent = -1
+
+        def show_progress(percent, file, summary):
+            progress_var.set(percent)
+            status_label.config(text=f"正在解压: {os.path.basename(file)}")
+            rate_label.config(text=summary)
+
+        def on_progress(done, total, file, rate):
+            # 只在百分比变化时刷新界面，界面更新次数与文件数量无关
+            nonlocal last_percent
+            percent = int(rate.progress() * 100)
+            if percent != last_percent:
+                last_percent = percent
+                self.call_in_ui(show_progress, percent, file, rate.summary())
+
+        def on_status(text):
+            self.call_in_ui(show_status, text)
+
+        def show_status(text, is_error=False):
+            if is_error:
+                status_label.config(text=text, foreground="red")
             else:
-                # 直接读取EXE文件
-                with zipfile.ZipFile(self.extract_file, 'r') as zip_ref:
-                    file_list = zip_ref.namelist()
-
-            # 过滤出属于我们打包的文件
-            zip_name = "packed_files"
-            target_files = [f for f in file_list if f.startswith(f"{zip_name}/")]
-
-            if not target_files:
-                raise Exception("未找到可解压的文件，可能不是本工具生成的自解压文件")
-
-            # 解压文件
-            total_files = len(target_files)
-            for i, file in enumerate(target_files):
-                if cancelled[0]:
-                    status_label.config(text="解压已取消")
-                    # 清理可能的部分文件
-                    if os.path.exists(extract_path):
-                        shutil.rmtree(extract_path, ignore_errors=True)
-                    messagebox.showinfo("取消", "解压已被取消")
-                    window.destroy()
-                    return
-
-                # 更新进度
-                progress = (i + 1) / total_files * 100
-                progress_var.set(progress)
-                status_label.config(text=f"正在解压: {os.path.basename(file)}")
-                window.update_idletasks()
-
-                # 解压文件到临时目录
-                if getattr(sys, 'frozen', False):
-                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                        temp_file_path = zip_ref.extract(file, tempfile.gettempdir())
-                else:
-                    with zipfile.ZipFile(self.extract_file, 'r') as zip_ref:
-                        temp_file_path = zip_ref.extract(file, tempfile.gettempdir())
-
-                # 构建目标路径
-                relative_path = os.path.relpath(file, f"{zip_name}/")
-                target_path = os.path.join(extract_path, relative_path)
-
-                # 确保目标目录存在
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-                # 移动文件
-                if os.path.exists(target_path):
-                    if os.path.isfile(target_path):
-                        os.remove(target_path)
-                    else:
-                        shutil.rmtree(target_path)
-                shutil.move(temp_file_path, target_path)
-
-            progress_var.set(100)
-            status_label.config(text="解压完成!")
-            window.update_idletasks()
-            messagebox.showinfo("成功", f"文件已成功解压到:\n{extract_path}")
+                status_label.config(text=text)
+
+        def finish(text, show, title, message, is_error=False, open_path=None):
+            # 在主线程中显示结果并关闭窗口
+            show_status(text, is_error)
+            if open_path:
+                progress_var.set(100)
+            show(title, message)
             window.destroy()
 
             # 打开解压目录
-            try:
-                if sys.platform.startswith('win'):
-                    os.startfile(extract_path)
-                elif sys.platform.startswith('darwin'):  # macOS
-                    subprocess.run(['open', extract_path])
-                else:  # Linux
-                    subprocess.run(['xdg-open', extract_path])
-            except Exception as e:
-                print(f"无法打开目录: {e}")
+            if open_path:
+                try:
+                    if sys.platform.startswith('win'):
+                        os.startfile(open_path)
+                    elif sys.platform.startswith('darwin'):  # macOS
+                        subprocess.run(['open', open_path])
+                    else:  # Linux
+                        subprocess.run(['xdg-open', open_path])
+                except Exception as e:
+                    print(f"无法打开目录: {e}")
+
+        try:
+            # 压缩数据的位置由extract_archive从EXE末尾定位
+            if not extract_archive(self.extract_file, extract_path, workers, on_progress, on_status,
+                                   is_cancelled=lambda: cancelled[0], on_log=self.append_log, sync=sync):
+                self.call_in_ui(finish, "解压已取消", messagebox.showinfo, "取消",
+                                "解压已被取消，再次解压到同一目录时将从中断处继续")
+                return
+
+            self.call_in_ui(finish, "解压完成!", messagebox.showinfo, "成功", f"文件已成功解压到:\n{extract_path}",
+                            False, extract_path)
 
         except Exception as e:
             error_msg = str(e)
             # 更友好的错误提示
             if "not a zip file" in error_msg.lower():
                 error_msg = "所选文件不是有效的压缩文件，无法解压。请确保选择的是由本工具生成的自解压EXE文件。"
-            status_label.config(text=f"解压失败: {error_msg}", foreground="red")
-            messagebox.showerror("错误", f"解压过程中发生错误:\n{error_msg}")
-            window.destroy()
+            self.append_log(f"解压过程出错: {error_msg}")
+            self.append_log(traceback.format_exc())
+            self.call_in_ui(finish, f"解压失败: {error_msg}", messagebox.showerror, "错误",
+                            f"解压过程中发生错误:\n{error_msg}", True)
+
+    def start_verification(self, extracted):
+        """校验压缩包中的全部成员，或按摘要清单校验已解压的文件"""
+        if not self.extract_file or not self.is_valid_zip(self.extract_file):
+            messagebox.showwarning("警告", "请选择有效的EXE文件")
+            return
+
+        output_dir = self.decompress_output_entry.get()
+        if extracted and not os.path.isdir(output_dir):
+            messagebox.showwarning("警告", "解压目录不存在，请先解压")
+            return
 
-    def is_valid_zip(self, file_path):
-        """验证文件是否为有效的ZIP或自解压EXE格式"""
         try:
-            if not os.path.exists(file_path) or not os.path.isfile(file_path):
-                return False
+            workers = max(1, int(self.decompress_workers.get()))
+        except (tk.TclError, ValueError):
+            workers = os.cpu_count() or 1
+
+        self.update_decompress_progress(0)
+        self.update_decompress_status("正在校验...")
+        threading.Thread(target=self.perform_verification,
+                         args=(output_dir if extracted else None, workers), daemon=True).start()
+
+    def perform_verification(self, extract_path, workers):
+        last_percent = -1
+
+        def on_progress(done, total):
+            # 只在百分比变化时刷新界面
+            nonlocal last_percent
+            percent = done * 100 // max(total, 1)
+            if percent != last_percent:
+                last_percent = percent
+                self.call_in_ui(self.update_decompress_progress, percent)
 
-            # 对于自解压EXE，检查其是否包含我们打包的ZIP文件
-            if getattr(sys, 'frozen', False):
-                # 运行时检查
-                return True
+        try:
+            target = extract_path or self.extract_file
+            self.append_log(f"开始校验: {target}")
+            problems = verify_archive(self.extract_file, extract_path, workers, on_progress, self.append_log)
+            for path, problem in problems:
+                self.append_log(f"  {path}: {problem}")
+            if problems:
+                text = f"校验完成，发现 {len(problems)} 个问题，详情见'运行日志'"
+                self.call_in_ui(self.update_decompress_status, text, True)
+                self.show_message(messagebox.showwarning, "校验结果", text)
             else:
-                # 开发环境检查
-                with open(file_path, 'rb') as f:
-                    content = f.read(1024 * 10)  # 读取前10KB内容查找ZIP签名
-                    zip_signatures = [b'PK\x03\x04', b'PK\x05\x06', b'PK\x07\x08']
-                    return any(sig in content for sig in zip_signatures)
+                self.append_log("校验完成，全部正常")
+                self.call_in_ui(self.update_decompress_status, "校验完成，全部正常")
+                self.show_message(messagebox.showinfo, "校验结果", "校验完成，全部正常")
         except Exception as e:
-            print(f"验证文件时出错: {e}")
-            return False
+            self.append_log(f"校验出错: {str(e)}")
+            self.append_log(traceback.format_exc())
+            self.call_in_ui(self.update_decompress_status, f"校验失败: {str(e)}", True)
+            self.show_message(messagebox.showerror, "错误", f"校验过程中发生错误:\n{str(e)}")
+
+    def is_valid_zip(self, file_path):
+        """验证文件是否为有效的ZIP或自解压EXE格式"""
+        return is_valid_archive(file_path)
 
 
 if __name__ == "__main__":
+    # 打包成EXE后多进程压缩需要
+    multiprocessing.freeze_support()
+
     # 补全依赖检查
     required_packages = ['pyinstaller']
     missing_packages = []